@@ -0,0 +1,50 @@
+"""Incremental update vs. full re-import after a few edits to a dataset.
+
+    python benchmarks/bench_delta.py --wordforms 20000 --examples 5000
+
+The dataset is imported with a manifest, edited (see ``synthetic.edit_dataset``) and
+then both updated in place and imported from scratch; the two resulting databases are
+compared table by table.
+"""
+import argparse
+import tempfile
+from pathlib import Path
+
+from synthetic import edit_dataset, make_dataset
+from util import canonical_dump, print_table, run_import, run_update, timer
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--wordforms", type=int, default=5000)
+    parser.add_argument("--examples", type=int, default=1000)
+    parser.add_argument("--edits", type=int, default=10, help="examples to edit")
+    args = parser.parse_args(args)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        metadata = make_dataset(
+            tmp / "cldf", wordforms=args.wordforms, examples=args.examples
+        ).tablegroup._fname
+        times = {}
+        with timer(times, "import with manifest"):
+            run_import(
+                metadata, tmp / "delta.sqlite", prime_cache=False, manifest=True, bulk=True
+            )
+        edit_dataset(tmp / "cldf", examples=args.edits)
+        with timer(times, "update"):
+            run_update(metadata, tmp / "delta.sqlite", prime_cache=False)
+        with timer(times, "full bulk import"):
+            run_import(metadata, tmp / "full.sqlite", prime_cache=False, bulk=True)
+        dumps = {db: canonical_dump(tmp / f"{db}.sqlite") for db in ["delta", "full"]}
+
+    print_table(
+        [(k, f"{v:.2f}") for k, v in times.items()],
+        ["stage", "seconds"],
+    )
+    differing = [t for t in dumps["full"] if dumps["full"][t] != dumps["delta"].get(t)]
+    print(f"differing tables: {', '.join(differing) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Building the derivation closure, and rendering derivational families with it.
+
+    python benchmarks/bench_derivations.py --roots 200 --width 5 --depth 20
+
+Creates a database with ``--roots`` roots, from each of which ``--width`` stems are
+derived, each of them the start of a chain of ``--depth`` derivations. Reports the
+time of ``indicogram.derivation.build_closure`` and the number of closure rows, and
+time and queries of rendering the family of a root and the lineage of the last stem
+of a chain the way ``clld_morphology_plugin`` does and with the closure.
+"""
+import argparse
+import tempfile
+from pathlib import Path
+
+import clld_morphology_plugin.util as mutil
+import transaction
+from clld.cliutil import SessionContext
+from clld.db.meta import DBSession
+from clld.db.models import common
+from clld_morphology_plugin.models import Derivation, DerivationalProcess, Morph, Stem
+from pyramid.scripting import prepare
+from sqlalchemy import event
+from util import print_table, timer
+
+import indicogram
+from indicogram import derivation
+from indicogram.models import DerivationClosure
+from indicogram.scripts.bulk import insert_rows
+
+
+def make_graph(roots, width, depth):
+    """Insert the roots, stems and derivations; return the pks of the first root and
+    of the last stem derived from it."""
+    language = common.Language(id="l", name="Language")
+    process = DerivationalProcess(id="dp", name="derivation", language=language)
+    DBSession.add(process)
+    DBSession.flush()
+    cols = dict(language_pk=language.pk, active=True, jsondata={})
+    insert_rows(
+        Morph.__table__,
+        [
+            dict(id=f"r{r}", name=f"r{r}", polymorphic_type="base", pk=r + 1, **cols)
+            for r in range(roots)
+        ],
+    )
+    stems, derivations = [], []
+    for r in range(roots):
+        for w in range(width):
+            for d in range(depth):
+                pk = len(stems) + 1
+                stems.append(dict(pk=pk, id=f"s{pk}", name=f"s{pk}", **cols))
+                derivations.append(
+                    dict(
+                        pk=pk,
+                        process_pk=process.pk,
+                        source_root_pk=r + 1 if d == 0 else None,
+                        source_stem_pk=None if d == 0 else pk - 1,
+                        target_pk=pk,
+                        active=True,
+                        jsondata={},
+                    )
+                )
+    insert_rows(Stem.__table__, stems)
+    insert_rows(Derivation.__table__, derivations)
+    return 1, depth
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--roots", type=int, default=200)
+    parser.add_argument("--width", type=int, default=5)
+    parser.add_argument("--depth", type=int, default=20)
+    args = parser.parse_args(args)
+
+    times, queries, html = {}, {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = {"sqlalchemy.url": f"sqlite:///{Path(tmp) / 'db.sqlite'}"}
+        with SessionContext(settings):
+            with transaction.manager:
+                root_pk, stem_pk = make_graph(args.roots, args.width, args.depth)
+            with transaction.manager:
+                with timer(times, "build closure"):
+                    derivation.build_closure()
+            rows = DBSession.query(DerivationClosure).count()
+
+            current = None
+
+            def count(*args):
+                if current:
+                    queries[current] += 1
+
+            env = prepare(registry=indicogram.main({}, **settings).registry)
+            event.listen(DBSession.get_bind(), "before_cursor_execute", count)
+            for current, render, model, pk in [
+                ("family (plugin)", mutil.render_derived_stems, Morph, root_pk),
+                ("family (closure)", derivation.render_family, Morph, root_pk),
+                ("lineage (plugin)", mutil.render_derived_from, Stem, stem_pk),
+                ("lineage (closure)", derivation.render_lineage, Stem, stem_pk),
+            ]:
+                queries[current] = 0
+                DBSession.expunge_all()
+                obj = DBSession.query(model).get(pk)
+                queries[current] = 0
+                with timer(times, current):
+                    html[current] = str(render(env["request"], obj))
+            env["closer"]()
+
+    print_table(
+        [(name, f"{times[name]:.3f}", queries.get(name, "")) for name in times],
+        ["stage", "seconds", "queries"],
+    )
+    print(f"closure rows: {rows}")
+    for kind in ["family", "lineage"]:
+        same = html[f"{kind} (plugin)"] == html[f"{kind} (closure)"]
+        print(f"same {kind} HTML: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Compare the default (ORM) import with the bulk loader.
+
+    python benchmarks/bench_import.py --wordforms 20000 --examples 5000
+
+Both modes import the same synthetic dataset into fresh SQLite databases; the
+resulting databases are compared table by table.
+"""
+import argparse
+import tempfile
+from pathlib import Path
+
+from synthetic import make_dataset
+from util import canonical_dump, print_table, run_import, timer
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--wordforms", type=int, default=5000)
+    parser.add_argument("--examples", type=int, default=1000)
+    parser.add_argument("--dataset", type=Path, help="CLDF metadata file to import")
+    args = parser.parse_args(args)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        metadata = args.dataset or make_dataset(
+            tmp / "cldf", wordforms=args.wordforms, examples=args.examples
+        ).tablegroup._fname
+        times, dumps = {}, {}
+        for mode, options in [("orm", {}), ("bulk", {"bulk": True})]:
+            db = tmp / f"{mode}.sqlite"
+            with timer(times, mode):
+                run_import(metadata, db, prime_cache=False, **options)
+            dumps[mode] = canonical_dump(db)
+
+    rows = sum(len(v) for v in dumps["orm"].values())
+    print_table(
+        [
+            (mode, f"{secs:.2f}", f"{rows / secs:.0f}", f"{times['orm'] / secs:.2f}x")
+            for mode, secs in times.items()
+        ],
+        ["mode", "seconds", "rows/s", "speedup"],
+    )
+    differing = [t for t in dumps["orm"] if dumps["orm"][t] != dumps["bulk"].get(t)]
+    print(f"{rows} rows, differing tables: {', '.join(differing) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
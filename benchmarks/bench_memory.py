@@ -0,0 +1,106 @@
+"""Peak memory of reading the ExampleTable, materialized as a list vs. streamed.
+
+    python benchmarks/bench_memory.py --examples 500000 [--import]
+
+Each measurement runs in a fresh interpreter and reports its peak RSS. With
+``--import``, the peak RSS of a complete import of the dataset is reported as well,
+with ORM objects, bulk inserts, and bulk inserts in batches (``indicogram.compact``).
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from synthetic import make_dataset
+from util import print_table
+
+
+def read_table(metadata, strategy):
+    from pycldf import Dataset
+    from tqdm import tqdm
+
+    from indicogram.scripts.initializedb import count_rows
+
+    cldf = Dataset.from_metadata(metadata)
+    if strategy == "list":
+        rows = tqdm(list(cldf.iter_rows("ExampleTable")))
+    else:
+        rows = tqdm(
+            cldf.iter_rows("ExampleTable"), total=count_rows(cldf, "ExampleTable")
+        )
+    return sum(1 for _ in rows)
+
+
+def full_import(metadata, strategy, db):
+    from util import run_import
+
+    run_import(
+        metadata,
+        db,
+        prime_cache=False,
+        bulk=strategy == "bulk",
+        compact=strategy == "compact",
+    )
+
+
+def peak_rss():
+    """Peak RSS of this process in kB."""
+    status = Path("/proc/self/status")
+    if status.exists():
+        # unlike ru_maxrss, VmHWM is not inherited from the parent process
+        for line in status.read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def worker(strategy, metadata, db):
+    if strategy in ("list", "stream"):
+        read_table(metadata, strategy)
+    else:
+        full_import(metadata, strategy, db)
+    print(json.dumps(peak_rss()))
+
+
+def measure(strategy, metadata, db):
+    res = subprocess.run(
+        [sys.executable, __file__, "--worker", strategy, str(metadata), str(db)],
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    return json.loads(res.stdout.strip().split("\n")[-1]) / 1024
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--examples", type=int, default=100000)
+    parser.add_argument("--import", dest="full_import", action="store_true")
+    parser.add_argument("--worker", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args(args)
+    if args.worker:
+        return worker(*args.worker)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        metadata = make_dataset(
+            tmp / "cldf", wordforms=1000, examples=args.examples, chapters=1
+        ).tablegroup._fname
+        strategies = ["list", "stream"]
+        if args.full_import:
+            strategies += ["orm", "bulk", "compact"]
+        print_table(
+            [
+                (s, f"{measure(s, metadata, tmp / (s + '.sqlite')):.0f}")
+                for s in strategies
+            ],
+            ["strategy", "peak RSS (MB)"],
+        )
+
+
+if __name__ == "__main__":
+    main()
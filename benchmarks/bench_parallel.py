@@ -0,0 +1,56 @@
+"""Scaling of the bulk import with the number of processes parsing CLDF tables.
+
+    python benchmarks/bench_parallel.py --wordforms 50000 --examples 20000 --jobs 1 2 4 8
+
+Imports the same synthetic dataset with each number of jobs into fresh SQLite
+databases and compares the resulting databases to the one imported with one job.
+"""
+import argparse
+import os
+import tempfile
+from pathlib import Path
+
+from synthetic import make_dataset
+from util import canonical_dump, print_table, run_import, timer
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--wordforms", type=int, default=20000)
+    parser.add_argument("--examples", type=int, default=5000)
+    parser.add_argument("--dataset", type=Path, help="CLDF metadata file to import")
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        nargs="+",
+        default=sorted({1, 2, 4, os.cpu_count() or 1}),
+    )
+    args = parser.parse_args(args)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        metadata = args.dataset or make_dataset(
+            tmp / "cldf", wordforms=args.wordforms, examples=args.examples
+        ).tablegroup._fname
+        times, dumps = {}, {}
+        for jobs in [1] + [j for j in args.jobs if j != 1]:
+            db = tmp / f"{jobs}.sqlite"
+            with timer(times, jobs):
+                run_import(metadata, db, prime_cache=False, bulk=True, jobs=jobs)
+            dumps[jobs] = canonical_dump(db)
+
+    print_table(
+        [
+            (jobs, f"{secs:.2f}", f"{times[1] / secs:.2f}x")
+            for jobs, secs in times.items()
+        ],
+        ["jobs", "seconds", "speedup"],
+    )
+    differing = {
+        t for jobs in dumps for t in dumps[1] if dumps[1][t] != dumps[jobs].get(t)
+    }
+    print(f"{os.cpu_count()} cores, differing tables: {', '.join(differing) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Throughput of the app served by waitress, with and without read-only mode.
+
+    python benchmarks/bench_readonly.py --wordforms 5000 --threads 8 16 32
+    python benchmarks/bench_readonly.py --db path/to/db.sqlite --requests 2000
+
+Imports a synthetic dataset (or uses an existing database), then serves it with
+waitress in a separate process, once with the default configuration (``pyramid_tm``
+and the default connection pool) and once with ``indicogram.read_only``, for every
+number of ``--threads``. The pages and data tables of ``bench_web.py`` are requested
+``--requests`` times in turn over HTTP, by as many clients as the server has threads.
+Reports throughput and latency percentiles.
+"""
+import argparse
+import multiprocessing
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, cycle, islice
+from pathlib import Path
+
+from bench_web import percentile, targets
+from synthetic import make_dataset
+from util import print_table, run_import
+
+MODES = {
+    "default": {},
+    "read-only": {"indicogram.read_only": "true"},
+}
+# like a browser; some pages are not served to clients without Accept header
+ACCEPT = {"Accept": "text/html,application/xhtml+xml,*/*;q=0.8"}
+
+
+def serve(settings, threads, ports):
+    import waitress
+
+    import indicogram
+
+    app = indicogram.main({}, **settings)
+    server = waitress.create_server(app, host="127.0.0.1", port=0, threads=threads)
+    ports.put(server.effective_port)
+    server.run()
+
+
+def measure(port, requests, clients):
+    """Send ``requests`` and return the latencies of the successful ones, the number of
+    failed requests and the time all took."""
+    errors = []
+
+    def send(target):
+        path, headers = target
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{port}{path}", headers={**ACCEPT, **headers}
+        )
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request) as res:
+                res.read()
+        except Exception:
+            errors.append(path)
+            return None
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(clients) as executor:
+        latencies = [x for x in executor.map(send, requests) if x is not None]
+    return latencies, len(errors), time.perf_counter() - start
+
+
+def run(db_path, mode, threads, requests):
+    settings = {
+        "sqlalchemy.url": f"sqlite:///{db_path}",
+        "pyramid.includes": "pyramid_tm",
+        **MODES[mode],
+    }
+    # all routes in turn
+    routes = targets(db_path, requests).values()
+    mix = list(islice(cycle(chain(*zip(*routes))), requests))
+    ports = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(settings, threads, ports))
+    server.start()
+    try:
+        port = ports.get(timeout=60)
+        measure(port, mix[: threads * 2], threads)  # warm up templates and caches
+        latencies, errors, seconds = measure(port, mix, threads)
+    finally:
+        server.terminate()
+        server.join()
+    return {
+        "rps": len(latencies) / seconds if latencies else 0,
+        "p50_ms": percentile(latencies, 50) * 1000 if latencies else None,
+        "p99_ms": percentile(latencies, 99) * 1000 if latencies else None,
+        "errors": errors,
+    }
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--wordforms", type=int, default=2000)
+    parser.add_argument("--examples", type=int, default=500)
+    parser.add_argument("--db", type=Path, help="existing database to use instead")
+    parser.add_argument("--threads", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--requests", type=int, default=1000, help="per run")
+    args = parser.parse_args(args)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        db_path = args.db
+        if db_path is None:
+            metadata = make_dataset(
+                tmp / "cldf", wordforms=args.wordforms, examples=args.examples
+            ).tablegroup._fname
+            db_path = tmp / "db.sqlite"
+            run_import(metadata, db_path, bulk=True)
+        for threads in args.threads:
+            for mode in MODES:
+                res = run(db_path.resolve(), mode, threads, args.requests)
+                rows.append(
+                    (
+                        threads,
+                        mode,
+                        f"{res['rps']:.1f}",
+                        res["p50_ms"] and f"{res['p50_ms']:.1f}",
+                        res["p99_ms"] and f"{res['p99_ms']:.1f}",
+                        res["errors"],
+                    )
+                )
+    print_table(rows, ["threads", "mode", "req/s", "p50 ms", "p99 ms", "errors"])
+
+
+if __name__ == "__main__":
+    main()
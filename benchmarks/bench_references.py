@@ -0,0 +1,46 @@
+"""Cost of the second pass over all CLDF tables that used to collect ``References``.
+
+    python benchmarks/bench_references.py --wordforms 50000 --examples 20000
+
+Reports the time spent re-parsing every table (what ``process_cldf`` did after the
+import before ``References`` were collected in the first pass) next to the time of a
+complete bulk import of the same dataset.
+"""
+import argparse
+import tempfile
+from pathlib import Path
+
+from pycldf import Dataset
+from synthetic import make_dataset
+from util import print_table, run_import, timer
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--wordforms", type=int, default=20000)
+    parser.add_argument("--examples", type=int, default=5000)
+    args = parser.parse_args(args)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        metadata = make_dataset(
+            tmp / "cldf", wordforms=args.wordforms, examples=args.examples
+        ).tablegroup._fname
+        times = {}
+        cldf = Dataset.from_metadata(metadata)
+        tables = list(cldf.components.keys()) + [str(x.url) for x in cldf.tables]
+        with timer(times, "second pass"):
+            for table in tables:
+                for _ in cldf.iter_rows(table):
+                    pass
+        with timer(times, "import"):
+            run_import(metadata, tmp / "db.sqlite", prime_cache=False, bulk=True)
+    print_table(
+        [(k, f"{v:.2f}") for k, v in times.items()],
+        ["stage", "seconds"],
+    )
+    print(f"the second pass added {times['second pass'] / times['import']:.0%}")
+
+
+if __name__ == "__main__":
+    main()
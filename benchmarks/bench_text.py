@@ -0,0 +1,99 @@
+"""Rendering the examples of a long text, with and without pre-rendered gloss units.
+
+    python benchmarks/bench_text.py --examples 2000
+
+Imports a synthetic dataset with a single text and renders its examples the way the
+text page of ``clld_corpus_plugin`` does and the way ``indicogram.interlinear`` does,
+reporting time and number of queries of both, and of the first chunk of sentences
+shown when the text page is opened.
+"""
+import argparse
+import tempfile
+from pathlib import Path
+
+import clld_corpus_plugin.util as cutil
+from clld.cliutil import SessionContext
+from clld.db.meta import DBSession
+from clld_corpus_plugin.models import Text
+from pyramid.scripting import prepare
+from sqlalchemy import event
+from synthetic import make_dataset
+from util import print_table, run_import, timer
+
+import indicogram
+from indicogram import interlinear
+from indicogram.util import lazy_audio
+
+
+def render_plugin(request, text):
+    return [
+        lazy_audio(
+            str(
+                cutil.rendered_sentence(
+                    request, s.sentence, text_link=False, sentence_link=True
+                )
+            )
+        )
+        for s in sorted(text.sentences, key=lambda x: x.record_number)
+    ]
+
+
+def render_prerendered(request, text):
+    sentences = interlinear.text_sentences(text)
+    units = interlinear.gloss_units(request, sentences)
+    return [
+        str(
+            interlinear.rendered_sentence(
+                request, s, units=units[s.pk], text_link=False, sentence_link=True
+            )
+        )
+        for s in sentences
+    ]
+
+
+def render_chunk(request, text):
+    return interlinear.rendered_text_chunk(
+        request, text, 0, interlinear.text_chunk_size(request)
+    )
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--examples", type=int, default=2000)
+    args = parser.parse_args(args)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        metadata = make_dataset(
+            tmp / "cldf", wordforms=2000, examples=args.examples, texts=1
+        ).tablegroup._fname
+        settings = run_import(metadata, tmp / "db.sqlite", bulk=True).settings
+        times, queries, html = {}, {}, {}
+
+        def count(*args):
+            queries[current] += 1
+
+        with SessionContext(settings):
+            env = prepare(registry=indicogram.main({}, **settings).registry)
+            event.listen(DBSession.get_bind(), "before_cursor_execute", count)
+            for current, render in [
+                ("clld_corpus_plugin", render_plugin),
+                ("pre-rendered", render_prerendered),
+                ("first chunk", render_chunk),
+            ]:
+                DBSession.expunge_all()
+                queries[current] = 0
+                text = DBSession.query(Text).one()
+                with timer(times, current):
+                    html[current] = render(env["request"], text)
+            env["closer"]()
+
+    print_table(
+        [(name, f"{times[name]:.2f}", queries[name]) for name in times],
+        ["rendering", "seconds", "queries"],
+    )
+    print(f"same HTML: {html['clld_corpus_plugin'] == html['pre-rendered']}")
+
+
+if __name__ == "__main__":
+    main()
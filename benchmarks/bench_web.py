@@ -0,0 +1,244 @@
+"""Latency and throughput of the main pages and data tables of the app.
+
+    python benchmarks/bench_web.py --wordforms 5000 --examples 1000 --output web.json
+    python benchmarks/bench_web.py --db path/to/db.sqlite --compare web.json
+
+Imports a synthetic dataset (or uses an existing database), then requests every route
+``--requests`` times from the app in the same process, cycling through different
+objects, with ``--concurrency`` threads. Reports latency percentiles, throughput and
+SQL queries per request; ``--output`` saves the results as JSON, and ``--compare``
+reports the change of the median latency and queries against saved results, exiting
+with status 1 if any route got slower by more than ``--threshold`` or needs more
+queries.
+"""
+import argparse
+import json
+import platform
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import cycle, islice
+from pathlib import Path
+
+from clld.db.meta import DBSession
+from sqlalchemy import event
+from synthetic import make_dataset
+from util import print_table, run_import
+from webob import Request
+
+import indicogram
+
+# name, path, and a query for the values inserted into the path
+ROUTES = [
+    ("home", "/", None),
+    ("description", "/description", None),
+    ("corpus", "/corpus", None),
+    ("lexicon", "/lexicon", None),
+    ("chapter", "/documents/{}", "SELECT id FROM document WHERE id != 'landingpage'"),
+    ("phoneme", "/phonemes/{}", "SELECT id FROM phoneme"),
+    ("morph", "/morphs/{}", "SELECT id FROM morph"),
+    ("morpheme", "/morphemes/{}", "SELECT id FROM morpheme"),
+    ("wordform", "/wordforms/{}", "SELECT id FROM wordform"),
+    ("lexeme", "/lexemes/{}", "SELECT id FROM lexeme"),
+    ("example", "/sentences/{}", "SELECT id FROM sentence"),
+    ("text", "/texts/{}", "SELECT id FROM text"),
+    ("text chunk", "/texts/{}/sentences?start=50", "SELECT id FROM text"),
+    ("search", "/search.json?q={}", "SELECT name FROM wordform"),
+    (
+        "concordance",
+        "/concordance/{}",
+        "SELECT kind || '/' || obj_id FROM concordancekey",
+    ),
+]
+# data tables, requested the way their rows are loaded by the pages
+DATATABLES = ["wordforms", "morphs", "morphemes", "lexemes", "sentences", "texts"]
+XHR = {"X-Requested-With": "XMLHttpRequest"}
+
+
+def targets(db_path, requests):
+    """The requests to send for every route: path and headers."""
+    con = sqlite3.connect(db_path)
+    res = {}
+    for name, path, query in ROUTES:
+        values = [row[0] for row in con.execute(query)] if query else [None]
+        if values:
+            paths = [path.format(value) for value in values]
+            res[name] = [(p, {}) for p in islice(cycle(paths), requests)]
+    for table in DATATABLES:
+        path = f"/{table}?sEcho=1&iDisplayStart=0&iDisplayLength=100"
+        res[f"{table} (rows)"] = [(path, XHR)] * requests
+    return res
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(int(len(values) * p / 100), len(values) - 1)]
+
+
+def measure(app, requests, concurrency):
+    """Send ``requests`` and return the latencies of the successful ones, the number of
+    failed requests and the time all took."""
+    errors = []
+
+    def send(target):
+        path, headers = target
+        start = time.perf_counter()
+        try:
+            res = Request.blank(path, headers=headers).get_response(app)
+            ok = res.status_int == 200
+        except Exception:
+            ok = False
+        latency = time.perf_counter() - start
+        if not ok:
+            errors.append(path)
+            return None
+        return latency
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        latencies = [x for x in executor.map(send, requests) if x is not None]
+    return latencies, len(errors), time.perf_counter() - start
+
+
+def run(db_path, requests, concurrency):
+    app = indicogram.main(
+        {},
+        **{"sqlalchemy.url": f"sqlite:///{db_path}", "pyramid.includes": "pyramid_tm"},
+    )
+    lock, queries = threading.Lock(), [0]
+
+    def count(*args):
+        with lock:
+            queries[0] += 1
+
+    event.listen(DBSession.get_bind(), "before_cursor_execute", count)
+    results = {}
+    for name, target in targets(db_path, requests).items():
+        measure(app, target[:1], 1)  # warm up templates and caches
+        queries[0] = 0
+        latencies, errors, seconds = measure(app, target, concurrency)
+        results[name] = {
+            "path": target[0][0],
+            "requests": len(target),
+            "errors": errors,
+            "queries": queries[0] / len(target),
+            "rps": len(latencies) / seconds if latencies else 0,
+        }
+        if latencies:
+            results[name].update(
+                {
+                    f"{label}_ms": percentile(latencies, p) * 1000
+                    for label, p in [("p50", 50), ("p90", 90), ("p99", 99)]
+                }
+            )
+            results[name]["mean_ms"] = sum(latencies) / len(latencies) * 1000
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print the change of the median latency and the number of queries per route;
+    return the routes which got slower by more than ``threshold`` or need more
+    queries."""
+    rows, slower = [], []
+    for name, res in results.items():
+        base = baseline["routes"].get(name, {})
+        if "p50_ms" not in res or not base.get("p50_ms"):
+            continue
+        ratio = res["p50_ms"] / base["p50_ms"]
+        notes = []
+        if ratio > threshold:
+            notes.append("slower")
+        if res["queries"] > base["queries"]:
+            notes.append("more queries")
+        if notes:
+            slower.append(name)
+        rows.append(
+            (
+                name,
+                f"{base['p50_ms']:.1f}",
+                f"{res['p50_ms']:.1f}",
+                f"{ratio:.2f}x",
+                f"{base['queries']:.0f}",
+                f"{res['queries']:.0f}",
+                ", ".join(notes),
+            )
+        )
+    header = ["route", "baseline p50 ms", "p50 ms", "ratio", "baseline queries"]
+    print_table(rows, header + ["queries", ""])
+    return slower
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--wordforms", type=int, default=2000)
+    parser.add_argument("--examples", type=int, default=500)
+    parser.add_argument("--texts", type=int, default=5)
+    parser.add_argument("--chapters", type=int, default=5)
+    parser.add_argument("--links-per-chapter", type=int, default=50)
+    parser.add_argument("--db", type=Path, help="existing database to use instead")
+    parser.add_argument("--requests", type=int, default=20, help="per route")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--output", type=Path, help="JSON file to save results to")
+    parser.add_argument("--compare", type=Path, help="JSON file of earlier results")
+    parser.add_argument("--threshold", type=float, default=1.25)
+    args = parser.parse_args(args)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        db_path = args.db
+        sizes = {}
+        if db_path is None:
+            sizes = {
+                key: getattr(args, key)
+                for key in [
+                    "wordforms",
+                    "examples",
+                    "texts",
+                    "chapters",
+                    "links_per_chapter",
+                ]
+            }
+            metadata = make_dataset(tmp / "cldf", **sizes).tablegroup._fname
+            db_path = tmp / "db.sqlite"
+            run_import(metadata, db_path, bulk=True)
+        results = run(db_path, args.requests, args.concurrency)
+
+    print_table(
+        [
+            (
+                name,
+                res.get("p50_ms") and f"{res['p50_ms']:.1f}",
+                res.get("p90_ms") and f"{res['p90_ms']:.1f}",
+                res.get("p99_ms") and f"{res['p99_ms']:.1f}",
+                f"{res['rps']:.1f}",
+                f"{res['queries']:.0f}",
+                res["errors"],
+            )
+            for name, res in results.items()
+        ],
+        ["route", "p50 ms", "p90 ms", "p99 ms", "req/s", "queries", "errors"],
+    )
+    if args.output:
+        meta = dict(
+            date=datetime.now(timezone.utc).isoformat(),
+            python=platform.python_version(),
+            dataset=sizes or str(args.db),
+            requests=args.requests,
+            concurrency=args.concurrency,
+        )
+        args.output.write_text(
+            json.dumps({"meta": meta, "routes": results}, indent=2), encoding="utf8"
+        )
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf8"))
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,518 @@
+"""Generate synthetic CLDF datasets of configurable size for benchmarking.
+
+The generated dataset contains all tables read by
+``indicogram.scripts.initializedb.process_cldf``:
+
+    python benchmarks/synthetic.py /tmp/synth --wordforms 10000 --examples 2000
+"""
+import argparse
+import csv
+import random
+from pathlib import Path
+
+from pycldf import Generic
+
+SEGMENTS = ["a", "e", "i", "o", "u", "p", "t", "k", "m", "n", "s", "w", "j", "ts", "ng"]
+GLOSSES = ["PL", "SG", "1", "2", "3", "PST", "FUT", "NEG", "ERG", "ABS", "DAT", "LOC"]
+
+
+def _cols(*names, **specs):
+    cols = [{"name": name, "datatype": "string"} for name in names]
+    for name, spec in specs.items():
+        cols.append(dict(name=name, **spec))
+    return cols
+
+
+LIST = {"datatype": "string", "separator": ","}
+SEMICOLON_LIST = {"datatype": "string", "separator": "; "}
+SPACE_LIST = {"datatype": "string", "separator": " "}
+JSON = {"datatype": "json"}
+
+TABLES = {
+    "contributors.csv": _cols("ID", "Name", "Email", "Url", "Order"),
+    "phonemes.csv": _cols("ID", "Name"),
+    "partsofspeech.csv": _cols("ID", "Name", "Description", "Language_ID"),
+    "wordforms.csv": _cols(
+        "ID",
+        "Language_ID",
+        "Form",
+        "Part_Of_Speech",
+        "Contribution_ID",
+        "Media_ID",
+        Parameter_ID=SEMICOLON_LIST,
+        Morpho_Segments=SPACE_LIST,
+        Source=SEMICOLON_LIST,
+        References=JSON,
+    ),
+    "morphemes.csv": _cols(
+        "ID",
+        "Name",
+        "Language_ID",
+        "Contribution_ID",
+        Parameter_ID=SEMICOLON_LIST,
+        Source=SEMICOLON_LIST,
+        References=JSON,
+    ),
+    "morphs.csv": _cols(
+        "ID",
+        "Name",
+        "Language_ID",
+        "Contribution_ID",
+        "Part_Of_Speech",
+        "Morpheme_ID",
+        Parameter_ID=SEMICOLON_LIST,
+        Source=SEMICOLON_LIST,
+        References=JSON,
+    ),
+    "glosses.csv": _cols("ID", "Name"),
+    "wordformparts.csv": _cols(
+        "ID", "Wordform_ID", "Morph_ID", "Index", Gloss_ID=LIST
+    ),
+    "lexemes.csv": _cols(
+        "ID",
+        "Name",
+        "Description",
+        "Language_ID",
+        "Part_Of_Speech",
+        "Contribution_ID",
+        Parameter_ID=SEMICOLON_LIST,
+        Paradigm_View=JSON,
+    ),
+    "stems.csv": _cols(
+        "ID",
+        "Name",
+        "Language_ID",
+        "Contribution_ID",
+        "Lexeme_ID",
+        Parameter_ID=SEMICOLON_LIST,
+        Morpho_Segments=SPACE_LIST,
+        Source=SEMICOLON_LIST,
+    ),
+    "stemparts.csv": _cols("ID", "Stem_ID", "Morph_ID", "Index", Gloss_ID=LIST),
+    "wordformstems.csv": _cols(
+        "ID", "Wordform_ID", "Stem_ID", Index={"datatype": "integer", "separator": ","}
+    ),
+    "derivationalprocesses.csv": _cols("ID", "Name", "Description", "Language_ID"),
+    "derivations.csv": _cols(
+        "ID", "Process_ID", "Target_ID", "Source_ID", "Root_ID", Stempart_IDs=LIST
+    ),
+    "inflectionalcategories.csv": _cols(
+        "ID", "Name", "Description", Value_Order=LIST
+    ),
+    "inflectionalvalues.csv": _cols("ID", "Name", "Category_ID", "Gloss_ID"),
+    "inflections.csv": _cols(
+        "ID", "Stem_ID", "Value_ID", "Form_ID", Wordformpart_ID=LIST
+    ),
+    "texts.csv": _cols("ID", "Name", "Description", Source=SEMICOLON_LIST, Metadata=JSON),
+    "speakers.csv": _cols("ID", "Name"),
+    "exampleparts.csv": _cols("ID", "Wordform_ID", "Example_ID", "Index"),
+    "chapters.csv": _cols("ID", "Name", "Description", "Number"),
+    "topics.csv": _cols("ID", "Name", "Description", References=JSON),
+    "abbreviations.csv": _cols("ID", "Description"),
+}
+
+
+def _word(rng, length):
+    return "".join(rng.choice(SEGMENTS) for _ in range(length))
+
+
+def make_dataset(
+    path,
+    wordforms=1000,
+    examples=200,
+    texts=5,
+    chapters=5,
+    links_per_chapter=50,
+    morphs=None,
+    seed=1,
+):
+    """Write a synthetic CLDF dataset to ``path`` and return it."""
+    rng = random.Random(seed)
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    morphs = morphs or max(wordforms // 5, 10)
+    stems = max(morphs // 2, 5)
+
+    ds = Generic.in_dir(path)
+    ds.properties["dc:title"] = "Synthetic grammar"
+    ds.properties["dc:license"] = "CC-BY-4.0"
+    ds.properties["dc:identifier"] = "https://example.org/synthetic"
+    ds.add_component("LanguageTable")
+    ds.add_component("ParameterTable")
+    ds.add_component("ContributionTable")
+    ds.add_component("MediaTable")
+    ds.add_component(
+        "ExampleTable",
+        "Speaker_ID",
+        "Text_ID",
+        {"name": "Sentence_Number", "datatype": "integer"},
+        {"name": "Phrase_Number", "datatype": "integer"},
+        {"name": "Source", "separator": "; "},
+        "Media_ID",
+        "Contribution_ID",
+    )
+    for url, cols in TABLES.items():
+        ds.add_table(url, *cols)
+    ds.add_sources(
+        "@book{src1,\n  author = {Doe, Jane},\n  year = {2020},\n  title = {A grammar}\n}"
+    )
+
+    lg = "synth"
+    data = {key: [] for key in list(TABLES) + ["LanguageTable", "ParameterTable"]}
+    data.update({"ContributionTable": [], "MediaTable": [], "ExampleTable": []})
+    data["contributors.csv"].append(
+        {"ID": "jd", "Name": "Jane Doe", "Email": "jd@example.org", "Url": None, "Order": "1"}
+    )
+    data["ContributionTable"].append(
+        {"ID": "main", "Name": "Main", "Description": "Main", "Contributor": "jd"}
+    )
+    data["LanguageTable"].append(
+        {"ID": lg, "Name": "Synthetic", "Latitude": 0.0, "Longitude": 0.0}
+    )
+    for i, seg in enumerate(SEGMENTS):
+        data["phonemes.csv"].append({"ID": f"ph{i}", "Name": seg})
+    for pos in ["n", "v", "adj"]:
+        data["partsofspeech.csv"].append(
+            {"ID": pos, "Name": pos, "Description": pos, "Language_ID": lg}
+        )
+    for gloss in GLOSSES:
+        data["glosses.csv"].append({"ID": gloss.lower(), "Name": gloss})
+        data["abbreviations.csv"].append({"ID": gloss, "Description": gloss.lower()})
+
+    n_roots = max(morphs - len(GLOSSES), 1)
+    morph_forms = {}
+    for i in range(n_roots):
+        data["ParameterTable"].append({"ID": f"p{i}", "Name": f"meaning {i}"})
+        data["morphemes.csv"].append(
+            {
+                "ID": f"mm{i}",
+                "Name": _word(rng, 2),
+                "Language_ID": lg,
+                "Contribution_ID": "main",
+                "Parameter_ID": [f"p{i}"],
+                "Source": ["src1[12]"],
+                "References": [{"Chapter": "ch1", "ID": "intro", "Label": "Intro"}]
+                if i % 10 == 0
+                else None,
+            }
+        )
+        morph_forms[f"m{i}"] = _word(rng, 2)
+        data["morphs.csv"].append(
+            {
+                "ID": f"m{i}",
+                "Name": morph_forms[f"m{i}"],
+                "Language_ID": lg,
+                "Contribution_ID": "main",
+                "Part_Of_Speech": rng.choice(["n", "v", "adj"]),
+                "Morpheme_ID": f"mm{i}",
+                "Parameter_ID": [f"p{i}"],
+                "Source": [],
+            }
+        )
+    for gloss in GLOSSES:
+        mid = f"sfx-{gloss.lower()}"
+        morph_forms[mid] = "-" + _word(rng, 1)
+        data["morphs.csv"].append(
+            {
+                "ID": mid,
+                "Name": morph_forms[mid],
+                "Language_ID": lg,
+                "Morpheme_ID": None,
+                "Parameter_ID": [],
+                "Source": [],
+            }
+        )
+
+    for cat, values in {"num": ["SG", "PL"], "tense": ["PST", "FUT"]}.items():
+        data["inflectionalcategories.csv"].append(
+            {"ID": cat, "Name": cat, "Description": cat, "Value_Order": values}
+        )
+        for val in values:
+            data["inflectionalvalues.csv"].append(
+                {"ID": val.lower(), "Name": val, "Category_ID": cat, "Gloss_ID": val.lower()}
+            )
+    data["derivationalprocesses.csv"].append(
+        {"ID": "nmlz", "Name": "nominalization", "Description": "", "Language_ID": lg}
+    )
+
+    for i in range(stems):
+        root = f"m{i % n_roots}"
+        data["lexemes.csv"].append(
+            {
+                "ID": f"lx{i}",
+                "Name": morph_forms[root],
+                "Description": f"meaning {i % n_roots}",
+                "Language_ID": lg,
+                "Part_Of_Speech": "n",
+                "Contribution_ID": "main",
+                "Parameter_ID": [],
+                "Paradigm_View": {"x": ["num"], "y": ["tense"]},
+            }
+        )
+        data["stems.csv"].append(
+            {
+                "ID": f"st{i}",
+                "Name": morph_forms[root],
+                "Language_ID": lg,
+                "Contribution_ID": "main",
+                "Lexeme_ID": f"lx{i}",
+                "Parameter_ID": [f"p{i % n_roots}"],
+                "Morpho_Segments": [morph_forms[root]],
+                "Source": [],
+            }
+        )
+        data["stemparts.csv"].append(
+            {
+                "ID": f"st{i}-0",
+                "Stem_ID": f"st{i}",
+                "Morph_ID": root,
+                "Index": "0",
+                "Gloss_ID": [],
+            }
+        )
+        if i > 0 and i % 3 == 0:
+            data["derivations.csv"].append(
+                {
+                    "ID": f"d{i}",
+                    "Process_ID": "nmlz",
+                    "Target_ID": f"st{i}",
+                    "Source_ID": f"st{i - 1}",
+                    "Root_ID": None,
+                    "Stempart_IDs": [f"st{i}-0"],
+                }
+            )
+
+    glosses = {}
+    for i in range(wordforms):
+        stem = i % stems
+        root = f"m{stem % n_roots}"
+        gloss_id = rng.choice(GLOSSES).lower()
+        suffix = f"sfx-{gloss_id}"
+        form = morph_forms[root] + morph_forms[suffix].strip("-")
+        glosses[f"wf{i}"] = f"thing{stem % n_roots}-{gloss_id.upper()}"
+        data["wordforms.csv"].append(
+            {
+                "ID": f"wf{i}",
+                "Language_ID": lg,
+                "Form": form,
+                "Part_Of_Speech": "n",
+                "Contribution_ID": "main",
+                "Media_ID": f"audio{i}" if i % 20 == 0 else None,
+                "Parameter_ID": [f"p{stem % n_roots}"],
+                "Morpho_Segments": [morph_forms[root], morph_forms[suffix]],
+                "Source": ["src1[3]"] if i % 7 == 0 else [],
+                "References": None,
+            }
+        )
+        if i % 20 == 0:
+            data["MediaTable"].append(
+                {
+                    "ID": f"audio{i}",
+                    "Media_Type": "audio/wav",
+                    "Download_URL": f"audio/audio{i}.wav",
+                }
+            )
+        data["wordformparts.csv"].append(
+            {
+                "ID": f"wf{i}-0",
+                "Wordform_ID": f"wf{i}",
+                "Morph_ID": root,
+                "Index": "0",
+                "Gloss_ID": [],
+            }
+        )
+        data["wordformparts.csv"].append(
+            {
+                "ID": f"wf{i}-1",
+                "Wordform_ID": f"wf{i}",
+                "Morph_ID": suffix,
+                "Index": "1",
+                "Gloss_ID": [gloss_id],
+            }
+        )
+        data["wordformstems.csv"].append(
+            {"ID": f"wf{i}-st", "Wordform_ID": f"wf{i}", "Stem_ID": f"st{stem}", "Index": [0]}
+        )
+        if gloss_id in ["sg", "pl", "pst", "fut"]:
+            data["inflections.csv"].append(
+                {
+                    "ID": f"inf{i}",
+                    "Stem_ID": f"st{stem}",
+                    "Value_ID": gloss_id,
+                    "Form_ID": None,
+                    "Wordformpart_ID": [f"wf{i}-1"],
+                }
+            )
+
+    data["speakers.csv"].append({"ID": "spk1", "Name": "Speaker One"})
+    for i in range(texts):
+        data["texts.csv"].append(
+            {
+                "ID": f"txt{i}",
+                "Name": f"Text {i}",
+                "Description": f"Narrative {i}",
+                "Source": [],
+                "Metadata": {"tags": ["narrative"]},
+            }
+        )
+    rows = {row["ID"]: row for row in data["wordforms.csv"]}
+    for i in range(examples):
+        words = [f"wf{rng.randrange(wordforms)}" for _ in range(rng.randint(2, 8))]
+        analyzed = ["".join(rows[w]["Morpho_Segments"]) for w in words]
+        data["ExampleTable"].append(
+            {
+                "ID": f"ex{i}",
+                "Language_ID": lg,
+                "Primary_Text": " ".join(rows[w]["Form"] for w in words),
+                "Analyzed_Word": analyzed,
+                "Gloss": [glosses[w] for w in words],
+                "Translated_Text": f"translation {i}",
+                "Speaker_ID": "spk1",
+                "Text_ID": f"txt{i % texts}" if texts else None,
+                "Sentence_Number": i // max(texts, 1) + 1,
+                "Phrase_Number": 1,
+                "Source": [],
+                "Contribution_ID": "main",
+            }
+        )
+        for idx, word in enumerate(words):
+            data["exampleparts.csv"].append(
+                {
+                    "ID": f"ex{i}-{idx}",
+                    "Wordform_ID": word,
+                    "Example_ID": f"ex{i}",
+                    "Index": str(idx),
+                }
+            )
+
+    link_targets = ["morphs.csv", "morphemes.csv", "wordforms.csv", "lexemes.csv"]
+    for i in range(chapters):
+        paragraphs = [f"# Chapter {i + 1}", "", "## Introduction {#intro}", ""]
+        for j in range(links_per_chapter):
+            fname = link_targets[j % len(link_targets)]
+            count = len(data[fname])
+            obj = data[fname][rng.randrange(count)]["ID"]
+            if j % 5 == 4:
+                ids = ",".join(
+                    data[fname][rng.randrange(count)]["ID"] for _ in range(4)
+                )
+                paragraphs.append(f"Compare []({fname}?ids={ids}#cldf:__all__).")
+            else:
+                paragraphs.append(f"See []({fname}#cldf:{obj}).")
+            if j % 10 == 0 and examples:
+                paragraphs.append(f"\n[](ExampleTable#cldf:ex{rng.randrange(examples)})\n")
+        data["chapters.csv"].append(
+            {
+                "ID": f"ch{i + 1}",
+                "Name": f"Chapter {i + 1}",
+                "Description": "\n".join(paragraphs),
+                "Number": str(i + 1),
+            }
+        )
+    data["chapters.csv"].append(
+        {
+            "ID": "landingpage",
+            "Name": "Landing page",
+            "Description": "Welcome to the [synthetic grammar](ChapterTable#cldf:ch1).",
+            "Number": None,
+        }
+    )
+    data["topics.csv"].append(
+        {
+            "ID": "intro",
+            "Name": "Introduction",
+            "Description": "",
+            "References": [{"Chapter": "ch1", "ID": "intro", "Label": "Intro"}],
+        }
+    )
+    ds.write(**data)
+    return ds
+
+
+def _edit_table(path, edit):
+    with path.open(newline="", encoding="utf8") as f:
+        reader = csv.DictReader(f)
+        fields, rows = reader.fieldnames, list(reader)
+    rows = edit(rows)
+    with path.open("w", newline="", encoding="utf8") as f:
+        writer = csv.DictWriter(f, fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def edit_dataset(path, examples=10, seed=2):
+    """Make the kind of edits an incremental import is meant for to a dataset written
+    by ``make_dataset``: change the translation of some examples, delete one example
+    and add a wordform, and touch a chapter, a meaning, a text tag and a gloss link."""
+    rng = random.Random(seed)
+    path = Path(path)
+
+    def edit_examples(rows):
+        for row in rng.sample(rows[:-1], min(examples, len(rows) - 1)):
+            row["Translated_Text"] += " (revised)"
+        return rows[:-1]
+
+    _edit_table(path / "examples.csv", edit_examples)
+    with (path / "examples.csv").open(encoding="utf8") as f:
+        remaining = {row["ID"] for row in csv.DictReader(f)}
+    _edit_table(
+        path / "exampleparts.csv",
+        lambda rows: [r for r in rows if r["Example_ID"] in remaining],
+    )
+
+    def edit_wordforms(rows):
+        new = dict(rows[0], ID="wf-new", Form=rows[0]["Form"] + "a", Media_ID="")
+        return rows + [new]
+
+    _edit_table(path / "wordforms.csv", edit_wordforms)
+
+    def edit_wordformparts(rows):
+        rows[1]["Gloss_ID"] = "pl"
+        new = [dict(r, ID=f"wf-new-{i}", Wordform_ID="wf-new") for i, r in enumerate(rows[:2])]
+        return rows + new
+
+    _edit_table(path / "wordformparts.csv", edit_wordformparts)
+
+    def edit_chapters(rows):
+        rows[0]["Description"] += "\n\nA new paragraph."
+        return rows
+
+    _edit_table(path / "chapters.csv", edit_chapters)
+
+    def edit_parameters(rows):
+        rows[0]["Name"] = "revised meaning"
+        return rows
+
+    _edit_table(path / "parameters.csv", edit_parameters)
+
+    def edit_texts(rows):
+        rows[0]["Metadata"] = '{"tags": ["dialogue"]}'
+        return rows
+
+    _edit_table(path / "texts.csv", edit_texts)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--wordforms", type=int, default=1000)
+    parser.add_argument("--examples", type=int, default=200)
+    parser.add_argument("--texts", type=int, default=5)
+    parser.add_argument("--chapters", type=int, default=5)
+    parser.add_argument("--links-per-chapter", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(args)
+    ds = make_dataset(
+        args.path,
+        wordforms=args.wordforms,
+        examples=args.examples,
+        texts=args.texts,
+        chapters=args.chapters,
+        links_per_chapter=args.links_per_chapter,
+        seed=args.seed,
+    )
+    print(ds.tablegroup._fname)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Helpers shared by the benchmark scripts."""
+import argparse
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import transaction
+from clld.cliutil import SessionContext
+from clld.db.meta import Base
+from pycldf import Dataset
+from pyramid.scripting import prepare
+
+import indicogram
+from indicogram.scripts import initializedb
+
+
+def run_prime_cache(args):
+    """Run ``prime_cache`` with a request of the app, like ``clld initdb`` does."""
+    args.env = prepare(registry=indicogram.main({}, **args.settings).registry)
+    try:
+        with transaction.manager:
+            initializedb.prime_cache(args)
+    finally:
+        args.env["closer"]()
+
+
+def run_import(metadata, db_path, prime_cache=True, **options):
+    """Import the CLDF dataset at ``metadata`` into a fresh SQLite db at ``db_path``,
+    the way ``clld initdb`` does. ``options`` are passed as import options (see
+    ``initializedb.get_option``)."""
+    args = argparse.Namespace(
+        cldf=Dataset.from_metadata(metadata),
+        settings={"sqlalchemy.url": f"sqlite:///{db_path}"},
+        **options,
+    )
+    with SessionContext(args.settings):
+        with transaction.manager:
+            initializedb.main(args)
+        if prime_cache:
+            run_prime_cache(args)
+    return args
+
+
+def run_update(metadata, db_path, prime_cache=True):
+    """Apply the changes to the CLDF dataset at ``metadata`` to the db at ``db_path``,
+    the way ``indicogram update`` does."""
+    args = argparse.Namespace(
+        cldf=Dataset.from_metadata(metadata),
+        settings={"sqlalchemy.url": f"sqlite:///{db_path}"},
+    )
+    with SessionContext(args.settings):
+        with transaction.manager:
+            initializedb.update(args)
+        if prime_cache:
+            run_prime_cache(args)
+    return args
+
+
+@contextmanager
+def timer(results, key):
+    start = time.perf_counter()
+    yield
+    results[key] = time.perf_counter() - start
+
+
+# jsondata keys which differ between any two imports: the import stamp, and the pks
+# of the sentences of texts
+DERIVED_JSONDATA = {"dataset": "import_stamp", "text": "sentence_pks"}
+
+
+def canonical_dump(
+    db_path,
+    exclude=("created", "updated"),
+    skip=(
+        "importedtable",
+        "importedrow",
+        "importedobject",
+        "renderedmarkdown",
+        "renderedexample",
+        "renderedparadigm",
+        "searchdocument",
+        "concordancekey",
+        "concordancehit",
+        "derivationclosure",
+    ),
+):
+    """Return the content of all tables with primary keys replaced by a canonical
+    representation of the referenced row (its ``id`` where available), so that two
+    databases with the same object graph compare equal regardless of pk values.
+    The tables in ``skip`` (by default the import manifest, pre-rendered content, the
+    search index and the concordance) are left out."""
+    con = sqlite3.connect(db_path)
+    keys, dump = {}, {}
+    for table in Base.metadata.sorted_tables:
+        if table.name in skip:
+            continue
+        try:
+            cursor = con.execute(f'SELECT * FROM "{table.name}"')
+        except sqlite3.OperationalError:  # table does not exist in this db
+            continue
+        names = [d[0] for d in cursor.description]
+        fks = {
+            c.name: fk.column.table.name for c in table.columns for fk in c.foreign_keys
+        }
+        rows, table_keys, self_refs = [], {}, []
+        for values in cursor:
+            row = dict(zip(names, values))
+            pk = row.pop("pk")
+            for col in exclude:
+                row.pop(col, None)
+            if table.name in DERIVED_JSONDATA:
+                jsondata = json.loads(row["jsondata"] or "{}")
+                jsondata.pop(DERIVED_JSONDATA[table.name], None)
+                row["jsondata"] = json.dumps(jsondata, sort_keys=True)
+            for col, target in fks.items():
+                if row.get(col) is None:
+                    continue
+                if target == table.name:
+                    self_refs.append((row, col))
+                else:
+                    row[col] = keys[target][row[col]]
+            table_keys[pk] = row.get("id") or json.dumps(
+                {k: repr(v) for k, v in sorted(row.items())}
+            )
+            rows.append(row)
+        for row, col in self_refs:
+            row[col] = table_keys[row[col]]
+        keys[table.name] = table_keys
+        dump[table.name] = sorted(
+            json.dumps({k: repr(v) for k, v in sorted(row.items())}) for row in rows
+        )
+    return dump
+
+
+def print_table(rows, header):
+    widths = [
+        max(len(str(x)) for x in [h] + [row[i] for row in rows])
+        for i, h in enumerate(header)
+    ]
+    print("  ".join(str(h).ljust(w) for h, w in zip(header, widths)))
+    for row in rows:
+        print("  ".join(str(x).ljust(w) for x, w in zip(row, widths)))
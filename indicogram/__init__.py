@@ -12,8 +12,11 @@ from clld_document_plugin.models import Document
 from clld_markdown_plugin import comma_and_list
 from clld_morphology_plugin.models import POS, Lexeme, Morph, Morpheme, Wordform, Form
 from pyramid.config import Configurator
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload
 from clld.web.util.helpers import link
-from indicogram import interfaces, models
+from indicogram import datatables, interfaces, interlinear, models, views
+from indicogram.cache import render_cache
 
 boolmap = {"False": False, "True": True}
 
@@ -35,15 +38,39 @@ table_dic = {
 }
 
 
+def get_units(session, model, ids):
+    """Fetch the units with the given ids with a single query, with their language and
+    source loaded along."""
+    options = [
+        joinedload(getattr(model, rel))
+        for rel in ["language", "source"]
+        if rel in inspect(model).relationships
+    ]
+    units = {
+        unit.id: unit
+        for unit in session.query(model).filter(model.id.in_(set(ids))).options(*options)
+    }
+    for unit_id in ids:
+        if unit_id not in units:
+            raise ValueError(unit_id)
+    return units
+
+
 def render_lfts(req, objid, table, session, **kwargs):
     model, route = table_dic[table]
     if "ids" in kwargs:
         ids = kwargs.pop("ids")[0].split(",")
-        return comma_and_list(
-            [render_lfts(req, unit_id, table, session, **kwargs) for unit_id in ids]
-        )
-    unit = session.query(model).filter(model.id == objid).first()
-    url = req.route_url(route, id=objid, **kwargs)
+    else:
+        ids = [objid]
+    units = get_units(session, model, ids)
+    md_strs = [render_unit(req, units[unit_id], route, **kwargs) for unit_id in ids]
+    if len(md_strs) == 1:
+        return md_strs[0]
+    return comma_and_list(md_strs)
+
+
+def render_unit(req, unit, route, **kwargs):
+    url = req.route_url(route, id=unit.id, **kwargs)
     with_translation = get_kwarg("with_translation", kwargs, bool=True, default=True)
     with_language = "with_language" in kwargs
     with_source = "with_source" in kwargs
@@ -92,6 +119,10 @@ def render_lex(req, objid, table, session, **kwargs):
 
 def main(global_config, **settings):
     """This function returns a Pyramid WSGI application."""
+    render_cache.resize(int(settings.get("indicogram.render_cache_size", 1024)))
+    datatables.datatable_cache.resize(
+        int(settings.get("indicogram.datatable_cache_size", 1024))
+    )
     settings["clld_markdown_plugin"] = {
         "model_map": {
             TextTable["url"]: {
@@ -111,21 +142,38 @@ def main(global_config, **settings):
             POSTable["url"]: {"route": "pos", "model": POS},
         },
         "renderer_map": {
-            "FormTable": render_lfts,
-            MorphTable["url"]: render_lfts,
-            MorphemeTable["url"]: render_lfts,
-            WordformTable["url"]: render_lfts,
-            LexemeTable["url"]: render_lfts,
+            table: render_cache.wrap(render_lfts)
+            for table in [
+                "FormTable",
+                MorphTable["url"],
+                MorphemeTable["url"],
+                WordformTable["url"],
+                LexemeTable["url"],
+            ]
         },
         "extensions": [],
     }
 
     config = Configurator(settings=settings)
     config.include("clld.web.app")
+    config.include("indicogram.readonly")
     config.include("clld_corpus_plugin")
     config.include("clld_morphology_plugin")
     config.include("clld_markdown_plugin")
     config.include("clld_document_plugin")
+    config.include("indicogram.httpcache")
+    config.include("indicogram.metrics")
+    # replace the datatables and view registered by the plugins
+    config.register_datatable("sentences", datatables.Sentences)
+    config.register_datatable("wordforms", datatables.Wordforms)
+    config.register_datatable("morphs", datatables.Morphs)
+    config.register_datatable("morphemes", datatables.Morphemes)
+    config.register_datatable("lexemes", datatables.Lexemes)
+    config.register_datatable("stems", datatables.Stems)
+    config.add_view(views.audio, route_name="audio_route")
+    config.registry.settings["clld_markdown_plugin"]["renderer_map"][
+        "ExampleTable"
+    ] = interlinear.render_ex
 
     config.register_resource(
         "phoneme", models.Phoneme, interfaces.IPhoneme, with_index=True
@@ -136,4 +184,35 @@ def main(global_config, **settings):
     config.add_page("morphosyntax")
     config.add_page("lexicon")
 
+    config.add_route("text_sentences", "/texts/{id}/sentences")
+    config.add_view(views.text_sentences, route_name="text_sentences")
+
+    config.add_route("search", "/search")
+    config.add_view(views.search_results, route_name="search", renderer="search.mako")
+    config.add_route("search_json", "/search.json")
+    config.add_view(views.search_results, route_name="search_json", renderer="json")
+
+    # the JSON routes first, "{id}" would match "<id>.json"
+    config.add_route("concordances_json", "/concordance.json")
+    config.add_view(
+        views.concordance_index, route_name="concordances_json", renderer="json"
+    )
+    config.add_route("concordances", "/concordance")
+    config.add_view(
+        views.concordance_index,
+        route_name="concordances",
+        renderer="concordance_index.mako",
+    )
+    config.add_route("concordance_json", "/concordance/{kind}/{id}.json")
+    config.add_view(views.concordance, route_name="concordance_json", renderer="json")
+    config.add_route("concordance", "/concordance/{kind}/{id}")
+    config.add_view(
+        views.concordance, route_name="concordance", renderer="concordance.mako"
+    )
+
+    config.add_route("render_cache", "/_render_cache")
+    config.add_view(views.render_cache_info, route_name="render_cache", renderer="json")
+    config.add_route("metrics", "/metrics")
+    config.add_view(views.metrics_exposition, route_name="metrics")
+
     return config.make_wsgi_app()
@@ -0,0 +1,40 @@
+"""
+Commands for maintaining an indicogram database, run as ``indicogram <command>``.
+"""
+import sys
+import contextlib
+
+from clldutils.clilib import register_subcommands, get_parser_and_subparsers
+from clldutils.loglib import Logging
+
+import indicogram.commands
+
+
+def main(args=None, catch_all=False, parsed_args=None, log=None):
+    parser, subparsers = get_parser_and_subparsers("indicogram")
+    register_subcommands(subparsers, indicogram.commands)
+
+    args = parsed_args or parser.parse_args(args=args)
+
+    if not hasattr(args, "main"):  # pragma: no cover
+        parser.print_help()
+        return 1
+
+    with contextlib.ExitStack() as stack:
+        if not log:  # pragma: no cover
+            stack.enter_context(Logging(args.log, level=args.log_level))
+        else:
+            args.log = log
+        try:
+            return args.main(args) or 0
+        except KeyboardInterrupt:  # pragma: no cover
+            return 0
+        except Exception as e:  # pragma: no cover
+            if catch_all:
+                print(e)
+                return 1
+            raise
+
+
+if __name__ == "__main__":  # pragma: no cover
+    sys.exit(main() or 0)
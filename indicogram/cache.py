@@ -0,0 +1,158 @@
+"""Caches for content rendered from markdown: the cldf links in chapters, kept per
+process, and the descriptions of the dataset and documents, pre-rendered by
+``prime_cache``."""
+import functools
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+from clld.db.meta import DBSession
+from clld_markdown_plugin import markdown as render_markdown
+
+from indicogram.metrics import timed
+from indicogram.models import RenderedMarkdown
+from indicogram.util import lazy_audio
+
+# the markdown renderer of clld_markdown_plugin, timed for the request metrics
+markdown = timed("markdown")(render_markdown)
+
+CacheInfo = namedtuple("CacheInfo", "hits misses evictions maxsize currsize version")
+
+
+class RenderCache:
+    """A bounded LRU cache for the strings returned by the renderers in
+    ``renderer_map``, keyed by table, id, query and application URL.
+
+    The database does not change between imports, so entries stay valid until the
+    import stamp of the dataset (see ``dataset_properties`` in
+    ``indicogram.scripts.initializedb``) changes, which empties the cache.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.version = None
+        self.lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def resize(self, maxsize):
+        with self.lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.version = None
+            self.hits = self.misses = self.evictions = 0
+
+    def info(self):
+        return CacheInfo(
+            self.hits,
+            self.misses,
+            self.evictions,
+            self.maxsize,
+            len(self.entries),
+            self.version,
+        )
+
+    def _evict(self):
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, version, key):
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.version = version
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            self.misses += 1
+            return None
+
+    def set(self, version, key, value):
+        with self.lock:
+            if version == self.version:
+                self.entries[key] = value
+                self._evict()
+
+    def wrap(self, renderer):
+        """Cache the results of a ``renderer_map`` function."""
+
+        @functools.wraps(renderer)
+        def cached(req, objid, table, session, **kwargs):
+            if not self.maxsize:
+                return renderer(req, objid, table, session, **kwargs)
+            version = req.dataset.jsondata.get("import_stamp")
+            key = (
+                table,
+                objid,
+                tuple(sorted((k, tuple(v)) for k, v in kwargs.items())),
+                req.application_url,
+            )
+            res = self.get(version, key)
+            if res is None:
+                res = renderer(req, objid, table, session, **kwargs)
+                self.set(version, key, res)
+            return res
+
+        return cached
+
+
+render_cache = RenderCache()
+
+
+# application URL of the request used for pre-rendering, replaced when serving
+PRERENDER_HOST = "prerendered.invalid"
+PRERENDER_URL = f"http://{PRERENDER_HOST}"
+
+
+def markdown_key(obj):
+    return f"{obj.__table__.name}/{obj.id}"
+
+
+def markdown_digest(dataset, obj):
+    """Hash of the markdown and the import stamp, the content of the links in it may
+    change with every import."""
+    content = [dataset.jsondata.get("import_stamp") or "", obj.description or ""]
+    return hashlib.sha1("\n".join(content).encode("utf8")).hexdigest()
+
+
+@timed("markdown")
+def rendered_markdown(request, obj):
+    """The description of ``obj`` as HTML, served from the pre-rendered version if it
+    is up to date."""
+    rendered = (
+        DBSession.query(RenderedMarkdown)
+        .filter(RenderedMarkdown.key == markdown_key(obj))
+        .one_or_none()
+    )
+    if rendered and rendered.digest == markdown_digest(request.dataset, obj):
+        return rendered.html.replace(PRERENDER_URL, request.application_url)
+    return lazy_audio(markdown(request, obj.description))
+
+
+def prepare_prerender(request):
+    """Modify ``request`` to produce URLs which can be relocated to the application
+    URL of the requests pre-rendered content is served to."""
+    request.environ.update({"wsgi.url_scheme": "http", "HTTP_HOST": PRERENDER_HOST})
+    request.environ.pop("SCRIPT_NAME", None)
+
+
+def prerender_markdown(request, objs):
+    """Render the descriptions of ``objs`` and store them, replacing all previously
+    rendered content."""
+    prepare_prerender(request)
+    DBSession.query(RenderedMarkdown).delete()
+    for obj in objs:
+        DBSession.add(
+            RenderedMarkdown(
+                key=markdown_key(obj),
+                digest=markdown_digest(request.dataset, obj),
+                html=lazy_audio(markdown(request, obj.description or "")),
+            )
+        )
+    DBSession.flush()
@@ -0,0 +1,42 @@
+"""
+Export the app as static HTML and JSON files, to be served without the app.
+"""
+from clld.cliutil import AppConfig
+from clldutils.clilib import PathType
+
+from indicogram.scripts.export import export_site
+
+
+def register(parser):
+    parser.add_argument(
+        "config-uri",
+        action=AppConfig,
+        help="ini file providing app config",
+    )
+    parser.add_argument(
+        "--output",
+        type=PathType(type="dir", must_exist=False),
+        default="site",
+        help="directory the files are written to (default: site)",
+    )
+    parser.add_argument(
+        "--base-url",
+        default="",
+        help="URL the files will be served from (default: the root of the server)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of worker processes rendering pages",
+    )
+
+
+def run(args):
+    written = export_site(
+        str(getattr(args, "config-uri")),
+        args.output,
+        base_url=args.base_url.rstrip("/"),
+        jobs=args.jobs,
+    )
+    args.log.info(f"{written} pages written to {args.output}")
@@ -0,0 +1,19 @@
+"""
+Initialize the database, like `clld initdb`, with additional import options.
+"""
+from clld.commands import initdb
+
+
+def register(parser):
+    initdb.register(parser)
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="number of worker processes parsing CLDF tables "
+        "(default: indicogram.jobs in the ini file or 1)",
+    )
+
+
+def run(args):
+    return initdb.run(args)
@@ -0,0 +1,40 @@
+"""
+Apply the changes made to a CLDF dataset since the last import to the database.
+
+The last import must have recorded a manifest, see `indicogram.manifest` in the README.
+"""
+import transaction
+from clld.cliutil import BootstrappedAppConfig, SessionContext
+from clldutils.clilib import PathType
+from pycldf import Dataset
+
+from indicogram.scripts import initializedb
+
+
+def register(parser):
+    parser.add_argument(
+        "config-uri",
+        action=BootstrappedAppConfig,
+        help="ini file providing app config",
+    )
+    parser.add_argument(
+        "--cldf",
+        type=PathType(type="file"),
+        required=True,
+        help="CLDF metadata file of the dataset",
+    )
+    parser.add_argument(
+        "--skip-prime-cache",
+        action="store_true",
+        default=False,
+    )
+
+
+def run(args):
+    args.cldf = Dataset.from_metadata(args.cldf)
+    with SessionContext(args.settings):
+        with transaction.manager:
+            initializedb.update(args)
+        if not args.skip_prime_cache:
+            with transaction.manager:
+                initializedb.prime_cache(args)
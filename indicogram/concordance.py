@@ -0,0 +1,174 @@
+"""A concordance of the morphs, morphemes and glosses of the examples.
+
+Finding the examples containing a morph or gloss means joining the words of the
+examples with their wordforms, the parts of the wordforms and their glosses.
+``prime_cache`` does these joins once, storing every word of an example a morph,
+morpheme or gloss occurs in as a ``ConcordanceHit`` and the number of its occurrences
+with its ``ConcordanceKey``; ``concordance_lines`` then looks up a page of occurrences
+with a single query and shows them as keyword in context.
+"""
+from collections import namedtuple
+
+from clld.db.meta import DBSession
+from clld.db.models.common import Sentence
+from clld_corpus_plugin.models import SentencePart
+from clld_morphology_plugin.models import (
+    Gloss,
+    Morph,
+    Morpheme,
+    WordformPart,
+    WordformPartGloss,
+)
+from sqlalchemy import and_, distinct, func, literal, select
+from zope.sqlalchemy import mark_changed
+
+from indicogram.models import ConcordanceHit, ConcordanceKey
+
+PAGE_SIZE = 50
+# the number of words shown left and right of the keyword
+CONTEXT = 5
+
+ConcordanceKind = namedtuple("ConcordanceKind", "label route model")
+
+KINDS = {
+    "morph": ConcordanceKind("Morphs", "morph", Morph),
+    "morpheme": ConcordanceKind("Morphemes", "morpheme", Morpheme),
+    "gloss": ConcordanceKind("Glosses", "gloss", Gloss),
+}
+
+
+def _occurrences(kind):
+    """The distinct pks of the morphs (morphemes, glosses) in the examples, with the
+    example and the position of the word."""
+    query = select(
+        SentencePart.sentence_pk, SentencePart.index.label("position")
+    ).join_from(
+        SentencePart, WordformPart, WordformPart.form_pk == SentencePart.form_pk
+    )
+    if kind == "morph":
+        key = WordformPart.morph_pk
+    elif kind == "morpheme":
+        query = query.join(Morph, Morph.pk == WordformPart.morph_pk)
+        key = Morph.morpheme_pk
+    else:
+        query = query.join(
+            WordformPartGloss, WordformPartGloss.formpart_pk == WordformPart.pk
+        )
+        key = WordformPartGloss.gloss_pk
+    return (
+        query.add_columns(key.label("obj_pk"))
+        .where(
+            key != None,  # noqa: E711
+            SentencePart.sentence_pk != None,  # noqa: E711
+            SentencePart.index != None,  # noqa: E711
+        )
+        .distinct()
+        .subquery()
+    )
+
+
+def build_concordance():
+    """Replace the concordance with the occurrences in the current examples."""
+    DBSession.execute(ConcordanceHit.__table__.delete())
+    DBSession.execute(ConcordanceKey.__table__.delete())
+    for kind, spec in KINDS.items():
+        occurrences, model = _occurrences(kind), spec.model
+        DBSession.execute(
+            ConcordanceKey.__table__.insert().from_select(
+                ["kind", "obj_pk", "obj_id", "name", "tokens", "sentences"],
+                select(
+                    literal(kind),
+                    model.pk,
+                    model.id,
+                    model.name,
+                    func.count(),
+                    func.count(distinct(occurrences.c.sentence_pk)),
+                )
+                .join_from(occurrences, model, model.pk == occurrences.c.obj_pk)
+                .group_by(model.pk, model.id, model.name),
+            )
+        )
+        DBSession.execute(
+            ConcordanceHit.__table__.insert().from_select(
+                ["key_pk", "sentence_pk", "position"],
+                select(
+                    ConcordanceKey.pk, occurrences.c.sentence_pk, occurrences.c.position
+                ).join_from(
+                    occurrences,
+                    ConcordanceKey,
+                    and_(
+                        ConcordanceKey.kind == kind,
+                        ConcordanceKey.obj_pk == occurrences.c.obj_pk,
+                    ),
+                ),
+            )
+        )
+    mark_changed(DBSession())
+
+
+def concordance_key(kind, obj_id):
+    """The concordance key of the morph (morpheme, gloss) ``obj_id``, if it occurs in
+    any example."""
+    return (
+        DBSession.query(ConcordanceKey)
+        .filter(ConcordanceKey.kind == kind, ConcordanceKey.obj_id == obj_id)
+        .one_or_none()
+    )
+
+
+def frequencies(kind=None, page=1, size=PAGE_SIZE):
+    """The number of concordance keys (of ``kind``) and the ones on ``page``, the most
+    frequent first."""
+    query = DBSession.query(ConcordanceKey)
+    if kind:
+        query = query.filter(ConcordanceKey.kind == kind)
+    keys = (
+        query.order_by(ConcordanceKey.tokens.desc(), ConcordanceKey.pk)
+        .limit(size)
+        .offset((page - 1) * size)
+        .all()
+    )
+    return query.count(), keys
+
+
+Line = namedtuple("Line", "sentence_id left keyword gloss right translation")
+
+
+def _words(content):
+    return content.split("\t") if content else []
+
+
+def kwic(position, sentence_id, name, analyzed, gloss, translation, context=CONTEXT):
+    """The word at ``position`` of an example, with ``context`` words to the left and
+    right."""
+    words = _words(analyzed) or (name or "").split()
+    glosses = _words(gloss)
+    return Line(
+        sentence_id,
+        " ".join(words[max(position - context, 0) : position]),
+        words[position] if position < len(words) else "",
+        glosses[position] if position < len(glosses) else "",
+        " ".join(words[position + 1 : position + 1 + context]),
+        translation,
+    )
+
+
+def concordance_lines(key, page=1, size=PAGE_SIZE):
+    """The occurrences of ``key`` on ``page`` as keyword in context lines, in the
+    order of the examples."""
+    rows = (
+        DBSession.query(
+            ConcordanceHit.position,
+            Sentence.id,
+            Sentence.name,
+            Sentence.analyzed,
+            Sentence.gloss,
+            Sentence.description,
+        )
+        .join(Sentence, Sentence.pk == ConcordanceHit.sentence_pk)
+        .filter(ConcordanceHit.key_pk == key.pk)
+        .order_by(ConcordanceHit.sentence_pk, ConcordanceHit.position)
+        .limit(size)
+        .offset((page - 1) * size)
+    )
+    return [kwic(*row) for row in rows]
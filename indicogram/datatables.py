@@ -1,9 +1,257 @@
-from clld.web.datatables.base import DataTable, LinkCol
+from clld.db.meta import DBSession
+from clld.web.datatables.base import (
+    DISPLAY_LENGTH,
+    DISPLAY_LIMIT,
+    Col,
+    DataTable,
+    LinkCol,
+    type_coerce,
+)
+from clld_corpus_plugin.datatables import SentencesWithAudio as BaseSentences
+from clld_morphology_plugin.datatables import AudioCol as BaseAudioCol
+from clld_morphology_plugin.datatables import Lexemes as BaseLexemes
+from clld_morphology_plugin.datatables import Morphemes as BaseMorphemes
+from clld_morphology_plugin.datatables import Morphs as BaseMorphs
+from clld_morphology_plugin.datatables import Stems as BaseStems
+from clld_morphology_plugin.datatables import Wordforms as BaseWordforms
+from clld_morphology_plugin.models import Wordform
+from sqlalchemy import and_, or_, tuple_
+from sqlalchemy.orm import ColumnProperty, undefer
+
+from indicogram import models
+from indicogram.cache import RenderCache
+from indicogram.util import audio_button
+
+# row counts and page boundaries of the data tables, resized from the settings
+datatable_cache = RenderCache()
+
+
+def after(keys, values, desc, nulls_first):
+    """A clause selecting the rows following the row with ``values`` for the sort
+    ``keys``, the last of which is the primary key. Only the first of two keys can be
+    ``NULL``, sorted before or after all values."""
+    pk, pk_value = keys[-1], values[-1]
+    if len(keys) == 1:
+        return pk < pk_value if desc else pk > pk_value
+    col, value = keys[0], values[0]
+    if value is None:
+        clause = and_(col.is_(None), pk < pk_value if desc else pk > pk_value)
+        return or_(clause, col.isnot(None)) if nulls_first else clause
+    row, boundary = tuple_(col, pk), tuple_(value, pk_value)
+    clause = row < boundary if desc else row > boundary
+    return clause if nulls_first else or_(clause, col.is_(None))
+
+
+class KeysetDataTable(DataTable):
+    """A data table fetching pages after the last row of the previous page instead of
+    skipping rows with OFFSET, and caching its row counts until the next import.
+
+    DataTables requests pages by the number of rows to skip (``iDisplayStart``). The
+    sort key of the last row of every page served is kept, so that the next page is
+    a range scan of the index on the sort key (see ``DATATABLE_INDEXES`` in
+    ``indicogram.models``), and pages further down only skip the rows after the
+    closest page served before. This works for tables sorted by a column of their own
+    model, ties are sorted by primary key; other orders fall back to OFFSET.
+    """
+
+    def _version(self):
+        return self.req.dataset and (self.req.dataset.jsondata or {}).get(
+            "import_stamp"
+        )
+
+    def _cached(self, key, compute):
+        version = self._version()
+        res = datatable_cache.get(version, key)
+        if res is None:
+            res = compute()
+            datatable_cache.set(version, key, res)
+        return res
+
+    def _rows_key(self):
+        """The table and its constraints, identifying the rows it shows."""
+        constraints = []
+        for model in self.__constraints__:
+            obj = getattr(self, self.attr_from_constraint(model))
+            if obj is not None:
+                constraints.append((model.__name__, obj.pk))
+        return (type(self).__name__, tuple(constraints))
+
+    def _search(self, query):
+        """Apply the column filters; return the query and the filter values."""
+        filters, searched = [], []
+        for name, val in self.req.params.items():
+            if val and name.startswith("sSearch_"):
+                try:
+                    colindex = int(name.split("_")[1])
+                    col = self.cols[colindex]
+                    clauses = col.search(val)
+                except (ValueError, IndexError):
+                    clauses = None
+                if clauses is not None:
+                    if not isinstance(clauses, (tuple, list)):
+                        clauses = [clauses]
+                    for clause in clauses:
+                        if clause is not None:
+                            query = query.filter(clause)
+                            filters.append((colindex, col.js_args["sTitle"], val))
+                            searched.append((colindex, val))
+        for _, coltitle, qs in sorted(set(filters)):
+            self.filters.append((coltitle, qs))
+        return query, tuple(sorted(set(searched)))
+
+    def _order(self):
+        """The requested sort order as (expression, descending) pairs."""
+        res = []
+        sorting_cols = type_coerce(int, self.req.params.get("iSortingCols", 0), 0)
+        for index in range(min(sorting_cols, 10)):
+            try:
+                col = self.cols[int(self.req.params.get(f"iSortCol_{index}"))]
+            except (TypeError, ValueError, IndexError):
+                continue
+            if col.js_args.get("bSortable", True):
+                orders = col.order()
+                if orders is not None:
+                    if not isinstance(orders, (tuple, list)):
+                        orders = [orders]
+                    desc = self.req.params.get(f"sSortDir_{index}") == "desc"
+                    res.extend((order, desc) for order in orders)
+        return res
+
+    def _seekable(self, order):
+        """Whether the rows can be sorted by the columns of ``order`` and the primary
+        key, which are then loaded with the rows."""
+        model = self.db_model()
+        if self.default_order() is not model.pk or len(order) > 1:
+            return False
+        return all(
+            isinstance(getattr(expr, "property", None), ColumnProperty)
+            and issubclass(model, expr.class_)
+            for expr, _ in order
+        )
+
+    def get_query(self, limit=DISPLAY_LIMIT, offset=0, undefer_cols=()):
+        """The rows of the requested page, as a list."""
+        model = self.db_model()
+        query = self.base_query(DBSession.query(model).filter(model.active == True))
+        rows_key = self._rows_key()
+        self.count_all = self._cached(("count", rows_key), query.count)
+        query, searched = self._search(query)
+        self.count_filtered = (
+            self._cached(("count", rows_key, searched), query.count)
+            if searched
+            else self.count_all
+        )
+
+        if "iDisplayLength" in self.req.params:
+            limit = type_coerce(int, self.req.params["iDisplayLength"], DISPLAY_LENGTH)
+            limit = min(limit, DISPLAY_LIMIT)
+        limit = DISPLAY_LIMIT if limit == -1 else limit
+        start = type_coerce(int, self.req.params.get("iDisplayStart", offset), offset)
+        if undefer_cols:
+            query = query.options(*(undefer(c) for c in undefer_cols))
+
+        order = self._order()
+        if not self._seekable(order):
+            for expr, desc in order:
+                query = query.order_by(expr.desc() if desc else expr)
+            clauses = self.default_order()
+            if not isinstance(clauses, (list, tuple)):
+                clauses = (clauses,)
+            return query.order_by(*clauses).limit(limit).offset(start).all()
+
+        keys = [expr for expr, _ in order] + [model.pk]
+        desc = bool(order) and order[0][1]
+        query = query.order_by(*(key.desc() if desc else key for key in keys))
+        # the last rows of the pages served, by the number of rows before them
+        boundaries = self._cached(
+            ("boundaries", rows_key, searched, tuple((str(k), desc) for k in keys)),
+            dict,
+        )
+        known = max((n for n in list(boundaries) if n <= start), default=0)
+        if known:
+            # NULL is the smallest value in SQLite, the largest in PostgreSQL
+            sqlite = DBSession.get_bind().dialect.name == "sqlite"
+            query = query.filter(after(keys, boundaries[known], desc, sqlite != desc))
+        rows = query.limit(limit).offset(start - known).all()
+        if rows:
+            boundaries[start + len(rows)] = tuple(
+                getattr(rows[-1], key.key) for key in keys
+            )
+        return rows
+
+
+ONE_SEGMENT = "Wordforms of a single segment are counted as initial and as final."
 
 
 class Phonemes(DataTable):
     def col_defs(self):
-        return [LinkCol(self, "name")]
+        return [
+            LinkCol(self, "name"),
+            Col(self, "tokens", model_col=models.Phoneme.count_tokens),
+            Col(self, "wordforms", model_col=models.Phoneme.count_types),
+            Col(
+                self,
+                "initial",
+                model_col=models.Phoneme.count_initial,
+                sDescription=ONE_SEGMENT,
+            ),
+            Col(self, "medial", model_col=models.Phoneme.count_medial),
+            Col(
+                self,
+                "final",
+                model_col=models.Phoneme.count_final,
+                sDescription=ONE_SEGMENT,
+            ),
+        ]
+
+
+class AudioCol(BaseAudioCol):
+    def format(self, item):
+        if item.audio:
+            return audio_button(item.audio.id)
+        return None
+
+
+class Wordforms(KeysetDataTable, BaseWordforms):
+    """Wordforms, optionally those containing a phoneme."""
+
+    __constraints__ = BaseWordforms.__constraints__ + [models.Phoneme]
+
+    def base_query(self, query):
+        query = super().base_query(query)
+        if self.phoneme:
+            return query.filter(
+                Wordform.segments.any(
+                    models.FormPhoneme.phoneme_pk == self.phoneme.pk
+                )
+            )
+        return query
+
+    def col_defs(self):
+        return [
+            AudioCol(self, col.name) if isinstance(col, BaseAudioCol) else col
+            for col in super().col_defs()
+        ]
+
+
+class Sentences(KeysetDataTable, BaseSentences):
+    pass
+
+
+class Morphs(KeysetDataTable, BaseMorphs):
+    pass
+
+
+class Morphemes(KeysetDataTable, BaseMorphemes):
+    pass
+
+
+class Lexemes(KeysetDataTable, BaseLexemes):
+    pass
+
+
+class Stems(KeysetDataTable, BaseStems):
+    pass
 
 
 def includeme(config):
@@ -0,0 +1,203 @@
+"""Derivational families of roots and stems, computed after importing.
+
+Derivations link a source root or stem with the stem derived from it.
+``clld_morphology_plugin`` renders the stems derived from a root or stem, and the
+lineage of a stem, by following the derivations one at a time, with a few queries
+for every stem. ``prime_cache`` stores the transitive closure of the derivations: a
+row for every root or stem and every stem derived from it, directly or not, with the
+number and the pks of the derivations between them. Families and lineages are then
+fetched with a single query on the closure.
+
+Of several ways of deriving a stem from the same ancestor, the closure keeps the
+shortest, and of those the one with the lowest derivation pks.
+"""
+from collections import defaultdict, deque
+from itertools import islice
+
+from clld.db.meta import DBSession
+from clld.web.util.helpers import link
+from clld.web.util.htmllib import HTML
+from clld_morphology_plugin.models import (
+    Derivation,
+    Morph,
+    StemPart,
+    StemPartDerivation,
+)
+from clld_morphology_plugin.util import dict_to_list, render_derived_from
+from sqlalchemy.orm import joinedload, selectinload
+from zope.sqlalchemy import mark_changed
+
+from indicogram.models import DerivationClosure
+from indicogram.scripts.bulk import BATCH_SIZE, insert_rows
+
+
+def _source(stem_pk, root_pk):
+    if stem_pk is not None:
+        return ("stem", stem_pk)
+    if root_pk is not None:
+        return ("root", root_pk)
+    return None
+
+
+def closure_rows(derivations):
+    """The rows of the closure of ``derivations``, given as (pk, source, target pk)
+    with sources as ("root", pk) or ("stem", pk)."""
+    children = defaultdict(list)
+    for pk, source, target in sorted(derivations):
+        if source is not None:
+            children[source].append((pk, ("stem", target)))
+    for ancestor in list(children):
+        kind, ancestor_pk = ancestor
+        seen = {ancestor}
+        queue = deque([(ancestor, [])])
+        while queue:
+            node, path = queue.popleft()
+            for pk, target in children.get(node, []):
+                if target in seen:
+                    continue
+                seen.add(target)
+                target_path = path + [pk]
+                yield dict(
+                    root_pk=ancestor_pk if kind == "root" else None,
+                    ancestor_pk=ancestor_pk if kind == "stem" else None,
+                    descendant_pk=target[1],
+                    depth=len(target_path),
+                    path=" ".join(map(str, target_path)),
+                    first_pk=target_path[0],
+                    last_pk=pk,
+                )
+                queue.append((target, target_path))
+
+
+def build_closure():
+    """Replace the derivation closure with the closure of the current derivations."""
+    table = DerivationClosure.__table__
+    DBSession.execute(table.delete())
+    rows = closure_rows(
+        (pk, _source(stem_pk, root_pk), target_pk)
+        for pk, stem_pk, root_pk, target_pk in DBSession.query(
+            Derivation.pk,
+            Derivation.source_stem_pk,
+            Derivation.source_root_pk,
+            Derivation.target_pk,
+        )
+    )
+    while True:
+        batch = list(islice(rows, BATCH_SIZE))
+        if not batch:
+            break
+        insert_rows(table, batch)
+    mark_changed(DBSession())
+
+
+def _key(obj):
+    return ("root" if isinstance(obj, Morph) else "stem", obj.pk)
+
+
+def family(obj):
+    """The closure rows of the stems derived from the root or stem ``obj``, with the
+    derivations deriving them, closest first."""
+    ancestor = (
+        DerivationClosure.root_pk
+        if isinstance(obj, Morph)
+        else DerivationClosure.ancestor_pk
+    )
+    return (
+        DBSession.query(DerivationClosure)
+        .filter(ancestor == obj.pk)
+        .options(
+            joinedload(DerivationClosure.last).joinedload(Derivation.target),
+            joinedload(DerivationClosure.last).joinedload(Derivation.process),
+        )
+        .order_by(DerivationClosure.depth, DerivationClosure.last_pk)
+        .all()
+    )
+
+
+def lineage(stem):
+    """The derivations leading from the most distant ancestor of ``stem`` to it."""
+    rows = (
+        DBSession.query(DerivationClosure)
+        .filter(DerivationClosure.descendant_pk == stem.pk)
+        .options(
+            # the plugin declares the optional sources as inner joins
+            joinedload(DerivationClosure.first).joinedload(
+                Derivation.source_root, innerjoin=False
+            ),
+            joinedload(DerivationClosure.first).joinedload(
+                Derivation.source_stem, innerjoin=False
+            ),
+            joinedload(DerivationClosure.first).joinedload(Derivation.process),
+        )
+        .order_by(DerivationClosure.depth.desc(), DerivationClosure.pk)
+        .all()
+    )
+    # the closure rows of the stems in between start with the next derivation
+    by_ancestor = {_key(row.first.source): row for row in rows}
+    res, row = [], rows[0] if rows else None
+    while row is not None:
+        res.append(row.first)
+        row = by_ancestor.get(("stem", row.first.target_pk))
+    return res
+
+
+def render_family(request, obj):
+    """The stems derived from ``obj`` as a nested list, like
+    ``clld_morphology_plugin.util.render_derived_stems``, or ``None``."""
+    rows = family(obj)
+    if not rows:
+        return None
+    tree = {}
+    subtrees = {_key(obj): tree}
+    for row in rows:
+        derivation = row.last
+        target = derivation.target
+        label = (
+            link(request, target)
+            + f" ‘{target.description}’ ("
+            + link(request, derivation.process)
+            + ")"
+        )
+        parent = subtrees[
+            _source(derivation.source_stem_pk, derivation.source_root_pk)
+        ]
+        parent[label] = subtrees[_key(target)] = {}
+    return HTML.ul(*dict_to_list(tree))
+
+
+def render_lineage(request, stem):
+    """The derivations leading to ``stem`` as a nested list, like
+    ``clld_morphology_plugin.util.render_derived_from``, or ``None``."""
+    derivations = lineage(stem)
+    if not derivations:
+        # derived without a source, if at all
+        return render_derived_from(request, stem) if stem.derived_from else None
+    tree = link(request, stem)
+    for derivation in reversed(derivations):
+        source = derivation.source
+        label = (
+            link(request, source)
+            + f" ‘{source.description}’ + "
+            + link(request, derivation.process)
+            + ":"
+        )
+        tree = {label: tree}
+    return HTML.ul(*dict_to_list(tree))
+
+
+def process_derivations(process):
+    """The derivations of ``process`` with their sources, targets and morphs."""
+    return (
+        DBSession.query(Derivation)
+        .filter(Derivation.process_pk == process.pk)
+        .options(
+            joinedload(Derivation.source_root, innerjoin=False),
+            joinedload(Derivation.source_stem, innerjoin=False),
+            joinedload(Derivation.target),
+            selectinload(Derivation.stemparts)
+            .joinedload(StemPartDerivation.stempart)
+            .joinedload(StemPart.morph),
+        )
+        .order_by(Derivation.pk)
+        .all()
+    )
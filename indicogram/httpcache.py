@@ -0,0 +1,128 @@
+"""HTTP validators tied to the version of the dataset.
+
+Pages only change when data is imported, which sets a new import stamp on the dataset
+(see ``dataset_properties`` in ``indicogram.scripts.initializedb``). The tween sets a
+strong ETag derived from the stamp, and the time of the import as Last-Modified, on
+all pages and JSON responses of the app, and answers conditional requests with
+``304 Not Modified`` before routing them to a view. Responses can also be kept in a
+per-process LRU cache (``indicogram.response_cache_size`` entries, 0 disables it).
+
+Responses are negotiated on the ``Accept`` header and data tables load their rows
+with XHR requests, so both are part of the ETag. After deploying changes to templates
+or code without importing, change ``indicogram.cache_version`` to invalidate the
+ETags of the previous version.
+"""
+import hashlib
+from datetime import timezone
+
+from pyramid.interfaces import IRoutesMapper
+from pyramid.response import Response
+from pyramid.tweens import EXCVIEW, INGRESS
+
+from indicogram.cache import RenderCache
+
+# routes serving their own validators (audio files), or content not depending on the
+# imported data (counters of this process)
+UNCACHED_ROUTES = {
+    "audio_route",
+    "render_cache",
+    "metrics",
+    "_ping",
+    "_raise",
+}
+VARY = "Accept, X-Requested-With"
+
+# rendered responses by URL and ETag, resized from the settings
+response_cache = RenderCache(maxsize=0)
+
+
+def cacheable(request):
+    if request.method not in {"GET", "HEAD"}:
+        return False
+    info = request.registry.getUtility(IRoutesMapper)(request)
+    route = info["route"]
+    return (
+        route is not None
+        and route.name not in UNCACHED_ROUTES
+        and not route.name.startswith("__")  # static assets
+    )
+
+
+def validators(request, salt=""):
+    """The version of the dataset, and the ETag and Last-Modified date of the responses
+    to ``request`` with this version, or ``None`` if nothing is imported yet."""
+    dataset = request.dataset
+    stamp = dataset and (dataset.jsondata or {}).get("import_stamp")
+    if not stamp:
+        return None
+    version = f"{stamp}/{salt}"
+    variant = [version, request.accept.header_value or "", str(request.is_xhr)]
+    etag = hashlib.sha1("\n".join(variant).encode("utf8")).hexdigest()
+    modified = dataset.updated
+    if modified is not None:
+        if modified.tzinfo is None:
+            modified = modified.replace(tzinfo=timezone.utc)
+        modified = modified.replace(microsecond=0)
+    return version, etag, modified
+
+
+def not_modified(request, etag, modified):
+    if request.if_none_match:
+        return etag in request.if_none_match
+    return bool(
+        modified and request.if_modified_since and request.if_modified_since >= modified
+    )
+
+
+def http_cache_tween_factory(handler, registry):
+    settings = registry.settings
+    salt = settings.get("indicogram.cache_version", "")
+    max_age = int(settings.get("indicogram.max_age", 0))
+    response_cache.resize(int(settings.get("indicogram.response_cache_size", 0)))
+
+    def set_validators(response, etag, modified):
+        response.etag = etag
+        response.last_modified = modified
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        response.vary = VARY
+
+    def tween(request):
+        if not cacheable(request):
+            return handler(request)
+        current = validators(request, salt)
+        if current is None:
+            return handler(request)
+        version, etag, modified = current
+        if not_modified(request, etag, modified):
+            response = Response(status=304)
+            set_validators(response, etag, modified)
+            return response
+        key = (request.application_url, request.path_qs, etag)
+        cached = response_cache.get(version, key) if response_cache.maxsize else None
+        if cached is not None:
+            return Response(body=cached[1], headerlist=list(cached[0]))
+        response = handler(request)
+        if (
+            response.status_int != 200
+            or response.etag
+            or "Set-Cookie" in response.headers
+        ):
+            return response
+        set_validators(response, etag, modified)
+        if response_cache.maxsize and request.method == "GET":
+            response_cache.set(
+                version, key, (tuple(response.headerlist), response.body)
+            )
+        return response
+
+    return tween
+
+
+def includeme(config):
+    # inside the transaction of pyramid_tm, if used, around error views
+    config.add_tween(
+        "indicogram.httpcache.http_cache_tween_factory",
+        under=("pyramid_tm.tm_tween_factory", INGRESS),
+        over=EXCVIEW,
+    )
@@ -0,0 +1,249 @@
+"""Interlinear examples with pre-rendered gloss units.
+
+Rendering the aligned word, morph, gloss and part-of-speech lines of an example with
+``clld_morphology_plugin`` looks up the wordforms, morphs and glosses of every word,
+which takes dozens of queries per example. ``prime_cache`` renders the gloss units of
+all examples once and stores them with the import stamp of the dataset; pages showing
+examples fetch them with a single query and only render examples live whose units
+are missing or out of date.
+
+Texts are shown in chunks: ``prime_cache`` also stores the order of the sentences of
+every text, so that a chunk can be loaded without sorting all sentences.
+"""
+from clld.db.meta import DBSession
+from clld.db.models.common import Sentence
+from clld.web.util.helpers import link
+from clld.web.util.htmllib import HTML
+from clld_corpus_plugin.models import Record, Text, TextSentence
+from clld_morphology_plugin.util import rendered_gloss_units
+from markupsafe import Markup
+from sqlalchemy.orm import selectinload
+
+from indicogram.cache import PRERENDER_URL
+from indicogram.models import RenderedExample
+from indicogram.util import audio_button
+
+SENTENCE_ORDER = (TextSentence.record_number, TextSentence.pk)
+
+
+def _units_html(request, sentence):
+    return "".join(str(unit) for unit in rendered_gloss_units(request, sentence))
+
+
+def gloss_units(request, sentences):
+    """The rendered gloss units of ``sentences`` by pk."""
+    stamp = request.dataset.jsondata.get("import_stamp")
+    stored = dict(
+        DBSession.query(RenderedExample.sentence_pk, RenderedExample.units).filter(
+            RenderedExample.sentence_pk.in_([s.pk for s in sentences]),
+            RenderedExample.import_stamp == stamp,
+        )
+    )
+    return {
+        s.pk: Markup(
+            stored[s.pk].replace(PRERENDER_URL, request.application_url)
+            if s.pk in stored
+            else _units_html(request, s)
+        )
+        for s in sentences
+    }
+
+
+def prerender_examples(request):
+    """Render the gloss units of all examples and store them, replacing all
+    previously rendered units. ``request`` has to be prepared for pre-rendering, see
+    ``indicogram.cache.prepare_prerender``."""
+    stamp = request.dataset.jsondata.get("import_stamp") or ""
+    DBSession.query(RenderedExample).delete()
+    sentences = (
+        DBSession.query(Record)
+        .filter(Record.analyzed != None, Record.gloss != None)  # noqa: E711
+        .options(selectinload(Record.forms))
+        .order_by(Record.pk)
+        .yield_per(500)
+    )
+    for sentence in sentences:
+        DBSession.add(
+            RenderedExample(
+                sentence_pk=sentence.pk,
+                import_stamp=stamp,
+                units=_units_html(request, sentence),
+            )
+        )
+    DBSession.flush()
+
+
+def index_texts():
+    """Store the pks of the sentences of every text in order with the text, so that
+    text pages can load them in chunks."""
+    index = {}
+    for text_pk, sentence_pk in DBSession.query(
+        TextSentence.text_pk, TextSentence.sentence_pk
+    ).order_by(TextSentence.text_pk, *SENTENCE_ORDER):
+        index.setdefault(text_pk, []).append(sentence_pk)
+    for text in DBSession.query(Text):
+        text.update_jsondata(sentence_pks=index.get(text.pk, []))
+    DBSession.flush()
+
+
+def text_index(text):
+    """The pks of the sentences of ``text`` in order, as stored by ``index_texts``
+    or looked up if there is no index."""
+    pks = (text.jsondata or {}).get("sentence_pks")
+    if pks is None:
+        pks = [
+            pk
+            for pk, in DBSession.query(TextSentence.sentence_pk)
+            .filter(TextSentence.text_pk == text.pk)
+            .order_by(*SENTENCE_ORDER)
+        ]
+    return pks
+
+
+def text_chunk_size(request):
+    return int(request.registry.settings.get("indicogram.text_chunk_size", 50))
+
+
+def text_sentences(text, start=0, size=None):
+    """The sentences ``start`` to ``start + size`` of ``text`` in order, loaded
+    with their files."""
+    pks = text_index(text)[start : None if size is None else start + size]
+    sentences = {
+        s.pk: s
+        for s in DBSession.query(Record)
+        .filter(Record.pk.in_(pks))
+        .options(selectinload(Record._files))
+    }
+    return [sentences[pk] for pk in pks if pk in sentences]
+
+
+def rendered_text_chunk(request, text, start=0, size=None):
+    """The sentences ``start`` to ``start + size`` of ``text`` as list items."""
+    sentences = text_sentences(text, start, size)
+    units = gloss_units(request, sentences)
+    return Markup(
+        "".join(
+            str(
+                rendered_sentence(
+                    request, s, units=units[s.pk], text_link=False, sentence_link=True
+                )
+            )
+            for s in sentences
+        )
+    )
+
+
+def rendered_sentence(
+    request,
+    sentence,
+    units=None,
+    in_context=True,
+    text_link=True,
+    sentence_link=False,
+    counter_class="example",
+    example_id=None,
+    title=None,
+):
+    """Format a sentence as HTML, like ``clld_corpus_plugin.util.rendered_sentence``
+    but with the gloss ``units`` looked up with ``gloss_units`` (for a single sentence
+    if not given), and a button for the audio player."""
+    if sentence.xhtml:
+        return HTML.div(
+            HTML.div(Markup(sentence.xhtml), class_="body"), class_="sentence"
+        )
+    if units is None:
+        units = gloss_units(request, [sentence])[sentence.pk]
+    if sentence_link:
+        surface = HTML.div(
+            link(request, sentence, label=sentence.name), class_="object-language"
+        )
+    else:
+        surface = HTML.div(sentence.name, " ", class_="object-language")
+    if text_link and len(sentence.text_assocs) > 0:
+        text = sentence.text_assocs[0].text
+        text_ref = (
+            " ("
+            + link(request, text, label=text.id, url_kw={"_anchor": sentence.id})
+            + ": "
+            + link(request, sentence, label=sentence.text_assocs[0].record_number)
+            + ")"
+        )
+    else:
+        text_ref = ""
+
+    sentence_content = HTML.div(
+        HTML.div(
+            HTML.a(id=example_id or sentence.id),
+            HTML.div(
+                title,
+                HTML.div(sentence.original_script, class_="original-script")
+                if sentence.original_script
+                else "",
+                surface,
+                HTML.div(units, **{"class": "gloss-box"}) if units else "",
+                HTML.div(
+                    HTML.span(sentence.description, class_="translation")
+                    if sentence.description
+                    else "",
+                    " / " + HTML.span(sentence.markup_description, class_="translation")
+                    if sentence.markup_description
+                    else "",
+                    text_ref,
+                ),
+                class_="body",
+            ),
+            class_="sentence",
+        ),
+        audio_button(str(sentence.audio)) if sentence.audio else "",
+        class_="sentence-wrapper",
+    )
+    if in_context:
+        return HTML.li(
+            sentence_content, class_=counter_class, id_=example_id or sentence.id
+        )
+    return sentence_content
+
+
+def render_ex(req, objid, table, session, ids=None, subexample=False, **kwargs):
+    """Renderer for examples in markdown (``[](ExampleTable#cldf:id)``), replacing
+    the one of ``clld_document_plugin``."""
+    if "subexample" in kwargs.get("format", []):
+        subexample = True
+    example_id = kwargs.get("example_id", [None])[0]
+    title = kwargs.get("title", [None])[0]
+    if objid == "__all__":
+        if ids:
+            ex_strs = [
+                render_ex(req, mid, table, session, subexample=True)
+                for mid in ids[0].split(",")
+            ]
+            return HTML.ol(
+                HTML.li(
+                    title,
+                    HTML.ol(*ex_strs, class_="subexample"),
+                    class_="example",
+                    id_=example_id,
+                ),
+                class_="example",
+            )
+    sentence = session.query(Sentence).filter(Sentence.id == objid).first()
+    if subexample:
+        return rendered_sentence(
+            req,
+            sentence,
+            sentence_link=True,
+            counter_class="subexample",
+            in_context=True,
+        )
+    return HTML.ol(
+        rendered_sentence(
+            req,
+            sentence,
+            sentence_link=True,
+            in_context=True,
+            example_id=example_id,
+            counter_class="example",
+            title=title,
+        ),
+        class_="example",
+    )
@@ -0,0 +1,288 @@
+"""Request metrics, served in the Prometheus text format at ``/metrics``.
+
+The tween records, per route, histograms of the time to respond, of the number and
+time of SQL queries, and of the time spent rendering templates and markdown. Queries
+are counted with SQLAlchemy events on all engines, so also with the engine of
+``indicogram.readonly``; templates are timed by wrapping the ``.mako`` renderer, and
+markdown by ``timed`` (see ``indicogram.cache``). Template times include the markdown
+rendered in templates. Metrics are kept per process.
+
+With ``indicogram.slow_request_threshold`` set to a number of seconds, requests taking
+longer are logged as warnings, with the ``indicogram.slow_request_queries`` statements
+(default 5) which took the most time.
+"""
+import functools
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from pyramid.interfaces import IRendererFactory
+from pyramid.tweens import INGRESS, MAIN
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+log = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+# name, help, buckets and the value recorded for a request
+HISTOGRAMS = [
+    (
+        "request_duration_seconds",
+        "Time to respond to requests.",
+        DURATION_BUCKETS,
+        lambda stats: stats.duration,
+    ),
+    (
+        "request_sql_queries",
+        "SQL queries per request.",
+        QUERY_BUCKETS,
+        lambda stats: stats.queries,
+    ),
+    (
+        "request_sql_seconds",
+        "Time spent in SQL queries per request.",
+        DURATION_BUCKETS,
+        lambda stats: stats.seconds["sql"],
+    ),
+    (
+        "request_template_seconds",
+        "Time spent rendering templates per request.",
+        DURATION_BUCKETS,
+        lambda stats: stats.seconds["template"],
+    ),
+    (
+        "request_markdown_seconds",
+        "Time spent rendering markdown per request.",
+        DURATION_BUCKETS,
+        lambda stats: stats.seconds["markdown"],
+    ),
+]
+
+# the stats of the request served by the current thread, if any
+_current = threading.local()
+
+
+class RequestStats:
+    def __init__(self, statements=False):
+        self.duration = 0.0
+        self.queries = 0
+        self.seconds = defaultdict(float)
+        self.depth = defaultdict(int)
+        # total time and number of executions by statement, for the slow request log
+        self.statements = defaultdict(lambda: [0.0, 0]) if statements else None
+
+
+def current_stats():
+    return getattr(_current, "stats", None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """Histograms of the requests served by this process, by route."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.histograms = {name: {} for name, _, _, _ in HISTOGRAMS}
+
+    def observe(self, route, stats):
+        with self.lock:
+            for name, _, buckets, value in HISTOGRAMS:
+                histograms = self.histograms[name]
+                if route not in histograms:
+                    histograms[route] = Histogram(buckets)
+                histograms[route].observe(value(stats))
+
+    def exposition(self, caches=()):
+        """The metrics in the Prometheus text format, with the counters of
+        ``caches``, given as (name, ``RenderCache``) pairs."""
+        lines = []
+        with self.lock:
+            for name, help, _, _ in HISTOGRAMS:
+                histograms = sorted(self.histograms[name].items())
+                name = f"indicogram_{name}"
+                lines += [f"# HELP {name} {help}", f"# TYPE {name} histogram"]
+                for route, histogram in histograms:
+                    route = f'route="{_escape(route)}"'
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f'{name}_bucket{{{route},le="{bound}"}} {count}')
+                    lines += [
+                        f'{name}_bucket{{{route},le="+Inf"}} {histogram.count}',
+                        f"{name}_sum{{{route}}} {histogram.sum}",
+                        f"{name}_count{{{route}}} {histogram.count}",
+                    ]
+        infos = [(cache, cache_.info()) for cache, cache_ in caches]
+        for field, name, kind, help in [
+            ("hits", "hits_total", "counter", "Hits"),
+            ("misses", "misses_total", "counter", "Misses"),
+            ("evictions", "evictions_total", "counter", "Evictions"),
+            ("currsize", "entries", "gauge", "Entries"),
+        ]:
+            name = f"indicogram_cache_{name}"
+            lines += [
+                f"# HELP {name} {help} of the in-process caches.",
+                f"# TYPE {name} {kind}",
+            ]
+            lines += [
+                f'{name}{{cache="{cache}"}} {getattr(info, field)}'
+                for cache, info in infos
+            ]
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class timer:
+    """Add the time spent in the block to the ``kind`` of the current request, unless
+    already inside a block of the same kind."""
+
+    def __init__(self, kind):
+        self.kind = kind
+
+    def __enter__(self):
+        self.stats = current_stats()
+        if self.stats is not None:
+            self.stats.depth[self.kind] += 1
+            self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        if self.stats is not None:
+            self.stats.depth[self.kind] -= 1
+            if not self.stats.depth[self.kind]:
+                self.stats.seconds[self.kind] += time.perf_counter() - self.start
+
+
+def timed(kind):
+    """Decorator recording the time spent in the function as ``kind``."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kw):
+            with timer(kind):
+                return func(*args, **kw)
+
+        return wrapper
+
+    return decorator
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and current_stats() is not None:
+        context.indicogram_query_start = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_stats()
+    start = getattr(context, "indicogram_query_start", None)
+    if stats is None or start is None:
+        return
+    seconds = time.perf_counter() - start
+    stats.queries += 1
+    stats.seconds["sql"] += seconds
+    if stats.statements is not None:
+        total = stats.statements[statement]
+        total[0] += seconds
+        total[1] += 1
+
+
+def timed_renderer_factory(factory):
+    def make_renderer(info):
+        render = factory(info)
+
+        def renderer(value, system):
+            with timer("template"):
+                return render(value, system)
+
+        return renderer
+
+    return make_renderer
+
+
+def slow_request(request, route, stats, top):
+    statements = sorted(stats.statements.items(), key=lambda x: -x[1][0])[:top]
+    log.warning(
+        "slow request %s %s (route %s): %.3fs, %d queries in %.3fs%s",
+        request.method,
+        request.path_qs,
+        route,
+        stats.duration,
+        stats.queries,
+        stats.seconds["sql"],
+        "".join(
+            f"\n  {seconds:.3f}s in {count}x {' '.join(statement.split())}"
+            for statement, (seconds, count) in statements
+        ),
+    )
+
+
+def metrics_tween_factory(handler, registry):
+    settings = registry.settings
+    threshold = float(settings.get("indicogram.slow_request_threshold", 0))
+    top = int(settings.get("indicogram.slow_request_queries", 5))
+
+    def tween(request):
+        stats = _current.stats = RequestStats(statements=bool(threshold))
+        start = time.perf_counter()
+        try:
+            return handler(request)
+        finally:
+            stats.duration = time.perf_counter() - start
+            _current.stats = None
+            route = request.matched_route.name if request.matched_route else ""
+            metrics.observe(route, stats)
+            if threshold and stats.duration > threshold:
+                slow_request(request, route, stats, top)
+
+    return tween
+
+
+def includeme(config):
+    for name, listener in [
+        ("before_cursor_execute", before_cursor_execute),
+        ("after_cursor_execute", after_cursor_execute),
+    ]:
+        if not event.contains(Engine, name, listener):
+            event.listen(Engine, name, listener)
+
+    def wrap_mako_renderer():
+        factory = config.registry.queryUtility(IRendererFactory, name=".mako")
+        if factory is not None:
+            config.registry.registerUtility(
+                timed_renderer_factory(factory), IRendererFactory, name=".mako"
+            )
+
+    # after the renderers of the includes are registered
+    config.action(None, wrap_mako_renderer)
+    # outside of all other tweens, to include the transaction and caching
+    config.add_tween(
+        "indicogram.metrics.metrics_tween_factory",
+        under=INGRESS,
+        over=(
+            "indicogram.readonly.read_only_tween_factory",
+            "pyramid_tm.tm_tween_factory",
+            MAIN,
+        ),
+    )
@@ -1,7 +1,25 @@
 from clld.db.meta import Base, PolymorphicBaseMixin
 from clld.db.models import IdNameDescriptionMixin
-from clld_morphology_plugin.models import Wordform
-from sqlalchemy import Column, ForeignKey, Integer
+from clld.db.models.common import Sentence
+from clld_morphology_plugin.models import (
+    Derivation,
+    Lexeme,
+    Morph,
+    Morpheme,
+    Stem,
+    Wordform,
+)
+from sqlalchemy import (
+    DDL,
+    Column,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Unicode,
+    UniqueConstraint,
+    event,
+)
 from sqlalchemy.orm import relationship
 from zope.interface import implementer
 
@@ -14,11 +32,216 @@ from indicogram.interfaces import IPhoneme
 
 @implementer(IPhoneme)
 class Phoneme(Base, IdNameDescriptionMixin):
-    pass
+    # occurrences in wordforms, computed in prime_cache
+    count_tokens = Column(Integer, default=0)
+    count_types = Column(Integer, default=0)
+    count_initial = Column(Integer, default=0)
+    count_medial = Column(Integer, default=0)
+    count_final = Column(Integer, default=0)
 
 
 class FormPhoneme(Base, PolymorphicBaseMixin):
+    """A phoneme at position ``index`` of a wordform."""
+
+    __table_args__ = (Index("ix_formphoneme_phoneme_form", "phoneme_pk", "form_pk"),)
     phoneme_pk = Column(Integer, ForeignKey("phoneme.pk"), nullable=False)
-    form_pk = Column(Integer, ForeignKey("wordform.pk"), nullable=False)
+    form_pk = Column(Integer, ForeignKey("wordform.pk"), nullable=False, index=True)
     phoneme = relationship(Phoneme, innerjoin=True, backref="forms")
     form = relationship(Wordform, innerjoin=True, backref="segments")
+    index = Column(Integer)
+
+
+# -----------------------------------------------------------------------------
+# import manifest, see indicogram.scripts.delta
+# -----------------------------------------------------------------------------
+
+
+class ImportedTable(Base):
+    """Digest of a CLDF table (or the sources file) as of the last import."""
+
+    name = Column(String, unique=True, nullable=False)
+    digest = Column(String)
+
+
+class ImportedRow(Base):
+    """Digest of a row of a CLDF table as of the last import."""
+
+    __table_args__ = (UniqueConstraint("table_name", "row_id"),)
+    table_name = Column(String, nullable=False)
+    row_id = Column(String, nullable=False)
+    digest = Column(String, nullable=False)
+
+
+class ImportedObject(Base):
+    """An object added to the database while importing a CLDF row."""
+
+    __table_args__ = (Index("ix_importedobject_model_key", "model", "key"),)
+    row_pk = Column(Integer, ForeignKey("importedrow.pk"), nullable=False, index=True)
+    model = Column(String, nullable=False)
+    key = Column(String, nullable=False)
+    object_pk = Column(Integer, nullable=False)
+
+
+# -----------------------------------------------------------------------------
+# pre-rendered content, see indicogram.scripts.initializedb.prime_cache
+# -----------------------------------------------------------------------------
+
+
+class RenderedMarkdown(Base):
+    """HTML rendered from the markdown description of an object."""
+
+    key = Column(String, unique=True, nullable=False)
+    digest = Column(String, nullable=False)
+    html = Column(Unicode, nullable=False)
+
+
+class RenderedExample(Base):
+    """The interlinear gloss units of an example, rendered as HTML."""
+
+    sentence_pk = Column(
+        Integer, ForeignKey("sentence.pk"), unique=True, nullable=False
+    )
+    import_stamp = Column(String, nullable=False)
+    units = Column(Unicode, nullable=False)
+
+
+class RenderedParadigm(Base):
+    """The paradigm of a lexeme as a grid of rendered cells, see
+    ``indicogram.paradigm``."""
+
+    lexeme_pk = Column(Integer, ForeignKey("lexeme.pk"), unique=True, nullable=False)
+    import_stamp = Column(String, nullable=False)
+    # JSON, null for lexemes without inflected forms
+    grid = Column(Unicode, nullable=False)
+
+
+# -----------------------------------------------------------------------------
+# full-text search, see indicogram.search
+# -----------------------------------------------------------------------------
+
+
+class SearchDocument(Base):
+    """The searchable text of an example, wordform, morph etc. or chapter."""
+
+    __table_args__ = (UniqueConstraint("kind", "obj_pk"),)
+    kind = Column(String, nullable=False)
+    obj_pk = Column(Integer, nullable=False)
+    obj_id = Column(String, nullable=False)
+    name = Column(Unicode)
+    analyzed = Column(Unicode)
+    gloss = Column(Unicode)
+    translation = Column(Unicode)
+    body = Column(Unicode)
+
+
+# SQLite: an FTS5 index of the columns of SearchDocument
+SEARCH_FTS = "searchdocument_fts"
+# PostgreSQL: an index on the tsvector of the columns, weighted in this order
+SEARCH_TSVECTOR = " || ".join(
+    f"setweight(to_tsvector('simple', {expr}), '{weight}')"
+    for expr, weight in [
+        ("coalesce(name, '')", "A"),
+        ("coalesce(analyzed, '') || ' ' || coalesce(translation, '')", "B"),
+        ("coalesce(gloss, '')", "C"),
+        ("coalesce(body, '')", "D"),
+    ]
+)
+event.listen(
+    SearchDocument.__table__,
+    "after_create",
+    DDL(
+        f"CREATE VIRTUAL TABLE {SEARCH_FTS} USING fts5("
+        "name, analyzed, gloss, translation, body, "
+        "content='searchdocument', content_rowid='pk', "
+        "tokenize='unicode61 remove_diacritics 0')"
+    ).execute_if(dialect="sqlite"),
+)
+event.listen(
+    SearchDocument.__table__,
+    "after_create",
+    DDL(
+        "CREATE INDEX ix_searchdocument_tsvector ON searchdocument "
+        f"USING gin (({SEARCH_TSVECTOR}))"
+    ).execute_if(dialect="postgresql"),
+)
+event.listen(
+    SearchDocument.__table__,
+    "before_drop",
+    DDL(f"DROP TABLE IF EXISTS {SEARCH_FTS}").execute_if(dialect="sqlite"),
+)
+
+
+# -----------------------------------------------------------------------------
+# concordance, see indicogram.concordance
+# -----------------------------------------------------------------------------
+
+
+class ConcordanceKey(Base):
+    """A morph, morpheme or gloss occurring in examples, with its frequency."""
+
+    __table_args__ = (UniqueConstraint("kind", "obj_id"),)
+    kind = Column(String, nullable=False)
+    obj_pk = Column(Integer, nullable=False)
+    obj_id = Column(String, nullable=False)
+    name = Column(Unicode)
+    # the number of words and examples it occurs in
+    tokens = Column(Integer, nullable=False)
+    sentences = Column(Integer, nullable=False)
+
+
+class ConcordanceHit(Base):
+    """An occurrence of a concordance key in word ``position`` of an example."""
+
+    __table_args__ = (
+        Index("ix_concordancehit_key_sentence", "key_pk", "sentence_pk", "position"),
+    )
+    key_pk = Column(Integer, ForeignKey("concordancekey.pk"), nullable=False)
+    sentence_pk = Column(Integer, ForeignKey("sentence.pk"), nullable=False)
+    position = Column(Integer, nullable=False)
+
+
+# -----------------------------------------------------------------------------
+# derivational families, see indicogram.derivation
+# -----------------------------------------------------------------------------
+
+
+class DerivationClosure(Base):
+    """A stem derived from a root or a stem by ``depth`` derivations."""
+
+    __table_args__ = (
+        Index("ix_derivationclosure_root", "root_pk", "depth"),
+        Index("ix_derivationclosure_ancestor", "ancestor_pk", "depth"),
+        Index("ix_derivationclosure_descendant", "descendant_pk", "depth"),
+    )
+    # the ancestor, either a root or a stem
+    root_pk = Column(Integer, ForeignKey("morph.pk"))
+    ancestor_pk = Column(Integer, ForeignKey("stem.pk"))
+    descendant_pk = Column(Integer, ForeignKey("stem.pk"), nullable=False)
+    depth = Column(Integer, nullable=False)
+    # the pks of the derivations from the ancestor to the descendant, space-separated
+    path = Column(String, nullable=False)
+    first_pk = Column(Integer, ForeignKey("derivation.pk"), nullable=False)
+    last_pk = Column(Integer, ForeignKey("derivation.pk"), nullable=False)
+    first = relationship(Derivation, foreign_keys=[first_pk])
+    last = relationship(Derivation, foreign_keys=[last_pk])
+
+
+# derivations of a process
+DERIVATION_PROCESS_INDEX = Index(
+    "ix_derivation_process", Derivation.__table__.c.process_pk
+)
+
+# -----------------------------------------------------------------------------
+# indexes for the data tables, see indicogram.datatables
+# -----------------------------------------------------------------------------
+
+# pages of active rows sorted by name, and their counts
+DATATABLE_INDEXES = [
+    Index(
+        f"ix_{model.__table__.name}_active_name",
+        model.__table__.c.active,
+        model.__table__.c.name,
+        model.__table__.c.pk,
+    )
+    for model in [Sentence, Wordform, Morph, Morpheme, Lexeme, Stem]
+]
@@ -0,0 +1,90 @@
+"""Paradigms of lexemes, computed after importing.
+
+``clld_morphology_plugin`` builds the paradigm of a lexeme on its page, by loading the
+inflections of its stems with their inflectional values and forms and pivoting them
+with pandas, which takes dozens of queries per lexeme. ``prime_cache`` computes the
+paradigms of all lexemes once and stores them as grids of rendered cells with the
+import stamp of the dataset; lexeme pages fetch their grid with a single query and
+only compute paradigms live which are missing or out of date.
+
+A grid has the names of the categories on the x and y axes (``colnames`` and
+``idxnames``), the values of the x categories for every column (``columns``) and
+of the y categories for every row (``index``), and the links to the forms in every
+cell of every row (``cells``).
+"""
+import json
+
+from clld.db.meta import Base, DBSession
+from clld.web.util.helpers import link
+from clld_morphology_plugin.models import Lexeme
+from clld_morphology_plugin.util import render_paradigm
+from markupsafe import escape
+
+from indicogram.cache import PRERENDER_URL
+from indicogram.models import RenderedParadigm
+
+
+def _cell(request, entity):
+    if isinstance(entity, str):
+        return str(escape(entity))
+    if isinstance(entity, Base):
+        return str(link(request, entity))
+    # names pandas gives to axes without categories
+    return ""
+
+
+def paradigm_grid(request, lexeme):
+    """The paradigm of ``lexeme`` with rendered cells, or ``None`` if it has no
+    inflected forms."""
+    paradigm = render_paradigm(lexeme)
+    if not paradigm:
+        return None
+    return {
+        "colnames": [_cell(request, cat) for cat in paradigm["colnames"]],
+        "columns": [
+            [_cell(request, value) for value in column]
+            for column in paradigm["columns"]
+        ],
+        "idxnames": [_cell(request, cat) for cat in paradigm["idxnames"]],
+        "index": [
+            [_cell(request, value) for value in values] for values in paradigm["index"]
+        ],
+        "cells": [
+            [[_cell(request, form) for form in cell or []] for cell in row]
+            for row in paradigm["cells"]
+        ],
+    }
+
+
+def paradigm(request, lexeme):
+    """The paradigm grid of ``lexeme``, served from the stored version if it is up to
+    date."""
+    stored = (
+        DBSession.query(RenderedParadigm.grid)
+        .filter(
+            RenderedParadigm.lexeme_pk == lexeme.pk,
+            RenderedParadigm.import_stamp
+            == request.dataset.jsondata.get("import_stamp"),
+        )
+        .scalar()
+    )
+    if stored is None:
+        return paradigm_grid(request, lexeme)
+    return json.loads(stored.replace(PRERENDER_URL, request.application_url))
+
+
+def prerender_paradigms(request):
+    """Compute the paradigms of all lexemes and store them, replacing all previously
+    stored paradigms. ``request`` has to be prepared for pre-rendering, see
+    ``indicogram.cache.prepare_prerender``."""
+    stamp = request.dataset.jsondata.get("import_stamp") or ""
+    DBSession.query(RenderedParadigm).delete()
+    for lexeme in DBSession.query(Lexeme).order_by(Lexeme.pk):
+        DBSession.add(
+            RenderedParadigm(
+                lexeme_pk=lexeme.pk,
+                import_stamp=stamp,
+                grid=json.dumps(paradigm_grid(request, lexeme)),
+            )
+        )
+    DBSession.flush()
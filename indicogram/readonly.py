@@ -0,0 +1,93 @@
+"""Serving an SQLite database which does not change while the app runs.
+
+With ``indicogram.read_only = true``, the app opens the database at
+``sqlalchemy.url`` as immutable (``mode=ro&immutable=1``): SQLite then neither locks
+the file nor checks it for changes by other processes, and writes fail. Every thread
+keeps its own connection (``indicogram.read_only_connections`` at most, which should
+be at least the number of server threads), with the database memory-mapped
+(``indicogram.sqlite_mmap_size`` bytes) and a page cache of
+``indicogram.sqlite_cache_size`` KiB, so that the pages read by earlier requests stay
+in memory.
+
+GET and HEAD requests are served outside of the transaction of ``pyramid_tm``; the
+tween only ends the transaction the session joined while reading. Other requests, and
+scripts like ``clld initdb`` binding their own engine, are not affected. The server
+has to be restarted after importing.
+"""
+import transaction
+from clld.db.meta import Base, DBSession
+from pyramid.settings import asbool
+from pyramid.tweens import INGRESS, MAIN
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import SingletonThreadPool
+
+READ_METHODS = {"GET", "HEAD"}
+
+
+def read_only(settings):
+    return asbool(settings.get("indicogram.read_only", False))
+
+
+def read_only_engine(settings):
+    """An engine opening the SQLite database at ``sqlalchemy.url`` as immutable, with
+    one connection per thread."""
+    url = make_url(settings["sqlalchemy.url"])
+    if url.get_backend_name() != "sqlite" or not url.database:
+        raise ValueError(f"indicogram.read_only needs an SQLite file, not {url}")
+    mmap_size = int(settings.get("indicogram.sqlite_mmap_size", 2**30))
+    cache_size = int(settings.get("indicogram.sqlite_cache_size", 65536))
+    engine = create_engine(
+        url.set(
+            database=f"file:{url.database}",
+            query=dict(url.query, mode="ro", immutable="1", uri="true"),
+        ),
+        poolclass=SingletonThreadPool,
+        pool_size=int(settings.get("indicogram.read_only_connections", 64)),
+    )
+
+    @event.listens_for(engine, "connect")
+    def configure(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA mmap_size = {mmap_size}")
+        cursor.execute(f"PRAGMA cache_size = -{cache_size}")
+        cursor.execute("PRAGMA query_only = 1")
+        cursor.close()
+
+    return engine
+
+
+def activate_transaction(request):
+    """``tm.activate_hook``: only requests which may write get a transaction."""
+    return request.method not in READ_METHODS
+
+
+def read_only_tween_factory(handler, registry):
+    def tween(request):
+        if request.method not in READ_METHODS:
+            return handler(request)
+        try:
+            return handler(request)
+        finally:
+            # closes the session, returning the connection of the thread
+            transaction.abort()
+
+    return tween
+
+
+def includeme(config):
+    settings = config.registry.settings
+    if not read_only(settings):
+        return
+    engine = read_only_engine(settings)
+    if DBSession.bind is not None:
+        DBSession.bind.dispose()
+    DBSession.remove()
+    DBSession.configure(bind=engine)
+    Base.metadata.bind = engine
+    settings.setdefault("tm.activate_hook", activate_transaction)
+    config.add_tween(
+        "indicogram.readonly.read_only_tween_factory",
+        under=INGRESS,
+        over=("pyramid_tm.tm_tween_factory", MAIN),
+    )
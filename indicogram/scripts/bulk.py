@@ -0,0 +1,311 @@
+"""Bulk loading of CLDF data.
+
+``BulkData`` can be used in place of ``clld.cliutil.Data`` in ``process_cldf``.
+Instead of creating ORM instances which the session flushes one by one, it hands out
+lightweight ``Row`` objects with primary keys assigned up front, collects their column
+values per table and writes them with ``executemany`` inserts in dependency order.
+
+``CompactData`` writes the rows in batches during the import and only keeps the
+primary keys of written rows, so that the memory needed does not grow with the size
+of the dataset.
+"""
+from collections import defaultdict
+
+from clld.cliutil import Data
+from clld.db.meta import Base, DBSession
+from sqlalchemy import PickleType, bindparam, func, inspect, select, text
+from sqlalchemy.ext.mutable import MutableList
+from sqlalchemy.orm import configure_mappers
+from sqlalchemy.orm.interfaces import MANYTOONE
+from zope.sqlalchemy import mark_changed
+
+BATCH_SIZE = 10000
+
+
+class Row:
+    """Stand-in for an ORM instance of ``model``.
+
+    Column attributes are stored as plain values; many-to-one relationships are
+    stored as the related ``Row`` and translated to the foreign key column. Once the
+    row is written by ``CompactData``, attributes are read from and written to the
+    database directly (changes to mutable values like ``jsondata`` are lost).
+    """
+
+    __slots__ = ("_model", "_values", "_related")
+
+    def __init__(self, model, pk, jsondata=None, **kw):
+        object.__setattr__(self, "_model", model)
+        object.__setattr__(self, "_values", {"pk": pk, "jsondata": jsondata or {}})
+        object.__setattr__(self, "_related", {})
+        for key, value in kw.items():
+            setattr(self, key, value)
+
+    @classmethod
+    def written(cls, model, pk):
+        """Stand-in for the row of ``model`` with primary key ``pk``, which is already
+        in the database."""
+        row = object.__new__(cls)
+        object.__setattr__(row, "_model", model)
+        object.__setattr__(row, "_values", {"pk": pk})
+        object.__setattr__(row, "_related", None)
+        return row
+
+    def __getattr__(self, name):
+        if name in self._values:
+            return self._values[name]
+        if self._related is None:
+            return self._read(name)
+        if name in self._related:
+            return self._related[name]
+        mapper = inspect(self._model)
+        if name in mapper.relationships or name in mapper.column_attrs:
+            return None
+        raise AttributeError(f"{self._model.__name__} has no attribute {name}")
+
+    def __setattr__(self, name, value):
+        values = self._column_values(name, value)
+        if self._related is None:
+            self._write(values)
+            return
+        if name in inspect(self._model).relationships:
+            self._related[name] = value
+        self._values.update(values)
+
+    def _column_values(self, name, value):
+        mapper = inspect(self._model)
+        if name in mapper.relationships:
+            rel = mapper.relationships[name]
+            if rel.direction is not MANYTOONE:
+                raise NotImplementedError(
+                    f"{self._model.__name__}.{name}: only many-to-one relationships"
+                    " can be set in bulk mode"
+                )
+            return {
+                mapper.get_property_by_column(local).key: (
+                    None if value is None else getattr(value, remote.key)
+                )
+                for local, remote in rel.local_remote_pairs
+            }
+        if name in mapper.column_attrs:
+            if isinstance(value, list) and isinstance(
+                mapper.column_attrs[name].columns[0].type, PickleType
+            ):
+                # pickle the same type as the ORM's MutableList coercion would
+                value = MutableList(value)
+            return {name: value}
+        raise AttributeError(f"{self._model.__name__} has no attribute {name}")
+
+    def _release(self):
+        # once written, only the primary key is kept
+        object.__setattr__(self, "_values", {"pk": self._values["pk"]})
+        object.__setattr__(self, "_related", None)
+
+    def _read(self, name):
+        mapper = inspect(self._model)
+        if name in mapper.relationships:
+            rel = mapper.relationships[name]
+            [(local, remote)] = rel.local_remote_pairs
+            if rel.direction is not MANYTOONE or remote.key != "pk":
+                raise NotImplementedError(
+                    f"{self._model.__name__}.{name} can not be read from a written row"
+                )
+            pk = self._read(mapper.get_property_by_column(local).key)
+            return None if pk is None else Row.written(rel.mapper.class_, pk)
+        if name not in mapper.column_attrs:
+            raise AttributeError(f"{self._model.__name__} has no attribute {name}")
+        col = mapper.column_attrs[name].columns[0]
+        return DBSession.execute(
+            select(col).where(col.table.c.pk == self.pk)
+        ).scalar()
+
+    def _write(self, values):
+        mapper = inspect(self._model)
+        for key, value in values.items():
+            col = mapper.column_attrs[key].columns[0]
+            DBSession.execute(
+                col.table.update()
+                .where(col.table.c.pk == self.pk)
+                .values({col.key: value})
+            )
+
+    def __repr__(self):
+        return f"<{self._model.__name__} row {self._values.get('id', self.pk)!r}>"
+
+
+class BulkData(Data):
+    """Drop-in replacement for ``clld.cliutil.Data`` writing rows with ``executemany``.
+
+    Rows are only written when ``flush`` is called, so attributes of rows returned by
+    ``add`` can be changed until the end of the import.
+    """
+
+    def __init__(self, **kw):
+        super().__init__(**kw)
+        configure_mappers()
+        self.rows = defaultdict(list)
+        self._next_pk = {}
+
+    def next_pk(self, model):
+        table = inspect(model).base_mapper.local_table
+        if table not in self._next_pk:
+            max_pk = DBSession.execute(select(func.max(table.c.pk))).scalar()
+            self._next_pk[table] = (max_pk or 0) + 1
+        pk = self._next_pk[table]
+        self._next_pk[table] += 1
+        return pk
+
+    def add(self, model_, key_, **kw):
+        if "." in kw.get("id", ""):
+            raise ValueError('Object id contains illegal character "."')
+        if list(kw.keys()) == ["_obj"]:
+            obj = kw["_obj"]
+            mapper = inspect(obj).mapper
+            kw = {
+                k: v for k, v in inspect(obj).dict.items() if k in mapper.column_attrs
+            }
+        else:
+            for k, v in self.defaults.items():
+                kw.setdefault(k, v)
+        new = Row(model_, kw.pop("pk", None) or self.next_pk(model_), **kw)
+        self[model_.__name__][key_] = new
+        self.rows[model_].append(new)
+        return new
+
+    def flush(self):
+        """Insert all collected rows, parent tables first."""
+        table_rows = defaultdict(list)
+        updates = defaultdict(list)
+        for model, rows in self.rows.items():
+            mapper = inspect(model)
+            for m in reversed(list(mapper.iterate_to_root())):
+                table = m.local_table
+                columns = [(c, mapper.get_property_by_column(c).key) for c in table.c]
+                for row in rows:
+                    values, deferred = {}, {}
+                    for col, key in columns:
+                        if col is mapper.polymorphic_on:
+                            values[col.key] = mapper.polymorphic_identity
+                        elif key in row._values:
+                            if any(fk.column.table is table for fk in col.foreign_keys):
+                                # self-referential keys are set once all rows exist
+                                deferred[col.key] = row._values[key]
+                            else:
+                                values[col.key] = row._values[key]
+                    table_rows[table].append(values)
+                    if any(v is not None for v in deferred.values()):
+                        updates[table].append(deferred)
+                        deferred["_pk"] = row.pk
+        for table in Base.metadata.sorted_tables:
+            if table in table_rows:
+                insert_rows(table, table_rows[table])
+        for table, rows in updates.items():
+            _update(table, rows)
+        if DBSession.bind.dialect.name == "postgresql":
+            for table in self._next_pk:
+                DBSession.execute(
+                    text(
+                        f"SELECT setval(pg_get_serial_sequence('{table.name}', 'pk'), "
+                        f"(SELECT max(pk) FROM {table.name}))"
+                    )
+                )
+        mark_changed(DBSession())
+        self.rows.clear()
+
+
+class PkMap(dict):
+    """The rows of one model in ``CompactData`` by key: rows not written yet, and the
+    primary keys of written rows."""
+
+    model = None
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        return Row.written(self.model, value) if isinstance(value, int) else value
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+
+class CompactData(BulkData):
+    """``BulkData`` writing rows in batches of ``batch_size`` while the import runs.
+
+    ``process_cldf`` calls ``checkpoint`` once all objects for a CLDF row have been
+    added. Of the rows written, only primary keys are kept to resolve foreign keys;
+    looking a written row up returns a ``Row`` reading and writing its attributes in
+    the database.
+    """
+
+    batch_size = BATCH_SIZE
+
+    def __init__(self, **kw):
+        super().__init__(**kw)
+        self.default_factory = PkMap
+        self._added = []
+
+    def add(self, model_, key_, **kw):
+        new = super().add(model_, key_, **kw)
+        pks = self[model_.__name__]
+        pks.model = model_
+        self._added.append((pks, key_))
+        return new
+
+    def checkpoint(self):
+        """Write the rows added so far if there are at least ``batch_size``."""
+        if len(self._added) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        rows = [row for model_rows in self.rows.values() for row in model_rows]
+        super().flush()
+        for pks, key in self._added:
+            value = dict.get(pks, key)
+            if isinstance(value, Row):
+                dict.__setitem__(pks, key, value.pk)
+        for row in rows:
+            row._release()
+        self._added = []
+
+
+def _batches(rows, size=BATCH_SIZE):
+    for i in range(0, len(rows), size):
+        yield rows[i : i + size]
+
+
+def insert_rows(table, rows):
+    # executemany needs the same keys in every parameter set; columns without any
+    # default are filled with NULL, the others are grouped by the keys present.
+    # Like the ORM, None is left out for columns with a default, so that it applies.
+    keys = set().union(*rows)
+    nullable = {
+        c.key
+        for c in table.c
+        if c.key in keys and c.default is None and c.server_default is None
+    }
+    defaults = {c.key for c in table.c if c.key in keys and c.key not in nullable}
+    groups = defaultdict(list)
+    for row in rows:
+        for key in defaults:
+            if key in row and row[key] is None:
+                del row[key]
+        for key in nullable - row.keys():
+            row[key] = None
+        groups[tuple(sorted(row))].append(row)
+    for group in groups.values():
+        for batch in _batches(group):
+            DBSession.execute(table.insert(), batch)
+
+
+def _update(table, rows):
+    groups = defaultdict(list)
+    for row in rows:
+        groups[tuple(sorted(k for k in row if k != "_pk"))].append(
+            {f"_{k}": v for k, v in row.items()}
+        )
+    for keys, group in groups.items():
+        stmt = (
+            table.update()
+            .where(table.c.pk == bindparam("__pk"))
+            .values({k: bindparam(f"_{k}") for k in keys})
+        )
+        for batch in _batches(group):
+            DBSession.execute(stmt, batch)
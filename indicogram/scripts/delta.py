@@ -0,0 +1,522 @@
+"""Incremental re-import of a CLDF dataset.
+
+An import run with ``TrackedData`` (``indicogram.manifest = true``) records a manifest
+in the database: a digest of every CLDF table and row, and the objects which were
+added for each row (see ``indicogram.models.ImportedRow``). ``DeltaData`` lets
+``process_cldf`` run over the rows which changed since then only: the objects recorded
+for a changed row are updated in place, so that their primary keys -- and thus the
+references from unchanged rows -- stay valid; objects of new rows are created, those
+of removed rows and those no longer added for a changed row are deleted.
+
+Both hook into ``process_cldf`` via ``track_table``, which reads the rows of a CLDF
+table, and ``track``, which is passed the rows of the sources. Rows of CLDF tables are
+fingerprinted by their cells as read from the CSV file, so that only the rows which
+are processed have to be parsed.
+"""
+import contextlib
+import copy
+import hashlib
+import json
+import tempfile
+from collections import defaultdict, deque
+from pathlib import Path
+
+from clld.cliutil import Data
+from clld.db.meta import Base, DBSession
+from csvw import dsv
+from sqlalchemy import bindparam, func, inspect, select
+from sqlalchemy.orm.interfaces import MANYTOONE
+from zope.sqlalchemy import mark_changed
+
+from indicogram.models import ImportedObject, ImportedRow, ImportedTable
+from indicogram.scripts.bulk import BulkData, CompactData, insert_rows
+
+# Tables processed completely whenever any table changed, because ``process_cldf``
+# builds lookups from them (parameter names, phoneme inventory, media URLs, text tags,
+# chapter order).
+FULL_TABLES = {
+    "ParameterTable",
+    "phonemes.csv",
+    "media.csv",
+    "texts.csv",
+    "chapters.csv",
+}
+
+# Columns through which rows use the content of rows of FULL_TABLES; a row pointing to
+# a changed row of one of these tables is processed again.
+DEPENDENCIES = {"ParameterTable": ["Parameter_ID"], "media.csv": ["Media_ID", "ID"]}
+
+# Tables of which every row uses the complete content of a table of FULL_TABLES, and
+# which are processed completely when it changed: wordforms are segmented with the
+# phoneme inventory.
+INVENTORIES = {"phonemes.csv": ["wordforms.csv"]}
+
+# Columns managed by the database or the mapper, not by ``process_cldf``.
+UNMANAGED = {"pk", "created", "updated", "active", "polymorphic_type"}
+
+
+def digest(obj):
+    return hashlib.sha1(
+        json.dumps(obj, sort_keys=True, default=str).encode("utf8")
+    ).hexdigest()
+
+
+def file_digest(path, schema=None):
+    """Digest of a file and the schema used to read it, ``None`` if it is not a local
+    file."""
+    try:
+        f = open(path, "rb")
+    except (OSError, TypeError):
+        return None
+    hash_ = hashlib.sha1(digest(schema).encode("ascii"))
+    with f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            hash_.update(chunk)
+    return hash_.hexdigest()
+
+
+def _row_id(row):
+    return row["ID"]
+
+
+class RawTable:
+    """The rows of the CSV file of a CLDF table as read, i.e. as lists of strings."""
+
+    def __init__(self, cldf, tablename):
+        self.table = cldf[tablename]
+        self.path = self.table.url.resolve(cldf.directory)
+        self.dialect = self.table._get_dialect()
+        self.digest = file_digest(self.path, self.table.asdict())
+        self.header = None
+        self.columns = {}
+
+    def __iter__(self):
+        """Yield ``(ID, digest, cells)`` for each row."""
+        with contextlib.ExitStack() as stack:
+            # the reader used by Table.iterdicts, so that the rows correspond
+            reader = iter(self.table._get_csv_reader(self.path, self.dialect, stack))
+            self.header = next(reader)[1]
+            id_index = self.header.index("ID")
+            for _, cells in reader:
+                yield cells[id_index], digest(cells), cells
+
+    def value(self, cells, name):
+        """The parsed value of column ``name`` of a row."""
+        if name not in self.columns:
+            col = self.table.get_column(name)
+            self.columns[name] = (
+                (self.header.index(name), col)
+                if col is not None and name in self.header
+                else None
+            )
+        if self.columns[name] is None:
+            return None
+        index, col = self.columns[name]
+        return col.read(cells[index])
+
+    def parse(self, rows):
+        """Parse rows given as lists of cells, the way ``Dataset.iter_rows`` does."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "rows.csv"
+            with dsv.UnicodeWriter(path, dialect=self.dialect) as writer:
+                writer.writerow(self.header)
+                writer.writerows(rows)
+            yield from self.table.iterdicts(fname=path)
+
+
+def _max_pk(model):
+    return DBSession.execute(select(func.max(model.pk))).scalar() or 0
+
+
+class TrackedData(Data):
+    """``Data`` recording the manifest of an import.
+
+    ``process_cldf`` reads the rows of each table through ``track_table`` (and passes
+    the sources through ``track``); all objects added while a row is processed are
+    recorded for that row. ``finish`` writes the manifest.
+    """
+
+    def __init__(self, **kw):
+        super().__init__(**kw)
+        self.tables = {}
+        self.digests = {}
+        self.objects = defaultdict(list)
+        self.current = None
+
+    def track(self, table, rows, path, schema=None, key=_row_id, content=None):
+        self.tables[table] = file_digest(path, schema)
+        for row in rows:
+            self.current = (table, key(row))
+            self.digests[self.current] = digest(content(row) if content else row)
+            yield row
+        self.current = None
+
+    def track_table(self, cldf, tablename, rows=None):
+        """Record the digests of the rows of a table and yield the parsed rows, read
+        with pycldf unless ``rows`` are given."""
+        raw = RawTable(cldf, tablename)
+        self.tables[tablename] = raw.digest
+        for row_id, value, _ in raw:
+            self.digests[(tablename, row_id)] = value
+        for row in cldf.iter_rows(tablename) if rows is None else rows:
+            self.current = (tablename, row["ID"])
+            yield row
+        self.current = None
+
+    def add(self, model_, key_, **kw):
+        new = super().add(model_, key_, **kw)
+        if self.current:
+            self.objects[self.current].append((model_.__name__, key_, new))
+        return new
+
+    def finish(self):
+        """Write the manifest, once all objects have been added."""
+        if isinstance(self, BulkData):
+            self.flush()
+        DBSession.flush()
+        self._write_manifest({})
+
+    def _write_manifest(self, row_pks):
+        # row_pks maps already recorded rows to the pk of their ``ImportedRow``
+        DBSession.execute(
+            ImportedTable.__table__.delete().where(ImportedTable.name.in_(self.tables))
+        )
+        insert_rows(
+            ImportedTable.__table__,
+            [{"name": name, "digest": value} for name, value in self.tables.items()],
+        )
+        new_rows, objects = [], []
+        next_pk = _max_pk(ImportedRow) + 1
+        for (table, row_id), value in self.digests.items():
+            pk = row_pks.get((table, row_id))
+            if pk is None:
+                pk, next_pk = next_pk, next_pk + 1
+                new_rows.append(
+                    {"pk": pk, "table_name": table, "row_id": row_id, "digest": value}
+                )
+            objects.extend(
+                {"row_pk": pk, "model": model, "key": str(key), "object_pk": obj.pk}
+                for model, key, obj in self.objects.get((table, row_id), [])
+            )
+        insert_rows(ImportedRow.__table__, new_rows)
+        insert_rows(ImportedObject.__table__, objects)
+        mark_changed(DBSession())
+
+
+class TrackedBulkData(TrackedData, BulkData):
+    pass
+
+
+class TrackedCompactData(TrackedData, CompactData):
+    pass
+
+
+class DeltaData(TrackedData):
+    """``Data`` for re-importing the rows which changed since the last import.
+
+    Objects which are not in ``self`` are looked up in the manifest, so that changed
+    rows can refer to objects of unchanged rows.
+    """
+
+    def __init__(self, **kw):
+        super().__init__(**kw)
+        self.previous = dict(
+            DBSession.execute(select(ImportedTable.name, ImportedTable.digest)).all()
+        )
+        if not self.previous:
+            raise ValueError(
+                "No import manifest found, import the dataset with "
+                "indicogram.manifest = true first"
+            )
+        self.models = {m.class_.__name__: m.class_ for m in Base.registry.mappers}
+        self.changed = defaultdict(set)
+        self.row_pks = {}
+        self.previous_digests = {}
+        self.footprint = {}
+        self.obsolete = defaultdict(set)
+        self.removed = []
+
+    def __missing__(self, key):
+        self[key] = value = _Lookup(self, key)
+        return value
+
+    def track(self, table, rows, path, schema=None, key=_row_id, content=None):
+        table_digest = file_digest(path, schema)
+        if self._unchanged(table, table_digest):
+            return
+        self.tables[table] = table_digest
+        selected = self._select(
+            table,
+            ((key(row), digest(content(row) if content else row), row) for row in rows),
+            lambda row: self._affected(row.get),
+        )
+        yield from self._process(table, selected, [row for *_, row in selected])
+
+    def track_table(self, cldf, tablename, rows=None):
+        # only the rows to process are parsed, ``rows`` are not used
+        raw = RawTable(cldf, tablename)
+        if self._unchanged(tablename, raw.digest):
+            return
+        self.tables[tablename] = raw.digest
+        selected = self._select(
+            tablename,
+            raw,
+            lambda cells: self._affected(lambda name: raw.value(cells, name)),
+        )
+        if selected:
+            yield from self._process(
+                tablename, selected, raw.parse([cells for *_, cells in selected])
+            )
+
+    def _unchanged(self, table, table_digest):
+        return (
+            table not in FULL_TABLES
+            and not any(self.changed.values())
+            and table_digest is not None
+            and table_digest == self.previous.get(table)
+        )
+
+    def _select(self, table, rows, affected):
+        """Compare ``(ID, digest, row)`` triples to the manifest and return those to
+        process as ``(ID, digest, pk of the ImportedRow, row)``; the objects of rows
+        missing from ``rows`` are marked for deletion."""
+        previous = {
+            row_id: (pk, value)
+            for pk, row_id, value in DBSession.execute(
+                select(ImportedRow.pk, ImportedRow.row_id, ImportedRow.digest).where(
+                    ImportedRow.table_name == table
+                )
+            )
+        }
+        full = table in FULL_TABLES or any(
+            self.changed.get(inventory) and table in tables
+            for inventory, tables in INVENTORIES.items()
+        )
+        selected = []
+        for row_id, value, row in rows:
+            pk, previous_digest = previous.pop(row_id, (None, None))
+            if pk is not None:
+                self.previous_digests[pk] = previous_digest
+            if value != previous_digest:
+                if table in DEPENDENCIES or table in INVENTORIES:
+                    self.changed[table].add(row_id)
+            elif not full and not affected(row):
+                continue
+            selected.append((row_id, value, pk, row))
+        for row_id, (pk, _) in previous.items():
+            if table in DEPENDENCIES or table in INVENTORIES:
+                self.changed[table].add(row_id)
+            self.removed.append(pk)
+        for model, _, object_pk, _ in self._recorded(
+            [pk for pk, _ in previous.values()]
+        ):
+            self.obsolete[model].add(object_pk)
+        return selected
+
+    def _affected(self, get):
+        # get returns the parsed value of a column of the row
+        for table, columns in DEPENDENCIES.items():
+            ids = self.changed.get(table)
+            if ids:
+                for col in columns:
+                    values = get(col)
+                    values = values if isinstance(values, list) else [values]
+                    if ids.intersection(values):
+                        return True
+        return False
+
+    def _recorded(self, row_pks):
+        recorded = []
+        for batch in _chunks(row_pks):
+            recorded.extend(
+                DBSession.execute(
+                    select(
+                        ImportedObject.model,
+                        ImportedObject.key,
+                        ImportedObject.object_pk,
+                        ImportedObject.row_pk,
+                    )
+                    .where(ImportedObject.row_pk.in_(batch))
+                    .order_by(ImportedObject.pk)
+                )
+            )
+        return [tuple(r) for r in recorded]
+
+    def _process(self, table, selected, rows):
+        recorded = defaultdict(list)
+        for model, key, object_pk, row_pk in self._recorded(
+            [pk for _, _, pk, _ in selected if pk is not None]
+        ):
+            recorded[row_pk].append((model, key, object_pk))
+        # load the objects to be updated with one query per model and batch; the
+        # session only keeps weak references, so we hold on to them while processing
+        pks, loaded = defaultdict(list), []
+        for footprint in recorded.values():
+            for model, _, object_pk in footprint:
+                pks[model].append(object_pk)
+        for model, model_pks in pks.items():
+            model = self.models[model]
+            for batch in _chunks(model_pks):
+                loaded.extend(DBSession.query(model).filter(model.pk.in_(batch)))
+        for (row_id, value, pk, _), row in zip(selected, rows):
+            self.current = (table, row_id)
+            self.digests[self.current] = value
+            self.footprint = defaultdict(deque)
+            if pk is not None:
+                self.row_pks[self.current] = pk
+                for model, key, object_pk in recorded[pk]:
+                    self.footprint[(model, key)].append(object_pk)
+            yield row
+            self._end()
+
+    def _end(self):
+        for (model, _), pks in self.footprint.items():
+            self.obsolete[model].update(pks)
+        self.footprint = {}
+        self.current = None
+
+    def claim(self, model_name, key_):
+        """Return the pk of the object recorded under ``key_`` for the current row,
+        if there is one, and mark it as still in use."""
+        pks = self.footprint.get((model_name, key_))
+        if pks:
+            return pks.popleft()
+        return None
+
+    def add(self, model_, key_, **kw):
+        pk = self.claim(model_.__name__, key_)
+        if pk is None:
+            return super().add(model_, key_, **kw)
+        obj = DBSession.get(model_, pk)
+        _reset(obj, kw)
+        self[model_.__name__][key_] = obj
+        self.objects[self.current].append((model_.__name__, key_, obj))
+        return obj
+
+    def lookup(self, model_name, key_):
+        """Return the object recorded under ``key_`` in the manifest, ``None`` if there
+        is none.
+
+        Objects recorded for the current row, and objects about to be deleted because
+        the row they were recorded for no longer adds them, are recorded for the
+        current row from now on.
+        """
+        pk = self.claim(model_name, key_)
+        if pk is None:
+            pks = (
+                DBSession.execute(
+                    select(ImportedObject.object_pk)
+                    .where(ImportedObject.model == model_name, ImportedObject.key == key_)
+                    .order_by(ImportedObject.pk)
+                )
+                .scalars()
+                .all()
+            )
+            live = [pk for pk in pks if pk not in self.obsolete[model_name]]
+            if live:
+                return DBSession.get(self.models[model_name], live[0])
+            if not pks:
+                return None
+            pk = pks[0]
+            self.obsolete[model_name].discard(pk)
+        obj = DBSession.get(self.models[model_name], pk)
+        if self.current:
+            self.objects[self.current].append((model_name, key_, obj))
+        return obj
+
+    def finish(self):
+        """Delete the objects of removed rows and update the manifest."""
+        DBSession.flush()
+        tables = defaultdict(set)
+        for model, pks in self.obsolete.items():
+            for mapper in inspect(self.models[model]).iterate_to_root():
+                tables[mapper.local_table].update(pks)
+        for table in reversed(Base.metadata.sorted_tables):
+            for batch in _chunks(sorted(tables.get(table, []))):
+                DBSession.execute(table.delete().where(table.c.pk.in_(batch)))
+        for batch in _chunks(self.removed + list(self.row_pks.values())):
+            DBSession.execute(
+                ImportedObject.__table__.delete().where(
+                    ImportedObject.row_pk.in_(batch)
+                )
+            )
+        for batch in _chunks(self.removed):
+            DBSession.execute(
+                ImportedRow.__table__.delete().where(ImportedRow.pk.in_(batch))
+            )
+        changed = [
+            {"_pk": pk, "_digest": self.digests[current]}
+            for current, pk in self.row_pks.items()
+            if self.digests[current] != self.previous_digests[pk]
+        ]
+        if changed:
+            DBSession.execute(
+                ImportedRow.__table__.update()
+                .where(ImportedRow.pk == bindparam("_pk"))
+                .values(digest=bindparam("_digest")),
+                changed,
+            )
+        self._write_manifest(self.row_pks)
+        # instances of deleted rows may still be in the session
+        DBSession.expunge_all()
+
+
+class _Lookup(dict):
+    """The objects of one model of ``DeltaData``, falling back to the manifest."""
+
+    def __init__(self, data, model_name):
+        super().__init__()
+        self.data = data
+        self.model_name = model_name
+
+    def __missing__(self, key):
+        obj = self.data.lookup(self.model_name, key)
+        if obj is None:
+            raise KeyError(key)
+        self[key] = obj
+        return obj
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+
+def _chunks(items, size=500):
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def _reset(obj, kw):
+    """Set the attributes of ``obj`` as if it was created as ``type(obj)(**kw)``."""
+    mapper = inspect(obj).mapper
+    if list(kw) == ["_obj"]:
+        new = kw["_obj"]
+        kw = {
+            k: v
+            for k, v in inspect(new).dict.items()
+            if k in mapper.column_attrs and k not in UNMANAGED
+        }
+    kw.setdefault("jsondata", {})
+    foreign_keys = set()
+    for rel in mapper.relationships:
+        if rel.direction is not MANYTOONE or rel.viewonly:
+            continue
+        for local, _ in rel.local_remote_pairs:
+            foreign_keys.add(mapper.get_property_by_column(local).key)
+        if rel.key not in kw:
+            setattr(obj, rel.key, None)
+    for attr in mapper.column_attrs:
+        if attr.key in kw or attr.key in foreign_keys or attr.key in UNMANAGED:
+            continue
+        default = attr.columns[0].default
+        if default is not None and default.is_scalar:
+            setattr(obj, attr.key, copy.copy(default.arg))
+        else:
+            setattr(obj, attr.key, None)
+    for k, v in kw.items():
+        setattr(obj, k, v)
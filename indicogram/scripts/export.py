@@ -0,0 +1,194 @@
+"""Exporting the app as static files.
+
+Nearly everything the app serves only changes when data is imported. ``export_site``
+requests the pages without parameters (the home page, ``/description``, ``/corpus``,
+the indexes of resources etc.), the HTML and JSON pages of all objects of the
+registered resources, the concordance and the audio files from the app and writes them
+to a directory, along with the static assets, so that they can be served by any file
+server. HTML pages are written as ``index.html`` in a directory named after their path,
+other responses (``/morphs/m1.json``) to their path.
+
+Pages are rendered with ``EXPORT_URL`` as the application URL, which is then replaced
+by the URL the files will be served from, by default nothing, i.e. links relative to
+the root of the server. Text pages are exported with all their sentences instead of
+loading them in chunks. Search, paging and the rows of data tables need the app.
+"""
+import logging
+import multiprocessing
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from urllib.parse import quote
+
+from clld import RESOURCES
+from clld.db.meta import DBSession
+from clld.db.models import common
+from clld_morphology_plugin.models import Wordform_files
+from pyramid.interfaces import IRoutesMapper, IStaticURLInfo
+from pyramid.paster import bootstrap
+from pyramid.path import AssetResolver
+from tqdm import tqdm
+from webob import Request
+
+from indicogram.models import ConcordanceKey
+
+log = logging.getLogger(__name__)
+
+EXPORT_URL = "http://export.invalid"
+# routes without parameters only meaningful with the app running
+DYNAMIC_ROUTES = {
+    "_raise",
+    "_ping",
+    "select_combination",
+    "unapi",
+    "olac",
+    "resourcemap",
+    "search",
+    "search_json",
+    "render_cache",
+    "metrics",
+}
+# settings of the app while exporting: text pages with all sentences
+EXPORT_SETTINGS = {"indicogram.text_chunk_size": str(sys.maxsize)}
+CHUNK_SIZE = 200
+
+
+def _routes(registry):
+    return {r.name: r for r in registry.getUtility(IRoutesMapper).get_routes()}
+
+
+def export_paths(registry):
+    """The paths of all pages to export."""
+    routes = _routes(registry)
+    for name, route in routes.items():
+        if not (
+            "{" in route.pattern
+            or "*" in route.pattern
+            or name.endswith("_alt")
+            or name in DYNAMIC_ROUTES
+        ):
+            yield route.pattern
+    for rsc in RESOURCES:
+        if rsc.name not in routes or rsc.model == common.Dataset:
+            continue
+        if not hasattr(rsc.model, "__table__"):  # e.g. combinations
+            continue
+        for (obj_id,) in DBSession.query(rsc.model.id).order_by(rsc.model.pk):
+            yield routes[rsc.name].generate({"id": obj_id})
+            yield routes[rsc.name + "_alt"].generate({"id": obj_id, "ext": "json"})
+    for kind, obj_id in DBSession.query(ConcordanceKey.kind, ConcordanceKey.obj_id):
+        yield routes["concordance"].generate({"kind": kind, "id": obj_id})
+        yield routes["concordance_json"].generate({"kind": kind, "id": obj_id})
+    for model in [Wordform_files, common.Sentence_files]:
+        for (file_id,) in DBSession.query(model.id).filter(
+            model.mime_type.startswith("audio/")
+        ):
+            yield routes["audio_route"].generate({"audio_id": file_id})
+
+
+def target(output, path, content_type):
+    """The file a response for ``path`` is written to."""
+    path = path.strip("/")
+    if content_type == "text/html":
+        return output / path / "index.html"
+    return output / path
+
+
+def _is_text(content_type):
+    return content_type.startswith("text/") or content_type in {
+        "application/json",
+        "application/javascript",
+        "application/xml",
+    }
+
+
+def export_pages(app, output, paths, base_url=""):
+    """Request ``paths`` from ``app`` and write the responses to ``output``; return
+    the number of pages written. Pages without content (e.g. missing audio files) are
+    skipped, pages failing to render are logged and skipped."""
+    written = 0
+    for path in paths:
+        try:
+            res = Request.blank(path, base_url=EXPORT_URL).get_response(app)
+        except Exception:
+            log.exception(f"{path} could not be rendered")
+            continue
+        if res.status_int != 200:
+            continue
+        body = res.body
+        if _is_text(res.content_type):
+            for url, replacement in [
+                (EXPORT_URL, base_url),
+                (quote(EXPORT_URL, safe=""), quote(base_url, safe="")),
+            ]:
+                body = body.replace(url.encode(), replacement.encode())
+        file = target(output, path, res.content_type)
+        file.parent.mkdir(parents=True, exist_ok=True)
+        file.write_bytes(body)
+        written += 1
+    return written
+
+
+def copy_static(registry, output):
+    """Copy the static assets of the app and the plugins to their paths."""
+    resolver = AssetResolver()
+    for _, spec, route_name in registry.getUtility(IStaticURLInfo).registrations:
+        shutil.copytree(
+            resolver.resolve(spec).abspath(),
+            output / route_name.strip("_/"),
+            dirs_exist_ok=True,
+        )
+
+
+_worker_app = None
+
+
+def _start_worker(config_uri):
+    global _worker_app
+    env = bootstrap(config_uri)
+    env["registry"].settings.update(EXPORT_SETTINGS)
+    _worker_app = env["app"]
+
+
+def _export_chunk(output, paths, base_url):
+    return export_pages(_worker_app, output, paths, base_url)
+
+
+def export_site(config_uri, output, base_url="", jobs=1):
+    """Export the app configured in ``config_uri`` to ``output`` with ``jobs`` worker
+    processes; return the number of pages written."""
+    output = Path(output)
+    env = bootstrap(config_uri)
+    paths = list(export_paths(env["registry"]))
+    chunks = [paths[i : i + CHUNK_SIZE] for i in range(0, len(paths), CHUNK_SIZE)]
+    written = 0
+    with tqdm(total=len(paths), unit="page") as progress:
+        if jobs > 1:
+            # new processes: clld registers the resources of an app in a list global
+            # to the process, a second app in a forked process would lack them
+            with ProcessPoolExecutor(
+                jobs,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_start_worker,
+                initargs=(config_uri,),
+            ) as executor:
+                futures = [
+                    (
+                        len(chunk),
+                        executor.submit(_export_chunk, output, chunk, base_url),
+                    )
+                    for chunk in chunks
+                ]
+                for size, future in futures:
+                    written += future.result()
+                    progress.update(size)
+        else:
+            env["registry"].settings.update(EXPORT_SETTINGS)
+            for chunk in chunks:
+                written += export_pages(env["app"], output, chunk, base_url)
+                progress.update(len(chunk))
+    # after rendering, which builds the asset bundles
+    copy_static(env["registry"], output)
+    env["closer"]()
+    return written
@@ -1,6 +1,10 @@
+import contextlib
 import csv
 import logging
 import sys
+import unicodedata
+import uuid
+from datetime import datetime, timezone
 
 import clld_corpus_plugin.models as corpus
 import clld_document_plugin.models as doc
@@ -13,11 +17,28 @@ from clld.lib import bibtex
 from clldutils import licenses
 import shutil
 from pycldf import Sources
+from pyramid.settings import asbool
 from tqdm import tqdm
 from slugify import slugify
+from sqlalchemy import and_, case, distinct, func, select
 from pathlib import Path
 
 import indicogram
+from indicogram.cache import prepare_prerender, prerender_markdown
+from indicogram.concordance import build_concordance
+from indicogram.derivation import build_closure
+from indicogram.interlinear import index_texts, prerender_examples
+from indicogram.paradigm import prerender_paradigms
+from indicogram.search import build_search_index
+from indicogram.scripts.bulk import BulkData, CompactData
+from indicogram.scripts.delta import (
+    DeltaData,
+    TrackedBulkData,
+    TrackedCompactData,
+    TrackedData,
+)
+from indicogram.scripts.parallel import TableParser
+from indicogram.scripts.profiling import ImportProfile
 
 csv.field_size_limit(sys.maxsize)
 
@@ -30,6 +51,15 @@ log.propagate = False
 log.addHandler(handler)
 
 
+def get_option(args, name, default=None):
+    """Look up an import option, either passed as attribute of ``args`` or set as
+    ``indicogram.<name>`` in the app settings (e.g. in ``development.ini``)."""
+    value = getattr(args, name, None)
+    if value is None:
+        value = getattr(args, "settings", {}).get(f"indicogram.{name}", default)
+    return value
+
+
 def listify(obj):
     if not isinstance(obj, list):
         return [obj]
@@ -86,20 +116,125 @@ def tag_slug(tag):
     return tag_dic[tag]
 
 
-def process_cldf(data, dataset, cldf):
+def phoneme_tokenizer(inventory):
+    """Return a function segmenting a form into the IDs of the phonemes in
+    ``inventory`` (mapping phonemes to IDs). At each position the longest matching
+    phoneme is taken, characters not matching any phoneme are skipped."""
+    inventory = {unicodedata.normalize("NFC", k): v for k, v in inventory.items()}
+    longest = max(map(len, inventory), default=0)
+
+    def tokenize(form):
+        form = unicodedata.normalize("NFC", form)
+        i = 0
+        while i < len(form):
+            for size in range(min(longest, len(form) - i), 0, -1):
+                if form[i : i + size] in inventory:
+                    yield inventory[form[i : i + size]]
+                    i += size
+                    break
+            else:
+                i += 1
+
+    return tokenize
+
+
+def count_rows(cldf, tablename):
+    """Estimate the number of rows of a table for progress bars, without parsing it.
+
+    This counts the lines of the CSV file, so rows with multi-line cells are counted
+    more than once. Returns ``None`` if the file can not be read directly.
+    """
+    path = cldf[tablename].url.resolve(cldf.directory)
+    if not isinstance(path, Path) or not path.is_file():
+        return None
+    lines = 0
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            lines += chunk.count(b"\n")
+    return max(lines - 1, 0)
+
+
+# the tables read by process_cldf, in the order they are imported
+IMPORTED_TABLES = [
+    "contributors",
+    "ContributionTable",
+    "LanguageTable",
+    "ParameterTable",
+    "phonemes",
+    "partsofspeech",
+    "media",
+    "wordforms",
+    "morphemes",
+    "morphs",
+    "glosses",
+    "wordformparts",
+    "forms",
+    "formparts",
+    "lexemes",
+    "stems",
+    "stemparts",
+    "wordformstems",
+    "derivationalprocesses",
+    "derivations",
+    "inflectionalcategories",
+    "inflectionalvalues",
+    "inflections",
+    "texts",
+    "speakers",
+    "ExampleTable",
+    "exampleparts",
+    "chapters",
+    "topics",
+    "abbreviations",
+]
+
+
+def cldf_tablename(tablename):
+    """The name of a table in ``IMPORTED_TABLES`` in the CLDF dataset."""
+    if tablename[0] == tablename[0].lower():
+        return f"{tablename}.csv"
+    return tablename
+
+
+def process_cldf(data, dataset, cldf, parser=None, profile=None):
+    profile = profile or ImportProfile()
     cldf_tables = list(cldf.components.keys()) + [
         str(x.url) for x in cldf.tables
     ]  # a list of tables in the dataset
 
+    # tables with a References column, collected while the rows are imported
+    ref_tables = {
+        table
+        for table in cldf_tables
+        if "References" in [col.name for col in cldf[table].tableSchema.columns]
+    }
+    references = {}
+    checkpoint = getattr(data, "checkpoint", lambda: None)
+
     def iter_table(tablename):
-        entries = []
-        if tablename[0] == tablename[0].lower():
-            tablename = f"{tablename}.csv"
+        tablename = cldf_tablename(tablename)
         if tablename in cldf_tables:
-            entries = list(cldf.iter_rows(tablename))
-        if entries:
-            for entry in tqdm(entries, desc=tablename):
-                yield entry
+            # rows parsed in worker processes, see indicogram.scripts.parallel
+            rows = parser.iter_rows(tablename) if parser else None
+            if hasattr(data, "track_table"):
+                # data recording the manifest of the import (see
+                # indicogram.scripts.delta) reads the rows itself
+                rows = data.track_table(cldf, tablename, rows)
+            elif rows is None:
+                rows = cldf.iter_rows(tablename)
+            rows = tqdm(rows, desc=tablename, total=count_rows(cldf, tablename))
+            table_refs = None
+            if tablename in ref_tables and tablename != "topics.csv":
+                table_refs = references.setdefault(str(cldf[tablename].url), {})
+            with profile.stage(tablename) as stage:
+                for row in rows:
+                    stage.rows += 1
+                    if table_refs is not None and row["References"]:
+                        table_refs[row["ID"]] = row["References"]
+                    yield row
+                    # all objects for the row have been added, see
+                    # indicogram.scripts.bulk.CompactData
+                    checkpoint()
         # else:
         #     log.warning(f"Table '{tablename}' does not exist")
 
@@ -136,10 +271,13 @@ def process_cldf(data, dataset, cldf):
             jsondata=jsondata,
         )
         if contributor["Order"]:
-            dataset.editors.append(
-                common.Editor(
-                    contributor=new_cont, ord=contributor["Order"], primary=True
-                )
+            data.add(
+                common.Editor,
+                contributor["ID"],
+                dataset=dataset,
+                contributor=new_cont,
+                ord=contributor["Order"],
+                primary=True,
             )
 
     for ctb in iter_table("ContributionTable"):
@@ -158,8 +296,15 @@ def process_cldf(data, dataset, cldf):
                 contributor=data["Contributor"][contributor],
             )
 
-    for rec in tqdm(bibtex.Database.from_file(cldf.bibpath), desc="Sources"):
-        data.add(common.Source, rec.id, _obj=bibtex2source(rec))
+    sources = tqdm(bibtex.Database.from_file(cldf.bibpath), desc="Sources")
+    if hasattr(data, "track"):
+        sources = data.track(
+            "sources.bib", sources, cldf.bibpath, key=lambda rec: rec.id, content=str
+        )
+    with profile.stage("sources.bib") as stage:
+        for rec in sources:
+            stage.rows += 1
+            data.add(common.Source, rec.id, _obj=bibtex2source(rec))
 
     for lang in iter_table("LanguageTable"):
         data.add(
@@ -178,6 +323,7 @@ def process_cldf(data, dataset, cldf):
     for pnm in iter_table("phonemes"):
         phoneme_dict[pnm["Name"]] = pnm["ID"]
         data.add(indicogram.models.Phoneme, pnm["ID"], id=pnm["ID"], name=pnm["Name"])
+    tokenize = phoneme_tokenizer(phoneme_dict)
 
     for pos in iter_table("partsofspeech"):
         data.add(
@@ -200,6 +346,7 @@ def process_cldf(data, dataset, cldf):
         #     shutil.copy(src_path, target_path)
         media[med["ID"]] = med["Download_URL"].unsplit()
 
+    new_form = None
     for wordform in iter_table("wordforms"):
         new_form = data.add(
             morpho.Wordform,
@@ -213,15 +360,25 @@ def process_cldf(data, dataset, cldf):
             contribution=get_link(wordform, "Contribution_ID"),
         )
         add_source(wordform, new_form)
+        for index, phoneme in enumerate(tokenize(wordform["Form"])):
+            data.add(
+                indicogram.models.FormPhoneme,
+                f"{wordform['ID']}-{index}",
+                form=new_form,
+                phoneme=data["Phoneme"][phoneme],
+                index=index,
+            )
         if "Media_ID" in wordform and wordform["Media_ID"]:
-            morpho.Wordform_files(
+            data.add(
+                morpho.Wordform_files,
+                wordform["ID"],
                 object=new_form,
                 id=wordform["Media_ID"],
                 name=wordform["Media_ID"],
                 mime_type="audio/wav",
             )
 
-    if "wordforms.csv" in cldf_tables:
+    if new_form is not None:
         demo_data.append(
             f"[](FormTable#cldf:{new_form.id}) is one of my favorite [](LanguageTable#cldf:{new_form.language.id}) wordforms."
         )
@@ -440,16 +597,17 @@ def process_cldf(data, dataset, cldf):
         for tag in tags:
             if tag not in data["Tag"]:
                 data.add(corpus.Tag, tag, id=tag, name=tag)
-                data.add(
-                    corpus.TextTag,
-                    text["ID"] + tag,
-                    tag=data["Tag"][tag],
-                    text=new_text,
-                )
+            data.add(
+                corpus.TextTag,
+                text["ID"] + tag,
+                tag=data["Tag"][tag],
+                text=new_text,
+            )
 
     for spk in iter_table("speakers"):
         data.add(corpus.Speaker, spk["ID"], id=spk["ID"], name=spk["Name"])
 
+    new_ex = None
     for ex in iter_table("ExampleTable"):
         ex["Analyzed_Word"] = ["" if x is None else x for x in ex["Analyzed_Word"]]
         ex["Gloss"] = ["" if x is None else x for x in ex["Gloss"]]
@@ -486,28 +644,35 @@ def process_cldf(data, dataset, cldf):
         elif len(ex.get("Source", [])) > 0:
             bibkey, pages = Sources.parse(ex["Source"][0])
             source = data["Source"][bibkey]
-            DBSession.add(
-                common.SentenceReference(
-                    sentence=new_ex, source=source, key=source.id, description=pages
-                )
+            data.add(
+                common.SentenceReference,
+                ex["ID"],
+                sentence=new_ex,
+                source=source,
+                key=source.id,
+                description=pages,
             )
         if "Media_ID" in ex and ex["Media_ID"]:
             new_ex.jsondata["audio_url"] = media[ex["Media_ID"]]
-            common.Sentence_files(
+            data.add(
+                common.Sentence_files,
+                ex["ID"],
                 object=new_ex,
                 id=ex["Media_ID"],
                 name=ex["Media_ID"],
                 mime_type="audio/wav",
             )
         elif ex["ID"] in media:
-            common.Sentence_files(
+            data.add(
+                common.Sentence_files,
+                ex["ID"],
                 object=new_ex,
                 id=ex["ID"],
                 name=ex["ID"],
                 mime_type="audio/wav",
             )
 
-    if "ExampleTable" in cldf_tables:
+    if new_ex is not None:
         demo_data.append(
             f"""As you can see in <a class="exref" example_id="{new_ex.id}"></a>, everything can be a link!\n[](ExampleTable#cldf:{new_ex.id})"""
         )
@@ -572,17 +737,16 @@ def process_cldf(data, dataset, cldf):
             name=abbr["Description"],
         )
 
-    for table in cldf_tables:
-        if table == "topics.csv":
-            continue
-        for row in cldf.iter_rows(table):
-            if "References" in row and row["References"]:
+    with profile.stage("references") as stage:
+        for table, table_refs in references.items():
+            for row_id, row_refs in table_refs.items():
+                stage.rows += 1
                 refs = [
                     f'<a href="/documents/{ref["Chapter"]}#{ref["ID"]}">{ref["Label"]}</a>'
-                    for ref in row["References"]
+                    for ref in row_refs
                 ]
                 data[table.replace("s.csv", "").capitalize()][
-                    row["ID"]
+                    row_id
                 ].markup_description = (
                     "Discussed in:<br><ul>"
                     + "\n".join([f"<li>{x}</li>" for x in refs])
@@ -599,20 +763,18 @@ def process_cldf(data, dataset, cldf):
         )
 
 
-def main(args):
-    cldf = args.cldf  # passed in via --cldf
-    data = Data()
+def dataset_properties(cldf):
     jsondata=get_license_data(cldf.properties.get("dc:license", None), small=False)
     for o, n in {"dc:abstract": "abstract"}.items():
         if o in cldf.properties:
             jsondata[n] = cldf.properties[o]
+    # changes with every import, invalidating caches of rendered content
+    jsondata["import_stamp"] = uuid.uuid4().hex
     if "http" in cldf.properties.get("dc:identifier", ""):
         domain = cldf.properties.get("dc:identifier").split("://")[1]
     else:
         domain = "example.org/"
-    dataset = data.add(
-        common.Dataset,
-        indicogram.__name__,
+    return dict(
         id=indicogram.__name__,
         name=cldf.properties.get(
             "dc:title", "Unnamed dataset"
@@ -624,7 +786,108 @@ def main(args):
         publisher_place="",
         publisher_url="",
     )
-    process_cldf(data, dataset, cldf)
+
+
+def report(args, profile, mode):
+    """Print the time taken by the stages of an import and write them to the JSON
+    file ``indicogram.report``, if set."""
+    print(profile.table())
+    path = get_option(args, "report")
+    if path:
+        profile.write_json(
+            path,
+            finished=datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            dataset=str(args.cldf.tablegroup._fname),
+            mode=mode,
+            jobs=int(get_option(args, "jobs", 1)),
+            database=DBSession.get_bind().dialect.name,
+        )
+
+
+def main(args):
+    cldf = args.cldf  # passed in via --cldf
+    manifest = asbool(get_option(args, "manifest", False))
+    if asbool(get_option(args, "compact", False)):
+        data = TrackedCompactData() if manifest else CompactData()
+        data.batch_size = int(get_option(args, "batch_size", data.batch_size))
+    elif asbool(get_option(args, "bulk", False)):
+        data = TrackedBulkData() if manifest else BulkData()
+    else:
+        data = TrackedData() if manifest else Data()
+    dataset = data.add(common.Dataset, indicogram.__name__, **dataset_properties(cldf))
+    jobs = int(get_option(args, "jobs", 1))
+    profile = ImportProfile(get_option(args, "profile"))
+    with contextlib.ExitStack() as stack:
+        parser = None
+        if jobs > 1:
+            tables = [cldf_tablename(table) for table in IMPORTED_TABLES]
+            parser = stack.enter_context(TableParser(cldf, jobs, tables))
+        process_cldf(data, dataset, cldf, parser=parser, profile=profile)
+    with profile.stage("flush"):
+        if isinstance(data, TrackedData):
+            data.finish()
+        elif isinstance(data, BulkData):
+            data.flush()
+        else:
+            DBSession.flush()
+    report(args, profile, type(data).__name__)
+
+
+def update(args):
+    """Apply the changes made to the CLDF dataset since the last import to the
+    database. The last import has to have recorded a manifest, i.e. it was run with
+    ``indicogram.manifest = true`` (or was an update itself).
+    """
+    cldf = args.cldf
+    dataset = DBSession.query(common.Dataset).one()
+    for key, value in dataset_properties(cldf).items():
+        setattr(dataset, key, value)
+    data = DeltaData()
+    profile = ImportProfile(get_option(args, "profile"))
+    process_cldf(data, dataset, cldf, profile=profile)
+    with profile.stage("flush"):
+        data.finish()
+    report(args, profile, type(data).__name__)
+
+
+def count_phonemes():
+    """Count the occurrences of each phoneme in wordforms, in total, in how many
+    wordforms, and word-initially, -medially and -finally. The phoneme of a wordform
+    of a single segment is counted as both initial and final."""
+    FormPhoneme = indicogram.models.FormPhoneme
+    last = (
+        select(FormPhoneme.form_pk, func.max(FormPhoneme.index).label("index"))
+        .group_by(FormPhoneme.form_pk)
+        .subquery()
+    )
+
+    def count(condition):
+        return func.sum(case((condition, 1), else_=0))
+
+    counts = {
+        row.phoneme_pk: row
+        for row in DBSession.execute(
+            select(
+                FormPhoneme.phoneme_pk,
+                func.count().label("tokens"),
+                func.count(distinct(FormPhoneme.form_pk)).label("types"),
+                count(FormPhoneme.index == 0).label("initial"),
+                count(
+                    and_(FormPhoneme.index > 0, FormPhoneme.index < last.c.index)
+                ).label("medial"),
+                count(FormPhoneme.index == last.c.index).label("final"),
+            )
+            .join(last, last.c.form_pk == FormPhoneme.form_pk)
+            .group_by(FormPhoneme.phoneme_pk)
+        )
+    }
+    for phoneme in DBSession.query(indicogram.models.Phoneme):
+        row = counts.get(phoneme.pk)
+        phoneme.count_tokens = row.tokens if row else 0
+        phoneme.count_types = row.types if row else 0
+        phoneme.count_initial = row.initial if row else 0
+        phoneme.count_medial = row.medial if row else 0
+        phoneme.count_final = row.final if row else 0
 
 
 def prime_cache(args):
@@ -632,3 +895,21 @@ def prime_cache(args):
     This procedure should be separate from the db initialization, because
     it will have to be run periodically whenever data has been updated.
     """
+    # for databases created before the indexes were added
+    for index in indicogram.models.DATATABLE_INDEXES + [
+        indicogram.models.DERIVATION_PROCESS_INDEX
+    ]:
+        index.create(DBSession.connection(), checkfirst=True)
+    count_phonemes()
+    index_texts()
+    build_concordance()
+    build_closure()
+    dataset = DBSession.query(common.Dataset).one()
+    documents = DBSession.query(doc.Document).filter(doc.Document.description != None)
+    prepare_prerender(args.env["request"])
+    prerender_paradigms(args.env["request"])
+    # examples first, so that the chapters are rendered with the stored units
+    prerender_examples(args.env["request"])
+    prerender_markdown(args.env["request"], [dataset] + documents.all())
+    # after pre-rendering, to index the text of the chapters
+    build_search_index()
@@ -0,0 +1,73 @@
+"""Parsing the tables of a CLDF dataset in worker processes.
+
+Reading a CLDF table with pycldf means parsing the CSV and converting every cell to
+its datatype, which takes most of the time of an import of a large dataset. Tables do
+not depend on each other when they are parsed, only when their rows are imported, so
+``process_cldf`` can have the next tables parsed in parallel while it imports one after
+the other. Workers send the rows as tuples of values, which are much cheaper to pass
+between processes than dicts. A parsed table is kept in memory until it is imported,
+so only as many tables as there are workers are parsed ahead of the one imported.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+from pycldf import Dataset
+
+
+def parse_table(metadata, tablename):
+    """Parse a table of the dataset described by ``metadata`` and return the column
+    names and the rows as tuples."""
+    header, rows = None, []
+    for row in Dataset.from_metadata(metadata).iter_rows(tablename):
+        if header is None:
+            header = tuple(row)
+        rows.append(tuple(row.values()))
+    return header, rows
+
+
+class TableParser:
+    """Parses the tables ``tablenames`` of ``cldf`` in the order given, with ``jobs``
+    worker processes, at most ``jobs`` tables ahead of the table imported."""
+
+    def __init__(self, cldf, jobs, tablenames):
+        self.cldf = cldf
+        self.jobs = jobs
+        self.executor = ProcessPoolExecutor(jobs)
+        self.metadata = str(cldf.tablegroup._fname)
+        self.pending = []
+        for tablename in tablenames:
+            try:
+                url = str(cldf[tablename].url)
+            except KeyError:  # not in the dataset
+                continue
+            if url not in self.pending:
+                self.pending.append(url)
+        self.futures = {}
+        self._fill()
+
+    def _submit(self, url):
+        self.futures[url] = self.executor.submit(parse_table, self.metadata, url)
+
+    def _fill(self):
+        while self.pending and len(self.futures) < self.jobs:
+            self._submit(self.pending.pop(0))
+
+    def iter_rows(self, tablename):
+        url = str(self.cldf[tablename].url)
+        if url not in self.futures:  # not in the order given
+            if url in self.pending:
+                self.pending.remove(url)
+            self._submit(url)
+        future = self.futures.pop(url)
+        self._fill()
+        header, rows = future.result()
+        for values in rows:
+            yield dict(zip(header, values))
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,134 @@
+"""Timing the stages of an import.
+
+``process_cldf`` runs every CLDF table as a stage of an ``ImportProfile``; the time
+of a stage includes parsing the rows as well as creating the objects for them. For
+each stage, the wall time, the number of rows, the number of SQL statements executed
+and the peak memory (RSS) are recorded. With ``profile_dir``, every stage is also
+profiled with cProfile, to find out which functions take the time of a slow stage.
+"""
+import cProfile
+import json
+import resource
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from clld.db.meta import DBSession
+from clldutils.markup import Table
+from sqlalchemy import event
+
+PROC_STATUS = Path("/proc/self/status")
+CLEAR_REFS = Path("/proc/self/clear_refs")
+
+
+def reset_peak_rss():
+    """Start measuring the peak RSS anew, where the OS allows to (Linux)."""
+    try:
+        CLEAR_REFS.write_text("5")
+    except OSError:
+        pass
+
+
+def peak_rss():
+    """Peak RSS in kB since the last ``reset_peak_rss``; without ``/proc``, the peak
+    RSS of the process."""
+    if PROC_STATUS.exists():
+        for line in PROC_STATUS.read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class Stage:
+    __slots__ = ("name", "rows", "seconds", "queries", "peak_rss")
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.peak_rss = 0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def asdict(self):
+        res = {k: getattr(self, k) for k in self.__slots__}
+        res["rows_per_second"] = self.rows_per_second
+        return res
+
+
+class ImportProfile:
+    """The stages of an import, see ``stage``."""
+
+    def __init__(self, profile_dir=None):
+        self.stages = []
+        self.profile_dir = Path(profile_dir) if profile_dir else None
+        self.queries = 0
+        if self.profile_dir:
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+
+    def _count_query(self, *args, **kw):
+        self.queries += 1
+
+    @contextmanager
+    def stage(self, name):
+        """Record a stage; count its rows by incrementing ``rows`` of the ``Stage``
+        returned."""
+        stage = Stage(name)
+        self.stages.append(stage)
+        engine = DBSession.get_bind()
+        event.listen(engine, "before_cursor_execute", self._count_query)
+        profiler = cProfile.Profile() if self.profile_dir else None
+        queries = self.queries
+        reset_peak_rss()
+        start = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            yield stage
+        finally:
+            if profiler:
+                profiler.disable()
+                profiler.dump_stats(str(self.profile_dir / f"{name}.prof"))
+            stage.seconds = time.perf_counter() - start
+            stage.peak_rss = peak_rss()
+            event.remove(engine, "before_cursor_execute", self._count_query)
+            stage.queries = self.queries - queries
+
+    def table(self):
+        table = Table("stage", "rows", "seconds", "rows/s", "queries", "peak RSS (MB)")
+        for stage in self.stages:
+            table.append(
+                [
+                    stage.name,
+                    stage.rows,
+                    f"{stage.seconds:.2f}",
+                    f"{stage.rows_per_second:.0f}",
+                    stage.queries,
+                    f"{stage.peak_rss / 1024:.0f}",
+                ]
+            )
+        table.append(
+            [
+                "total",
+                sum(s.rows for s in self.stages),
+                f"{sum(s.seconds for s in self.stages):.2f}",
+                "",
+                sum(s.queries for s in self.stages),
+                f"{max((s.peak_rss for s in self.stages), default=0) / 1024:.0f}",
+            ]
+        )
+        return table.render(tablefmt="simple")
+
+    def write_json(self, path, **meta):
+        """Write the stages to ``path``, together with ``meta`` data about the
+        import (e.g. the options used)."""
+        Path(path).write_text(
+            json.dumps(
+                dict(meta, stages=[stage.asdict() for stage in self.stages]),
+                indent=2,
+            ),
+            encoding="utf8",
+        )
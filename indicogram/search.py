@@ -0,0 +1,174 @@
+"""Full-text search over examples, wordforms, morphs, morphemes, lexemes and chapters.
+
+``prime_cache`` collects the searchable text of all these objects as
+``SearchDocument`` rows: names (primary texts), analyzed words, glosses, translations
+and the text of chapters. They are indexed with FTS5 on SQLite and with a weighted
+tsvector on PostgreSQL (see ``indicogram.models``); ``search`` returns the matches
+ranked by relevance, a page at a time.
+"""
+import html
+import re
+from collections import namedtuple
+
+from clld.db.meta import DBSession
+from clld.db.models import common
+from clld_document_plugin.models import Document
+from clld_morphology_plugin.models import Lexeme, Morph, Morpheme, Wordform
+from markupsafe import Markup
+from sqlalchemy import bindparam, func, literal, null, select, text
+from zope.sqlalchemy import mark_changed
+
+from indicogram.models import (
+    SEARCH_FTS,
+    SEARCH_TSVECTOR,
+    RenderedMarkdown,
+    SearchDocument,
+)
+from indicogram.scripts.bulk import BATCH_SIZE, insert_rows
+
+PAGE_SIZE = 20
+
+SearchKind = namedtuple("SearchKind", "label route columns")
+
+
+def _document_columns():
+    # the text of the pre-rendered chapters, their markdown if there is none
+    rendered = select(RenderedMarkdown.html).where(
+        RenderedMarkdown.key == literal("document/") + Document.id
+    )
+    body = func.coalesce(rendered.scalar_subquery(), Document.description)
+    return select(Document.pk, Document.id, Document.name, null(), null(), null(), body)
+
+
+def _unit_columns(model):
+    return lambda: select(
+        model.pk, model.id, model.name, null(), null(), model.description, null()
+    )
+
+
+KINDS = {
+    "sentence": SearchKind(
+        "Examples",
+        "sentence",
+        lambda: select(
+            common.Sentence.pk,
+            common.Sentence.id,
+            common.Sentence.name,
+            common.Sentence.analyzed,
+            common.Sentence.gloss,
+            common.Sentence.description,
+            null(),
+        ),
+    ),
+    "wordform": SearchKind("Wordforms", "wordform", _unit_columns(Wordform)),
+    "morph": SearchKind("Morphs", "morph", _unit_columns(Morph)),
+    "morpheme": SearchKind("Morphemes", "morpheme", _unit_columns(Morpheme)),
+    "lexeme": SearchKind("Lexemes", "lexeme", _unit_columns(Lexeme)),
+    "document": SearchKind("Chapters", "document", _document_columns),
+}
+
+TAG = re.compile(r"<[^>]+>")
+# marking matches in snippets, replaced after escaping them
+MARK_START, MARK_END = "\x02", "\x03"
+
+
+def strip_tags(content):
+    return html.unescape(TAG.sub(" ", content)) if content else content
+
+
+def build_search_index():
+    """Replace the search documents with the current content of the database."""
+    table = SearchDocument.__table__
+    DBSession.execute(table.delete())
+    for kind, spec in KINDS.items():
+        result = DBSession.execute(spec.columns())
+        for rows in result.partitions(BATCH_SIZE):
+            insert_rows(
+                table,
+                [
+                    dict(
+                        kind=kind,
+                        obj_pk=pk,
+                        obj_id=obj_id,
+                        name=name,
+                        analyzed=analyzed and analyzed.replace("\t", " "),
+                        gloss=gloss and gloss.replace("\t", " "),
+                        translation=translation,
+                        body=strip_tags(body),
+                    )
+                    for pk, obj_id, name, analyzed, gloss, translation, body in rows
+                ],
+            )
+    if DBSession.get_bind().dialect.name == "sqlite":
+        DBSession.execute(
+            text(f"INSERT INTO {SEARCH_FTS}({SEARCH_FTS}) VALUES ('rebuild')")
+        )
+    mark_changed(DBSession())
+
+
+def fts5_query(query):
+    """Match all words of ``query``, as prefixes, taking the input literally."""
+    return " ".join('"{}"*'.format(word.replace('"', '""')) for word in query.split())
+
+
+Result = namedtuple("Result", "kind obj_id name snippet rank")
+
+
+def search(query, kinds=None, page=1, size=PAGE_SIZE):
+    """The total number of documents matching ``query`` (of the given ``kinds``) and
+    the results on ``page``, best match first."""
+    if not query.strip():
+        return 0, []
+    kinds = list(kinds or KINDS)
+    params = dict(
+        kinds=kinds,
+        limit=size,
+        offset=(page - 1) * size,
+        start=MARK_START,
+        end=MARK_END,
+    )
+    if DBSession.get_bind().dialect.name == "sqlite":
+        params["query"] = fts5_query(query)
+        source = (
+            f"FROM {SEARCH_FTS} JOIN searchdocument AS d ON d.pk = {SEARCH_FTS}.rowid "
+            f"WHERE {SEARCH_FTS} MATCH :query AND d.kind IN :kinds"
+        )
+        columns = (
+            f"snippet({SEARCH_FTS}, -1, :start, :end, '…', 12), "
+            # weights of name, analyzed, gloss, translation, body
+            f"bm25({SEARCH_FTS}, 4.0, 2.0, 1.0, 2.0, 1.0) AS rank"
+        )
+        order = "rank"
+    else:
+        params["query"] = query
+        source = (
+            "FROM searchdocument AS d, plainto_tsquery('simple', :query) AS q "
+            f"WHERE ({SEARCH_TSVECTOR}) @@ q AND d.kind IN :kinds"
+        )
+        columns = (
+            "ts_headline('simple', concat_ws(' ', d.name, d.analyzed, d.translation,"
+            " d.gloss, d.body), q, 'StartSel=' || :start || ', StopSel=' || :end), "
+            f"ts_rank({SEARCH_TSVECTOR}, q) AS rank"
+        )
+        order = "rank DESC"
+    expanding = [bindparam("kinds", expanding=True)]
+    total = DBSession.execute(
+        text(f"SELECT count(*) {source}").bindparams(*expanding), params
+    ).scalar()
+    rows = DBSession.execute(
+        text(
+            f"SELECT d.kind, d.obj_id, d.name, {columns} {source} "
+            f"ORDER BY {order}, d.pk LIMIT :limit OFFSET :offset"
+        ).bindparams(*expanding),
+        params,
+    )
+    return total, [Result(*row) for row in rows]
+
+
+def highlighted(snippet):
+    """HTML for a snippet, with the matches marked."""
+    return Markup(
+        html.escape(snippet or "")
+        .replace(MARK_START, "<mark>")
+        .replace(MARK_END, "</mark>")
+    )
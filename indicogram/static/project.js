@@ -0,0 +1,107 @@
+/**
+ * One audio element shared by all play buttons on a page (see
+ * indicogram.util.audio_button); a file is only requested when its button is clicked.
+ */
+var AUDIO = (function () {
+    var player = new Audio(),
+        current = null;
+
+    player.preload = 'none';
+
+    function reset() {
+        if (current) {
+            $(current).find('i').attr('class', 'icon-play');
+            current = null;
+        }
+    }
+
+    function button(audio_id) {
+        return $('<button type="button" class="btn btn-mini audio-play"><i class="icon-play"></i></button>')
+            .attr('data-audio', audio_id);
+    }
+
+    player.addEventListener('ended', reset);
+    player.addEventListener('error', reset);
+
+    $(document).on('click', 'button.audio-play', function () {
+        if (current === this) {
+            player.pause();
+            reset();
+            return;
+        }
+        reset();
+        current = this;
+        $(this).find('i').attr('class', 'icon-pause');
+        player.src = CLLD.route_url(
+            'audio_route', {'audio_id': encodeURIComponent($(this).attr('data-audio'))});
+        player.play();
+    });
+
+    // players rendered by the plugins are replaced with buttons as well
+    $(function () {
+        $('audio').each(function () {
+            var src = $(this).find('source').attr('src') || '';
+            if (src.indexOf('/audio/') === 0) {
+                $(this).replaceWith(button(decodeURIComponent(src.slice('/audio/'.length))));
+            }
+        });
+    });
+
+    return {'player': player};
+})();
+
+/**
+ * Loads the sentences of a text page in chunks (see indicogram.views.text_sentences)
+ * when scrolling close to the end of the ones loaded so far.
+ */
+$(function () {
+    var list = $('ol#text-sentences'),
+        loading = false;
+
+    if (!list.length) {
+        return;
+    }
+
+    function loaded() {
+        return list.children('li').length;
+    }
+
+    function more(done) {
+        if (loading || loaded() >= list.data('total')) {
+            return;
+        }
+        loading = true;
+        $.get(
+            CLLD.route_url('text_sentences', {'id': encodeURIComponent(list.data('text'))}),
+            {'start': loaded()}
+        ).always(function () {
+            loading = false;
+        }).done(function (html) {
+            list.append(html);
+            number_examples();
+            if (done) {
+                done();
+            }
+        });
+    }
+
+    // links to sentences further down the text
+    function reveal() {
+        var target = decodeURIComponent(window.location.hash.slice(1));
+        if (!target) {
+            return;
+        }
+        if (document.getElementById(target)) {
+            document.getElementById(target).scrollIntoView();
+        } else if (loaded() < list.data('total')) {
+            more(reveal);
+        }
+    }
+
+    $(window).on('scroll', function () {
+        if ($(window).scrollTop() + 2 * $(window).height() > list.offset().top + list.height()) {
+            more();
+        }
+    });
+    reveal();
+});
@@ -0,0 +1,39 @@
+<%inherit file="app.mako"/>
+<%! from indicogram.concordance import KINDS %>
+
+<h2>
+    <a href="${key['url']}">${key['name'] or key['id']}</a>
+    <small>${KINDS[key['kind']].label}</small>
+</h2>
+
+<p>
+    ${key['tokens']} occurrence${'' if key['tokens'] == 1 else 's'} in
+    ${key['sentences']} example${'' if key['sentences'] == 1 else 's'}
+    (<a href="${request.route_url('concordances', _query=dict(kind=key['kind']))}">all ${KINDS[key['kind']].label.lower()}</a>)
+</p>
+
+<table class="table table-condensed kwic">
+    <tbody>
+    % for line in lines:
+        <tr>
+            <td><a href="${line['url']}">${line['sentence_id']}</a></td>
+            <td style="text-align: right">${line['left']}</td>
+            <td><strong>${line['keyword']}</strong><br/><span class="muted">${line['gloss']}</span></td>
+            <td>${line['right']}</td>
+            <td class="muted">${line['translation'] or ''}</td>
+        </tr>
+    % endfor
+    </tbody>
+</table>
+
+% if pages > 1:
+    <ul class="pager">
+        % if page > 1:
+            <li class="previous"><a href="${request.current_route_url(_query=dict(page=page - 1))}">&larr; Previous</a></li>
+        % endif
+        <li>${page} / ${pages}</li>
+        % if page < pages:
+            <li class="next"><a href="${request.current_route_url(_query=dict(page=page + 1))}">Next &rarr;</a></li>
+        % endif
+    </ul>
+% endif
@@ -0,0 +1,39 @@
+<%inherit file="app.mako"/>
+<%! from indicogram.concordance import KINDS %>
+
+<h2>Concordance</h2>
+
+<ul class="nav nav-pills">
+    <li class="${'' if kind else 'active'}"><a href="${request.route_url('concordances')}">All</a></li>
+    % for name, spec in KINDS.items():
+        <li class="${'active' if kind == name else ''}"><a href="${request.route_url('concordances', _query=dict(kind=name))}">${spec.label}</a></li>
+    % endfor
+</ul>
+
+<table class="table table-condensed">
+    <thead>
+        <tr><th></th><th></th><th>Occurrences</th><th>Examples</th></tr>
+    </thead>
+    <tbody>
+    % for key in keys:
+        <tr>
+            <td><a href="${key['concordance']}">${key['name'] or key['id']}</a></td>
+            <td class="muted">${KINDS[key['kind']].label}</td>
+            <td>${key['tokens']}</td>
+            <td>${key['sentences']}</td>
+        </tr>
+    % endfor
+    </tbody>
+</table>
+
+% if pages > 1:
+    <ul class="pager">
+        % if page > 1:
+            <li class="previous"><a href="${request.current_route_url(_query=dict(kind=kind or '', page=page - 1))}">&larr; Previous</a></li>
+        % endif
+        <li>${page} / ${pages}</li>
+        % if page < pages:
+            <li class="next"><a href="${request.current_route_url(_query=dict(kind=kind or '', page=page + 1))}">Next &rarr;</a></li>
+        % endif
+    </ul>
+% endif
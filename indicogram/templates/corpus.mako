@@ -1,4 +1,5 @@
 <%inherit file="app.mako"/>
+<%namespace name="search" file="search_form.mako"/>
 <% from clld_corpus_plugin.models import Text, Speaker %>
 <% from clld.db.models.common import Sentence %>
 
@@ -20,6 +21,9 @@
     ## </a>
 </%block>
 
+${search.form(kinds=["sentence"], placeholder="Search examples")}
+<p><a href="${req.route_url('concordances')}">Concordance of morphs, morphemes and glosses</a></p>
+
 <div class="tabbable">
 
     <ul class="nav nav-tabs">
@@ -1,4 +1,4 @@
-<%from clld_markdown_plugin import markdown%> ${markdown(request, ctx.description)|n}
+<%from indicogram.cache import rendered_markdown%> ${rendered_markdown(request, ctx)|n}
 
 <script src="${req.static_url('clld_document_plugin:static/clld-document.js')}">
 </script>
@@ -1,4 +1,4 @@
-<%from clld_markdown_plugin import markdown%>
+<%from indicogram.cache import markdown%>
 <%from clld.db.meta import DBSession%>
 <%from clld_document_plugin.models import Document%>
 
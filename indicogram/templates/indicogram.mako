@@ -2,7 +2,7 @@
 <link rel="stylesheet" href="${req.static_url('clld_document_plugin:static/clld-document.css')}"/>
 
 <%def name="markdown(request, content)">
-    <%from clld_markdown_plugin import markdown%>
+    <%from indicogram.cache import markdown%>
     ${markdown(request, content)|n}
 </%def>
 
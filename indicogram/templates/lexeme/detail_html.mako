@@ -0,0 +1,71 @@
+<%inherit file="../${context.get('request').registry.settings.get('clld.app_template', 'app.mako')}"/>
+<%namespace name="util" file="../util.mako"/>
+<% from clld_morphology_plugin.models import Wordform %>
+<%import indicogram.paradigm as paradigm%>
+<%! active_menu_item = "lexemes" %>
+
+<h3>${_('Lexeme')} <i style="font-variant: small-caps;">${ctx.name}</i> ‘${ctx.description}’</h3>
+
+<table class="table table-nonfluid">
+    <tbody>
+            <tr>
+                <td> Language: </td>
+                <td> ${h.link(request, ctx.language)}</td>
+            </tr>
+        % if ctx.pos:
+            <tr>
+                <td> Part of speech: </td>
+                <td> ${h.link(request, ctx.pos)} </td>
+            </tr>
+        % endif
+        % if ctx.stems:
+            <tr>
+                <td> Stems: </td>
+                <td> ${h.text2html(", ".join([h.link(request, stem) for stem in ctx.stems]))}</td>
+            </tr>
+        % endif
+    </tbody>
+</table>
+
+<p>${h.text2html(h.Markup(ctx.markup_description or ""))}</p>
+
+## the cells are rendered HTML, see indicogram.paradigm
+<% grid = paradigm.paradigm(request, ctx) %>
+% if grid:
+    Inflected forms:
+    <table border="1">
+        % for col_idx, colname in enumerate(grid["colnames"]):
+            <tr>
+                % for x in range(len(grid["idxnames"])-1):
+                    <td> </td>
+                % endfor
+                <th> ${colname|n} </th>
+                % for column in grid["columns"]:
+                    <th> ${column[col_idx]|n} </th>
+                % endfor
+            </tr>
+        % endfor
+        <tr>
+            % for idxname in grid["idxnames"]:
+                <th> ${idxname|n} </th>
+            % endfor
+        </tr>
+        % for idxnames, cells in zip(grid["index"], grid["cells"]):
+            <tr>
+                % for idxname in idxnames:
+                    <th> ${idxname|n} </th>
+                % endfor
+                % for cell in cells:
+                    <td>
+                        % for form in cell:
+                            <i>${form|n}</i> <br>
+                        % endfor
+                    </td>
+                % endfor
+            </tr>
+        % endfor
+    </table>
+% endif
+
+<h4>${_('Wordforms')}:</h4>
+${request.get_datatable('wordforms', Wordform, lexeme=ctx).render()}
@@ -1,4 +1,5 @@
 <%inherit file="app.mako"/>
+<%namespace name="search" file="search_form.mako"/>
 <% from clld_morphology_plugin.models import Lexeme, Stem, DerivationalProcess, Morph, Morpheme %>
 <% from clld.db.models.common import Source %>
 
@@ -20,6 +21,8 @@
     ## </a>
 </%block>
 
+${search.form(kinds=["morpheme", "morph", "lexeme", "wordform"], placeholder="Search morphemes, morphs, lexemes and wordforms")}
+
 <div class="tabbable">
 
     <ul class="nav nav-tabs">
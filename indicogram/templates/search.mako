@@ -0,0 +1,40 @@
+<%inherit file="app.mako"/>
+<%! from indicogram.search import KINDS %>
+
+<h2>Search</h2>
+
+<form class="form-search" action="${request.route_url('search')}" method="get">
+    <input type="text" name="q" value="${query}" class="input-xxlarge search-query" placeholder="examples, wordforms, morphs, lexemes, chapters"/>
+    <button type="submit" class="btn">Search</button>
+    <p>
+    % for kind, spec in KINDS.items():
+        <label class="checkbox inline">
+            <input type="checkbox" name="kind" value="${kind}" ${'checked' if kind in kinds else ''}/> ${spec.label}
+        </label>
+    % endfor
+    </p>
+</form>
+
+% if query:
+    <p>${total} result${'' if total == 1 else 's'}</p>
+    <ol start="${(page - 1) * size + 1}">
+    % for result in results:
+        <li>
+            <a href="${result['url']}">${result['name'] or result['id']}</a>
+            <span class="muted">${KINDS[result['kind']].label}</span>
+            <br/>${result['snippet']}
+        </li>
+    % endfor
+    </ol>
+    % if pages > 1:
+        <ul class="pager">
+            % if page > 1:
+                <li class="previous"><a href="${request.current_route_url(_query=dict(q=query, kind=kinds, page=page - 1))}">&larr; Previous</a></li>
+            % endif
+            <li>${page} / ${pages}</li>
+            % if page < pages:
+                <li class="next"><a href="${request.current_route_url(_query=dict(q=query, kind=kinds, page=page + 1))}">Next &rarr;</a></li>
+            % endif
+        </ul>
+    % endif
+% endif
@@ -0,0 +1,10 @@
+<%def name="form(kinds=None, query='', placeholder='Search')">
+    <%! from indicogram.search import KINDS %>
+    <form class="form-search" action="${request.route_url('search')}" method="get">
+        <input type="text" name="q" value="${query}" class="input-xlarge search-query" placeholder="${placeholder}"/>
+        % for kind in kinds or []:
+            <input type="hidden" name="kind" value="${kind}"/>
+        % endfor
+        <button type="submit" class="btn">Search</button>
+    </form>
+</%def>
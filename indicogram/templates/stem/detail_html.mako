@@ -0,0 +1,59 @@
+<%inherit file="../${context.get('request').registry.settings.get('clld.app_template', 'app.mako')}"/>
+<%namespace name="util" file="../util.mako"/>
+<% from clld_morphology_plugin.util import rendered_form %>
+<%import indicogram.derivation as derivation%>
+<% from clld_morphology_plugin.models import Wordform %>
+<%! active_menu_item = "stems" %>
+
+<h3>${_('Stem')} <i>${ctx.name}</i> ‘${ctx.description}’</h3>
+
+<table class="table table-nonfluid">
+    <tbody>
+        <tr>
+            <td>Language:</td>
+            <td>${h.link(request, ctx.language)}</td>
+        </tr>
+        % if ctx.lexeme:
+            <tr>
+                <td> Lexeme: </td>
+                <td> ${h.link(request, ctx.lexeme)}</td>
+            </tr>        
+        % endif
+        % if ctx.parts:
+            <tr>
+                <td> Structure: </td>
+                <td>
+                    ${rendered_form(request, ctx) | n}<br>
+                    ${rendered_form(request, ctx, line="gloss") | n}
+                    ## ${rendered_form(request, ctx, level="stem") | n}<br>
+                    ## ${rendered_form(request, ctx, level="stem", line="gloss") | n}
+                </td>
+            </tr>
+        % endif
+        <% lineage = derivation.render_lineage(request, ctx) %>
+        % if lineage:
+            <tr>
+                <td> ${_('Derivational lineage')}: </td>
+                <td>
+                    ${lineage | n}
+                </td>
+            </tr>
+        % endif
+        <% derived_stems = derivation.render_family(request, ctx) %>
+        % if derived_stems:
+            <tr>
+                <td> ${_('Derived stems')}: </td>
+                <td>
+                    ${derived_stems}
+                </td>
+            </tr>
+        % endif
+    </tbody>
+</table>
+
+<p>${h.text2html(h.Markup(ctx.markup_description or ""))}</p>
+
+% if ctx.stemforms:
+    <h4>${_('Wordforms')}:</h4>
+    ${request.get_datatable('wordforms', Wordform, stem=ctx).render()}
+% endif
\ No newline at end of file
@@ -1,3 +1,9 @@
 import pytest
+from clld.db.meta import DBSession
 
-from indicogram import models
+
+@pytest.fixture
+def session(db):
+    yield DBSession
+    DBSession.rollback()
+    DBSession.remove()
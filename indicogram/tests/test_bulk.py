@@ -0,0 +1,148 @@
+import argparse
+import json
+
+import clld_corpus_plugin.models as corpus
+import clld_document_plugin.models as doc
+import clld_morphology_plugin.models as morpho
+import pytest
+from clld.db.meta import Base
+from clld.db.models import common
+from test_delta import write_dataset
+
+from indicogram.scripts import initializedb
+from indicogram.scripts.bulk import BulkData, CompactData
+
+WORDFORMS = [(f"wf{i}", "kuna"[: i % 4 + 1], f"p{i % 2 + 1}") for i in range(12)]
+EXAMPLES = [(f"ex{i}", [f"wf{i}", f"wf{i + 1}"]) for i in range(6)]
+CHAPTERS = [("landingpage", "Home", "Welcome", None), ("notes", "Notes", "", None)] + [
+    (f"ch{i}", f"Chapter {i}", f"Text of chapter {i}", i) for i in range(1, 4)
+]
+
+
+def _json(row):
+    return json.dumps(row, sort_keys=True, default=str)
+
+
+def dump(session):
+    """The rows of all tables, with primary and foreign keys replaced by the ids of
+    the rows (or their content), to compare imports assigning different pks."""
+    keys, res = {}, {}
+    for table in Base.metadata.sorted_tables:
+        fks = {
+            c.name: fk.column.table.name for c in table.columns for fk in c.foreign_keys
+        }
+        rows, table_keys, self_refs = [], {}, []
+        for row in session.execute(table.select()).mappings():
+            row = {k: v for k, v in row.items() if k not in {"created", "updated"}}
+            pk = row.pop("pk", None)
+            if table.name == "dataset":
+                row["jsondata"] = dict(row["jsondata"] or {}, import_stamp=None)
+            for col, target in fks.items():
+                if row.get(col) is not None:
+                    if target == table.name:
+                        self_refs.append((row, col))
+                    else:
+                        row[col] = keys[target][row[col]]
+            rows.append(row)
+            table_keys[pk] = row.get("id") or _json(row)
+        for row, col in self_refs:
+            row[col] = table_keys[row[col]]
+        keys[table.name] = table_keys
+        res[table.name] = sorted(_json(row) for row in rows)
+    return res
+
+
+def imported(session, cldf, **options):
+    initializedb.main(argparse.Namespace(cldf=cldf, settings={}, **options))
+    session.flush()
+    res = dump(session)
+    session.rollback()
+    return res
+
+
+def test_bulk_data(session):
+    data = BulkData()
+    lg = data.add(common.Language, "l", id="bulk-l", name="Language")
+    form = data.add(
+        morpho.Wordform, "f", id="bulk-f", name="f", language=lg, parts=["a", "b"]
+    )
+    data.add(
+        morpho.Wordform_files,
+        "f",
+        object=form,
+        id="bulk-a",
+        name="a",
+        mime_type="audio/wav",
+    )
+    ex = data.add(corpus.Record, "e", id="bulk-e", name="e", language=lg)
+    ex.jsondata["audio_url"] = "x.wav"
+    first = data.add(doc.Document, "1", id="bulk-1", name="One")
+    second = data.add(doc.Document, "2", id="bulk-2", name="Two")
+    second.preceding = first
+    assert form.language.id == "bulk-l"
+    with pytest.raises(AttributeError):
+        form.nonexisting = 1
+    data.flush()
+
+    form = session.query(morpho.Wordform).filter_by(id="bulk-f").one()
+    assert form.language.name == "Language"
+    assert form.parts == ["a", "b"]
+    assert form.audio.id == "bulk-a"
+    ex = session.query(common.Sentence).filter_by(id="bulk-e").one()
+    assert isinstance(ex, corpus.Record)
+    assert ex.jsondata["audio_url"] == "x.wav"
+    second = session.query(doc.Document).filter_by(id="bulk-2").one()
+    assert second.preceding.id == "bulk-1"
+
+
+def test_bulk_import(session, tmp_path):
+    cldf = write_dataset(tmp_path, WORDFORMS, EXAMPLES)
+    orm = imported(session, cldf)
+    assert len(orm["wordform"]) == 12 and len(orm["sentence"]) == 6
+    assert imported(session, cldf, bulk=True) == orm
+
+
+def test_compact_import(session, tmp_path):
+    cldf = write_dataset(tmp_path, WORDFORMS, EXAMPLES, chapters=CHAPTERS)
+    orm = imported(session, cldf)
+    assert len(orm["document"]) == 4
+    # flushing every few rows, so that attributes set later are updated
+    assert imported(session, cldf, compact=True, batch_size=7) == orm
+
+
+def test_compact_data(session):
+    data = CompactData()
+    data.batch_size = 2
+    ds = data.add(
+        common.Dataset, "d", id="bulk-d", name="Dataset", domain="example.org"
+    )
+    lg = data.add(common.Language, "l", id="bulk-l", name="Language")
+    data.checkpoint()
+    assert dict.__getitem__(data["Language"], "l") == lg.pk
+    assert data["Language"]["l"].name == "Language"
+    assert data["Language"].get("x") is None
+    form = data.add(
+        morpho.Wordform, "f", id="bulk-f", name="f", language=data["Language"]["l"]
+    )
+    assert form.language.id == "bulk-l"
+    data.checkpoint()
+    assert data["Wordform"]["f"].language.name == "Language"
+    data["Wordform"]["f"].markup_description = "<b>f</b>"
+    first = data.add(doc.Document, "1", id="bulk-1", name="One")
+    data.add(common.Language, "m", id="bulk-m", name="Other")
+    data.checkpoint()
+    second = data.add(doc.Document, "2", id="bulk-2", name="Two")
+    first.chapter_no = 1
+    second.preceding = first
+    ds.description = "written last"
+    data.flush()
+
+    form = session.query(morpho.Wordform).filter_by(id="bulk-f").one()
+    assert form.language.name == "Language"
+    assert form.markup_description == "<b>f</b>"
+    first = session.query(doc.Document).filter_by(id="bulk-1").one()
+    assert first.chapter_no == 1
+    second = session.query(doc.Document).filter_by(id="bulk-2").one()
+    assert second.preceding.id == "bulk-1"
+    ds = session.query(common.Dataset).filter_by(id="bulk-d").one()
+    assert ds.description == "written last"
@@ -0,0 +1,121 @@
+import argparse
+
+import clld_corpus_plugin.models as corpus
+import clld_morphology_plugin.models as morpho
+from pycldf import Dataset, Generic
+
+from indicogram.models import FormPhoneme, ImportedRow
+from indicogram.scripts import initializedb
+
+
+def write_dataset(
+    path, wordforms, examples, phonemes=("a", "k", "n", "u"), chapters=()
+):
+    ds = Generic.in_dir(path)
+    ds.add_component("LanguageTable")
+    ds.add_component("ParameterTable")
+    ds.add_component("ExampleTable")
+    ds.add_table(
+        "wordforms.csv",
+        "ID",
+        "Language_ID",
+        "Form",
+        {"name": "Parameter_ID", "separator": "; "},
+        {"name": "Morpho_Segments", "separator": " "},
+        {"name": "Source", "separator": "; "},
+    )
+    ds.add_table("exampleparts.csv", "ID", "Wordform_ID", "Example_ID", "Index")
+    ds.add_table("phonemes.csv", "ID", "Name")
+    tables = {}
+    if chapters:
+        ds.add_table("chapters.csv", "ID", "Name", "Description", "Number")
+        tables["chapters.csv"] = [
+            {"ID": ch, "Name": name, "Description": description, "Number": number}
+            for ch, name, description, number in chapters
+        ]
+    ds.write(
+        LanguageTable=[{"ID": "l", "Name": "Language"}],
+        ParameterTable=[{"ID": "p1", "Name": "dog"}, {"ID": "p2", "Name": "cat"}],
+        **{
+            "phonemes.csv": [{"ID": f"ph-{p}", "Name": p} for p in phonemes],
+            "wordforms.csv": [
+                {
+                    "ID": wf,
+                    "Language_ID": "l",
+                    "Form": form,
+                    "Parameter_ID": [param],
+                    "Morpho_Segments": [form],
+                }
+                for wf, form, param in wordforms
+            ],
+            "ExampleTable": [
+                {
+                    "ID": ex,
+                    "Language_ID": "l",
+                    "Primary_Text": " ".join(words),
+                    "Analyzed_Word": words,
+                    "Gloss": words,
+                    "Translated_Text": "",
+                }
+                for ex, words in examples
+            ],
+            "exampleparts.csv": [
+                {"ID": f"{ex}-{i}", "Wordform_ID": wf, "Example_ID": ex, "Index": i}
+                for ex, words in examples
+                for i, wf in enumerate(words)
+            ],
+            **tables,
+        },
+    )
+    return Dataset.from_metadata(ds.tablegroup._fname)
+
+
+def test_update(session, tmp_path):
+    cldf = write_dataset(
+        tmp_path,
+        [("wf1", "kuna", "p1"), ("wf2", "mata", "p2")],
+        [("ex1", ["wf1", "wf2"]), ("ex2", ["wf2"])],
+    )
+    initializedb.main(argparse.Namespace(cldf=cldf, settings={}, manifest=True))
+    pk = session.query(morpho.Wordform).filter_by(id="wf1").one().pk
+    assert session.query(ImportedRow).filter_by(table_name="wordforms.csv").count() == 2
+
+    cldf = write_dataset(
+        tmp_path,
+        [("wf1", "kunu", "p1"), ("wf2", "mata", "p2"), ("wf3", "sawa", "p1")],
+        [("ex1", ["wf1", "wf3"])],
+    )
+    initializedb.update(argparse.Namespace(cldf=cldf))
+
+    forms = {wf.id: wf for wf in session.query(morpho.Wordform)}
+    assert sorted(forms) == ["wf1", "wf2", "wf3"]
+    assert forms["wf1"].pk == pk
+    assert forms["wf1"].name == "kunu"
+    assert forms["wf3"].description == "dog"
+    assert session.query(corpus.Record).one().id == "ex1"
+    assert [(p.form.id, p.index) for p in forms["wf3"].sentence_assocs] == [("wf3", 1)]
+    assert not forms["wf2"].sentence_assocs
+    assert session.query(ImportedRow).filter_by(table_name="ExampleTable").count() == 1
+
+
+def segments(session, form_id):
+    return [
+        fp.phoneme.name
+        for fp in session.query(FormPhoneme)
+        .join(FormPhoneme.form)
+        .filter(morpho.Wordform.id == form_id)
+        .order_by(FormPhoneme.index)
+    ]
+
+
+def test_update_phonemes(session, tmp_path):
+    forms, examples = [("wf1", "kuna", "p1"), ("wf2", "mata", "p2")], []
+    cldf = write_dataset(tmp_path, forms, examples)
+    initializedb.main(argparse.Namespace(cldf=cldf, settings={}, manifest=True))
+    assert segments(session, "wf1") == ["k", "u", "n", "a"]
+    assert segments(session, "wf2") == ["a", "a"]
+
+    cldf = write_dataset(tmp_path, forms, examples, phonemes=["a", "k", "m", "t"])
+    initializedb.update(argparse.Namespace(cldf=cldf))
+    assert segments(session, "wf1") == ["k", "a"]
+    assert segments(session, "wf2") == ["m", "a", "t", "a"]
@@ -0,0 +1,26 @@
+from clld.db.meta import DBSession
+from clld_morphology_plugin.models import Morph
+
+from indicogram.scripts import export
+
+
+def test_export(env, tmp_path):
+    paths = list(export.export_paths(env["registry"]))
+    assert "/description" in paths and "/search" not in paths
+    assert "/metrics" not in paths
+    morph_id = DBSession.query(Morph.id).order_by(Morph.pk).first()[0]
+    assert f"/morphs/{morph_id}.json" in paths
+
+    paths = ["/description", f"/morphs/{morph_id}", f"/morphs/{morph_id}.json"]
+    written = export.export_pages(
+        env["app"], tmp_path, paths + ["/morphs/x"], base_url="https://example.org/app"
+    )
+    assert written == 3
+    page = tmp_path.joinpath("morphs", morph_id, "index.html").read_text()
+    assert "https://example.org/app/morphs/" in page
+    assert export.EXPORT_URL not in page
+    assert tmp_path.joinpath("morphs", f"{morph_id}.json").exists()
+    assert tmp_path.joinpath("description", "index.html").exists()
+
+    export.copy_static(env["registry"], tmp_path)
+    assert tmp_path.joinpath("static", "project.js").exists()
@@ -1,2 +1,77 @@
+import pytest
+import transaction
+from clld.db.meta import Base, DBSession
+from pyramid.paster import get_appsettings
+from pytest_clld._app import ExtendedTestApp
+from sqlalchemy.exc import OperationalError
+
+import indicogram
+from indicogram.datatables import datatable_cache
+from indicogram.metrics import RequestStats, metrics, slow_request
+
+
 def test_home(app):
     app.get_html("/", status=200)
+
+
+def morphs(app, start, length, params=""):
+    res = app.get(
+        f"/morphs?sEcho=1&iDisplayStart={start}&iDisplayLength={length}{params}",
+        xhr=True,
+    ).json
+    return [row[0] for row in res["aaData"]], res["iTotalDisplayRecords"]
+
+
+def test_keyset_pages(app):
+    datatable_cache.clear()
+    try:
+        for params in ["", "&iSortingCols=1&iSortCol_0=0&sSortDir_0=desc"]:
+            expected, total = morphs(app, 0, 1000, params)
+            pages = [morphs(app, start, 3, params)[0] for start in range(0, 9, 3)]
+            assert sum(pages, []) == expected[:9]
+            # after the nearest page served, and in a table without pages served
+            assert morphs(app, 10, 3, params)[0] == expected[10:13]
+            datatable_cache.clear()
+            assert morphs(app, 10, 3, params) == (expected[10:13], total)
+        filtered, count = morphs(app, 0, 1000, "&sSearch_0=a")
+        assert count == len(filtered) <= total
+    finally:
+        datatable_cache.clear()
+
+
+def test_read_only(pytestconfig):
+    settings = get_appsettings(pytestconfig.getoption("appini"))
+    bind = DBSession.bind
+    try:
+        app = ExtendedTestApp(
+            indicogram.main({}, **dict(settings, **{"indicogram.read_only": "true"}))
+        )
+        assert "immutable=1" in str(DBSession.bind.url)
+        app.get_html("/", status=200)
+        app.get("/morphs?sEcho=1&iDisplayStart=0&iDisplayLength=10", xhr=True)
+        with pytest.raises(OperationalError):
+            DBSession.execute("CREATE TABLE x (a INTEGER)")
+        transaction.abort()
+    finally:
+        DBSession.bind.dispose()
+        DBSession.remove()
+        DBSession.configure(bind=bind)
+        Base.metadata.bind = bind
+
+
+def test_metrics(app, caplog):
+    metrics.clear()
+    app.get_html("/")
+    text = app.get("/metrics").text
+    assert 'indicogram_request_duration_seconds_count{route="dataset"} 1' in text
+    assert 'indicogram_request_sql_queries_bucket{route="dataset",le="+Inf"} 1' in text
+    assert 'indicogram_cache_hits_total{cache="render"}' in text
+    template = [
+        line for line in text.splitlines() if line.startswith("indicogram_request_tem")
+    ]
+    assert float(template[-2].split()[-1]) > 0
+
+    stats = RequestStats(statements=True)
+    stats.queries, stats.statements["SELECT\n 1"] = 2, [0.5, 2]
+    slow_request(app.get("/").request, "dataset", stats, 5)
+    assert "0.500s in 2x SELECT 1" in caplog.text
@@ -0,0 +1,31 @@
+from clld.db.meta import DBSession
+from clld_corpus_plugin.models import Text
+
+from indicogram.httpcache import response_cache
+
+
+def test_http_cache(app):
+    res = app.get("/description")
+    etag, modified = res.headers["ETag"], res.headers["Last-Modified"]
+    assert res.headers["Vary"] == "Accept, X-Requested-With"
+    assert app.get("/description", headers={"If-None-Match": etag}, status=304).body == b""
+    app.get("/description", headers={"If-Modified-Since": modified}, status=304)
+    app.get("/description", headers={"If-None-Match": '"other"'}, status=200)
+    xhr = app.get("/description", xhr=True)
+    assert xhr.headers["ETag"] != etag
+    assert "ETag" not in app.get("/static/project.js").headers
+    # text chunks change with the imported sentences, like the text pages
+    text = DBSession.query(Text.id).order_by(Text.pk).first()
+    if text is not None:
+        path = f"/texts/{text.id}/sentences?start=0"
+        headers = {"If-None-Match": app.get(path, xhr=True).headers["ETag"]}
+        app.get(path, xhr=True, headers=headers, status=304)
+
+    response_cache.resize(2)
+    try:
+        assert app.get("/description").body == res.body
+        assert app.get("/description").body == res.body
+        assert response_cache.info().hits == 1
+    finally:
+        response_cache.resize(0)
+        response_cache.clear()
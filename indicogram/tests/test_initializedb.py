@@ -0,0 +1,87 @@
+import json
+
+import clld_morphology_plugin.models as morpho
+from clld.db.models import common
+from pycldf import Dataset, Generic
+
+from indicogram.models import FormPhoneme, Phoneme
+from indicogram.scripts.initializedb import count_phonemes, phoneme_tokenizer
+from indicogram.scripts.parallel import TableParser
+from indicogram.scripts.profiling import ImportProfile
+
+
+def test_phoneme_tokenizer():
+    tokenize = phoneme_tokenizer({"t": "t", "ts": "ts", "s": "s", "a": "a", "á": "a1"})
+    assert list(tokenize("tsatas")) == ["ts", "a", "t", "a", "s"]
+    assert list(tokenize("ta-ts.á")) == ["t", "a", "ts", "a1"]
+    assert list(phoneme_tokenizer({})("tsa")) == []
+
+
+def test_count_phonemes(session):
+    lg = common.Language(id="count-l", name="Language")
+    phonemes = {p: Phoneme(id=f"count-{p}", name=p) for p in "atsx"}
+    session.add_all(phonemes.values())
+    # single segments are both initial and final
+    for form in ["tata", "sat", "a", "s"]:
+        wordform = morpho.Wordform(id=f"count-{form}", name=form, language=lg)
+        for index, p in enumerate(form):
+            session.add(FormPhoneme(form=wordform, phoneme=phonemes[p], index=index))
+    session.flush()
+    count_phonemes()
+
+    counts = {
+        p: (
+            ph.count_tokens,
+            ph.count_types,
+            ph.count_initial,
+            ph.count_medial,
+            ph.count_final,
+        )
+        for p, ph in phonemes.items()
+    }
+    assert counts == {
+        "a": (4, 3, 1, 2, 2),
+        "t": (3, 2, 1, 1, 1),
+        "s": (2, 2, 2, 0, 1),
+        "x": (0, 0, 0, 0, 0),
+    }
+
+
+def test_table_parser(tmp_path):
+    ds = Generic.in_dir(tmp_path)
+    ds.add_component("LanguageTable")
+    ds.add_table("phonemes.csv", "ID", "Name", {"name": "Tags", "separator": " "})
+    ds.write(
+        LanguageTable=[{"ID": "l", "Name": "Language", "Latitude": 1.5}],
+        **{"phonemes.csv": [{"ID": "a", "Name": "a", "Tags": ["vowel", "open"]}]},
+    )
+    cldf = Dataset.from_metadata(ds.tablegroup._fname)
+    tables = ["phonemes.csv", "LanguageTable", "ExampleTable"]
+    with TableParser(cldf, 1, tables) as parser:
+        # tables not in the dataset are skipped, one is parsed ahead at a time
+        assert list(parser.futures) == ["phonemes.csv"]
+        assert parser.pending == ["languages.csv"]
+        for table in tables[:2]:
+            assert list(parser.iter_rows(table)) == list(cldf.iter_rows(table))
+    with TableParser(cldf, 2, ["phonemes.csv"]) as parser:
+        rows = list(parser.iter_rows("LanguageTable"))  # not in the order given
+        assert rows == list(cldf.iter_rows("LanguageTable"))
+
+
+def test_import_profile(session, tmp_path):
+    profile = ImportProfile(tmp_path / "prof")
+    with profile.stage("languages.csv") as stage:
+        for lang in session.query(common.Language).limit(2):
+            stage.rows += 1
+    with profile.stage("flush"):
+        pass
+    assert [s.name for s in profile.stages] == ["languages.csv", "flush"]
+    assert profile.stages[0].queries == 1
+    assert profile.stages[1].queries == 0
+    assert profile.stages[0].peak_rss > 0
+    assert (tmp_path / "prof" / "languages.csv.prof").exists()
+    assert "languages.csv" in profile.table()
+    profile.write_json(tmp_path / "report.json", mode="Data")
+    report = json.loads((tmp_path / "report.json").read_text())
+    assert report["mode"] == "Data"
+    assert report["stages"][0]["rows"] == profile.stages[0].rows
@@ -0,0 +1,246 @@
+import clld_corpus_plugin.models as corpus
+import clld_corpus_plugin.util as cutil
+import clld_morphology_plugin.models as morpho
+import clld_morphology_plugin.util as mutil
+import pytest
+from clld.db.models import common
+from clld.web.util.htmllib import HTML
+from clld_document_plugin.models import Document
+from sqlalchemy import event
+
+from indicogram import render_lfts
+from indicogram import cache, derivation, interlinear, paradigm
+from indicogram.cache import RenderCache
+from indicogram.util import lazy_audio
+
+
+class Request:
+    def route_url(self, route, id=None, **kw):
+        return f"/{route}s/{id}"
+
+
+@pytest.fixture
+def queries(session):
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    engine = session.get_bind()
+    event.listen(engine, "before_cursor_execute", count)
+    yield statements
+    event.remove(engine, "before_cursor_execute", count)
+
+
+def test_render_lfts(session, queries):
+    lg = common.Language(id="render-l", name="Lang")
+    session.add_all(
+        [
+            morpho.Morph(id=f"render-{name}", name=name, description=meaning, language=lg)
+            for name, meaning in [("m1", "dog"), ("m2", "cat"), ("m3", "bird")]
+        ]
+    )
+    session.flush()
+    session.expunge_all()
+    req = Request()
+
+    assert (
+        render_lfts(req, "render-m1", "morphs.csv", session)
+        == "*[m1](/morphs/render-m1)* ‘dog’"
+    )
+    del queries[:]
+    ids = "render-m3,render-m1,render-m2"
+    assert (
+        render_lfts(req, "__all__", "morphs.csv", session, ids=[ids], with_language=["1"])
+        == "Lang *[m3](/morphs/render-m3)* ‘bird’, Lang *[m1](/morphs/render-m1)* ‘dog’"
+        " and Lang *[m2](/morphs/render-m2)* ‘cat’"
+    )
+    assert len(queries) == 1
+    with pytest.raises(ValueError):
+        render_lfts(req, "__all__", "morphs.csv", session, ids=["render-m1,render-m4"])
+
+
+def test_render_cache():
+    calls = []
+
+    def renderer(req, objid, table, session, **kwargs):
+        calls.append(objid)
+        return objid.upper()
+
+    req = Request()
+    req.application_url = "http://localhost"
+    req.dataset = common.Dataset(id="d", jsondata={"import_stamp": "1"})
+    cache = RenderCache(maxsize=2)
+    cached = cache.wrap(renderer)
+
+    assert cached(req, "m1", "morphs.csv", None) == "M1"
+    assert cached(req, "m1", "morphs.csv", None) == "M1"
+    assert cached(req, "m1", "morphs.csv", None, with_language=["True"]) == "M1"
+    assert cached(req, "m2", "morphs.csv", None) == "M2"
+    assert calls == ["m1", "m1", "m2"]
+    assert cache.info()[:5] == (1, 3, 1, 2, 2)
+
+    req.dataset.jsondata = {"import_stamp": "2"}
+    assert cached(req, "m2", "morphs.csv", None) == "M2"
+    assert calls == ["m1", "m1", "m2", "m2"]
+    assert cache.info().currsize == 1
+
+
+def test_rendered_markdown(session, mocker):
+    mocker.patch("indicogram.cache.markdown", lambda req, text: f"<p>{text}</p>")
+    chapter = Document(id="render-ch", name="Chapter", description="[x](Morph#cldf:m1)")
+    session.add(chapter)
+    req = Request()
+    req.dataset = common.Dataset(id="d", jsondata={"import_stamp": "1"})
+    req.environ = {}
+    cache.prerender_markdown(req, [chapter])
+    html = f"<p>{cache.PRERENDER_URL}/morphs/m1</p>"
+    session.query(cache.RenderedMarkdown).one().html = html
+
+    req.application_url = "http://localhost/app"
+    assert cache.rendered_markdown(req, chapter) == "<p>http://localhost/app/morphs/m1</p>"
+    req.dataset.jsondata = {"import_stamp": "2"}
+    assert cache.rendered_markdown(req, chapter) == "<p>[x](Morph#cldf:m1)</p>"
+
+
+def test_lazy_audio():
+    player = HTML.audio(
+        "",
+        HTML.source(src="/audio/a&b", type="audio/x-wav"),
+        controls="controls",
+        preload="none",
+    )
+    assert (
+        lazy_audio(f"<div>{player}</div>")
+        == '<div><button class="btn btn-mini audio-play" data-audio="a&amp;b"'
+        ' type="button"><i class="icon-play"></i></button></div>'
+    )
+
+
+def test_rendered_sentence(session, mocker):
+    def units(req, sentence):
+        return [HTML.div(w, class_="gloss-unit") for w in sentence.analyzed.split("\t")]
+
+    mocker.patch("clld_corpus_plugin.util.rendered_gloss_units", units)
+    live = mocker.patch("indicogram.interlinear.rendered_gloss_units", side_effect=units)
+    lg = common.Language(id="render-l", name="Lang")
+    ex = corpus.Record(
+        id="render-ex", name="a b", analyzed="a\tb", gloss="A\tB", language=lg
+    )
+    common.Sentence_files(
+        object=ex, id="render-ex-audio", name="audio", mime_type="audio/wav"
+    )
+    session.add(ex)
+    session.flush()
+    req = Request()
+    req.dataset = common.Dataset(id="d", jsondata={"import_stamp": "1"})
+    req.application_url = "http://localhost/app"
+
+    expected = lazy_audio(
+        str(cutil.rendered_sentence(req, ex, in_context=False, text_link=False))
+    )
+    assert (
+        str(interlinear.rendered_sentence(req, ex, text_link=False, in_context=False))
+        == expected
+    )
+    interlinear.prerender_examples(req)
+    live.reset_mock()
+    assert interlinear.gloss_units(req, [ex]) == {
+        ex.pk: '<div class="gloss-unit">a</div><div class="gloss-unit">b</div>'
+    }
+    assert (
+        str(interlinear.rendered_sentence(req, ex, text_link=False, in_context=False))
+        == expected
+    )
+    assert not live.called
+    req.dataset.jsondata = {"import_stamp": "2"}
+    interlinear.gloss_units(req, [ex])
+    assert live.called
+
+
+def test_paradigm(session, mocker):
+    lg = common.Language(id="render-l", name="Lang")
+    lexeme = morpho.Lexeme(id="render-lx", name="lx", language=lg)
+    cat = morpho.InflectionalCategory(id="render-num", name="num")
+    value = morpho.InflectionalValue(id="render-pl", name="PL", category=cat)
+    form = morpho.Wordform(id="render-wf", name="wfs", language=lg)
+    session.add_all([lexeme, value, form])
+    session.flush()
+    live = mocker.patch(
+        "indicogram.paradigm.render_paradigm",
+        return_value={
+            "colnames": [cat],
+            "columns": [[value], ["<->"]],
+            "idxnames": [0],
+            "index": [("",)],
+            "cells": [[[form], ""]],
+        },
+    )
+    mocker.patch(
+        "indicogram.paradigm.link",
+        lambda req, obj: f"<a href='{cache.PRERENDER_URL}/{obj.id}'>{obj.name}</a>",
+    )
+    req = Request()
+    req.dataset = common.Dataset(id="d", jsondata={"import_stamp": "1"})
+    paradigm.prerender_paradigms(req)
+    live.reset_mock()
+
+    req.application_url = "http://localhost/app"
+    assert paradigm.paradigm(req, lexeme) == {
+        "colnames": ["<a href='http://localhost/app/render-num'>num</a>"],
+        "columns": [
+            ["<a href='http://localhost/app/render-pl'>PL</a>"],
+            ["&lt;-&gt;"],
+        ],
+        "idxnames": [""],
+        "index": [[""]],
+        "cells": [[["<a href='http://localhost/app/render-wf'>wfs</a>"], []]],
+    }
+    assert not live.called
+    req.dataset.jsondata = {"import_stamp": "2"}
+    paradigm.paradigm(req, lexeme)
+    assert live.called
+
+
+def test_derivations(session, mocker):
+    lg = common.Language(id="render-l", name="Lang")
+    process = morpho.DerivationalProcess(id="render-dp", name="nmlz", language=lg)
+    root = morpho.Morph(id="render-r", name="r", language=lg)
+    stems = {x: morpho.Stem(id=f"render-{x}", name=x, language=lg) for x in "abcd"}
+    for source, target in [(root, "a"), ("a", "b"), ("b", "c"), ("a", "d")]:
+        session.add(
+            morpho.Derivation(
+                process=process,
+                source_root=source if source is root else None,
+                source_stem=stems.get(source),
+                target=stems[target],
+            )
+        )
+    session.flush()
+    derivation.build_closure()
+    assert {
+        (row.descendant_pk, row.depth, len(row.path.split()))
+        for row in derivation.family(root)
+    } == {
+        (stems["a"].pk, 1, 1),
+        (stems["b"].pk, 2, 2),
+        (stems["c"].pk, 3, 3),
+        (stems["d"].pk, 2, 2),
+    }
+
+    def link(req, obj, **kw):
+        return HTML.a(obj.name, href=f"/{obj.id}")
+
+    mocker.patch("indicogram.derivation.link", link)
+    mocker.patch("clld_morphology_plugin.util.link", link)
+    req = Request()
+    session.expire_all()
+    for obj in [root, stems["a"], stems["c"]]:
+        assert str(derivation.render_family(req, obj) or "") == (
+            str(mutil.render_derived_stems(req, obj)) if obj.derivations else ""
+        )
+    assert str(derivation.render_lineage(req, stems["c"])) == str(
+        mutil.render_derived_from(req, stems["c"])
+    )
+    assert derivation.render_lineage(req, stems["a"]) is not None
+    assert len(derivation.process_derivations(process)) == 4
@@ -0,0 +1,180 @@
+import clld_corpus_plugin.models as corpus
+import clld_morphology_plugin.models as morpho
+import pytest
+from clld.db.models import common
+from pyramid import testing
+from pyramid.httpexceptions import HTTPBadRequest, HTTPNotFound
+from webob import Request
+from webob.multidict import MultiDict
+
+from indicogram import concordance as conc
+from indicogram import interlinear, search
+from indicogram.views import (
+    audio,
+    concordance,
+    concordance_index,
+    search_results,
+    text_sentences,
+)
+
+
+def test_audio(session, tmp_path):
+    lg = common.Language(id="view-l", name="Language")
+    form = morpho.Wordform(id="view-f", name="f", language=lg)
+    session.add(morpho.Wordform_files(object=form, id="view-a", mime_type="audio/wav"))
+    session.flush()
+    tmp_path.joinpath("view-a.wav").write_bytes(bytes(range(256)) * 4)
+    with testing.testConfig(settings={"indicogram.audio_dir": str(tmp_path)}):
+        res = audio(testing.DummyRequest(matchdict={"audio_id": "view-a"}))
+        with pytest.raises(HTTPNotFound):
+            audio(testing.DummyRequest(matchdict={"audio_id": "view-b"}))
+
+    assert res.content_type == "audio/x-wav"
+    assert res.accept_ranges == "bytes"
+    partial = Request.blank("/", headers={"Range": "bytes=254-257"}).get_response(res)
+    assert partial.status_int == 206
+    assert partial.body == bytes([254, 255, 0, 1])
+    cached = Request.blank("/", headers={"If-None-Match": res.etag}).get_response(res)
+    assert cached.status_int == 304
+
+
+def test_text_sentences(session, mocker):
+    lg = common.Language(id="view-l", name="Language")
+    text = corpus.Text(id="view-t", name="Text")
+    for i, number in enumerate([2, 3, 1]):
+        ex = corpus.Record(id=f"view-ex{i}", name="ex", language=lg)
+        session.add(corpus.TextSentence(text=text, sentence=ex, record_number=number))
+    session.flush()
+    assert [s.id for s in interlinear.text_sentences(text)] == [
+        "view-ex2",
+        "view-ex0",
+        "view-ex1",
+    ]
+    interlinear.index_texts()
+    pks = text.jsondata["sentence_pks"]
+    assert interlinear.text_index(text) == pks
+    assert [s.pk for s in interlinear.text_sentences(text, 1, 1)] == pks[1:2]
+
+    mocker.patch(
+        "indicogram.views.rendered_text_chunk",
+        lambda req, text, start, size: f"{text.id}:{start}:{size}",
+    )
+    with testing.testConfig(settings={"indicogram.text_chunk_size": "2"}):
+        res = text_sentences(
+            testing.DummyRequest(matchdict={"id": "view-t"}, params={"start": "2"})
+        )
+        assert res.text == "view-t:2:2"
+        with pytest.raises(HTTPBadRequest):
+            text_sentences(
+                testing.DummyRequest(matchdict={"id": "view-t"}, params={"start": "x"})
+            )
+        with pytest.raises(HTTPNotFound):
+            text_sentences(testing.DummyRequest(matchdict={"id": "view-x"}))
+
+
+def test_search_results(session):
+    lg = common.Language(id="view-l", name="Language")
+    session.add_all(
+        [
+            corpus.Record(
+                id=f"view-ex{i}",
+                name=f"viewword{i} <b>",
+                analyzed="a\tb",
+                gloss="viewgloss-1SG\tPL",
+                description="a translation",
+                language=lg,
+            )
+            for i in range(3)
+        ]
+        + [morpho.Wordform(id="view-f", name="viewgloss", language=lg)]
+    )
+    session.flush()
+    search.build_search_index()
+
+    assert search.search("viewgloss")[0] == 4
+    assert search.search("viewgloss", kinds=["wordform"])[0] == 1
+    total, results = search.search("viewglo 1sg", kinds=["sentence"], size=2, page=2)
+    assert total == 3 and len(results) == 1
+    assert search.search("viewnothing") == (0, [])
+    assert search.search("  ") == (0, [])
+
+    with testing.testConfig() as config:
+        config.add_route("sentence", "/sentences/{id}")
+        res = search_results(
+            testing.DummyRequest(
+                params=MultiDict([("q", "viewword1"), ("kind", "sentence")])
+            )
+        )
+    assert res["total"] == 1
+    assert res["results"][0]["url"] == "http://example.com/sentences/view-ex1"
+    assert res["results"][0]["snippet"] == "<mark>viewword1</mark> &lt;b&gt;"
+    for page in ["x", "99999999999999999999"]:
+        with pytest.raises(HTTPBadRequest):
+            search_results(
+                testing.DummyRequest(params=MultiDict([("q", "a"), ("page", page)]))
+            )
+
+
+def test_concordance(session):
+    lg = common.Language(id="view-l", name="Language")
+    pl = morpho.Gloss(id="view-pl", name="PL")
+    morpheme = morpho.Morpheme(id="view-mp", name="-s", language=lg)
+    morph = morpho.Morph(id="view-m", name="-s", morpheme=morpheme, language=lg)
+    dog, cats = [
+        morpho.Wordform(id=f"view-{name}", name=name, language=lg)
+        for name in ["dog", "cats"]
+    ]
+    part = morpho.WordformPart(id="view-cats-1", form=cats, morph=morph, index=1)
+    session.add(morpho.WordformPartGloss(formpart=part, gloss=pl))
+    for i, words in enumerate([[dog, cats, cats], [cats]]):
+        ex = corpus.Record(
+            id=f"view-ex{i}",
+            name=" ".join(w.name for w in words),
+            analyzed="\t".join(w.name for w in words),
+            gloss="\t".join("dog" if w is dog else "cat-PL" for w in words),
+            description="dogs and cats",
+            language=lg,
+        )
+        for index, word in enumerate(words):
+            session.add(corpus.SentencePart(sentence=ex, form=word, index=index))
+    session.flush()
+    conc.build_concordance()
+
+    key = conc.concordance_key("gloss", "view-pl")
+    assert (key.name, key.tokens, key.sentences) == ("PL", 3, 2)
+    assert conc.concordance_key("morpheme", "view-mp").tokens == 3
+    assert conc.concordance_key("morph", "view-x") is None
+    assert conc.concordance_lines(key, page=1, size=2) == [
+        ("view-ex0", "dog", "cats", "cat-PL", "cats", "dogs and cats"),
+        ("view-ex0", "dog cats", "cats", "cat-PL", "", "dogs and cats"),
+    ]
+    assert conc.kwic(3, "ex", "a b c d e", None, None, None, context=2) == (
+        "ex",
+        "b c",
+        "d",
+        "",
+        "e",
+        None,
+    )
+
+    with testing.testConfig() as config:
+        for route in ["sentence", "morph", "morpheme", "gloss"]:
+            config.add_route(route, f"/{route}s/{{id}}")
+        config.add_route("concordance", "/concordance/{kind}/{id}")
+        res = concordance(
+            testing.DummyRequest(
+                matchdict={"kind": "morph", "id": "view-m"}, params={"page": "2"}
+            )
+        )
+        assert res["key"]["tokens"] == 3 and res["pages"] == 1 and res["lines"] == []
+        with pytest.raises(HTTPNotFound):
+            concordance(testing.DummyRequest(matchdict={"kind": "x", "id": "view-m"}))
+        res = concordance_index(testing.DummyRequest(params={"kind": "gloss"}))
+        tokens = [key["tokens"] for key in res["keys"]]
+        assert tokens == sorted(tokens, reverse=True)
+        assert {key["kind"] for key in res["keys"]} == {"gloss"}
+        assert res["keys"][0]["concordance"].startswith(
+            "http://example.com/concordance/gloss/"
+        )
+        with pytest.raises(HTTPBadRequest):
+            concordance_index(testing.DummyRequest(params={"kind": "x"}))
@@ -0,0 +1,30 @@
+import html
+import re
+
+from clld.web.util.helpers import icon
+from clld.web.util.htmllib import HTML
+
+# the audio players rendered for sentences by clld_corpus_plugin
+AUDIO_PLAYER = re.compile(
+    r'<audio[^>]*>\s*<source src="/audio/(?P<id>[^"]+)"[^>]*>(\s*</source>)?\s*</audio>'
+)
+
+
+def audio_button(file_id):
+    """A button playing the audio file ``file_id`` with the player shared by all
+    buttons on the page (see ``static/project.js``), which only loads it when
+    clicked."""
+    return HTML.button(
+        icon("play"),
+        type="button",
+        class_="btn btn-mini audio-play",
+        **{"data-audio": file_id},
+    )
+
+
+def lazy_audio(content):
+    """Replace the audio players in rendered HTML with buttons for the shared
+    player."""
+    return AUDIO_PLAYER.sub(
+        lambda m: str(audio_button(html.unescape(m.group("id")))), content
+    )
@@ -0,0 +1,200 @@
+import math
+import mimetypes
+from pathlib import Path
+
+from clld.db.meta import DBSession
+from clld.db.models import common
+from clld_corpus_plugin import audio_suffixes
+from clld_corpus_plugin.models import Text
+from clld_morphology_plugin.models import Wordform_files
+from pyramid.httpexceptions import HTTPBadRequest, HTTPNotFound
+from pyramid.response import FileIter, Response
+
+from indicogram import concordance as conc
+from indicogram.cache import render_cache
+from indicogram.datatables import datatable_cache
+from indicogram.httpcache import response_cache
+from indicogram.interlinear import rendered_text_chunk, text_chunk_size
+from indicogram.metrics import metrics
+from indicogram.search import KINDS, PAGE_SIZE, highlighted, search
+
+
+def render_cache_info(request):
+    """Counters of the markdown render cache, to help choosing its size."""
+    return render_cache.info()._asdict()
+
+
+def metrics_exposition(request):
+    """Request metrics and cache counters in the Prometheus text format."""
+    caches = [
+        ("render", render_cache),
+        ("response", response_cache),
+        ("datatable", datatable_cache),
+    ]
+    return Response(
+        metrics.exposition(caches),
+        content_type="text/plain; version=0.0.4",
+        charset="utf-8",
+    )
+
+
+class RangeFileIter(FileIter):
+    """Seeks to the start of a requested byte range instead of reading up to it."""
+
+    def app_iter_range(self, start, stop):
+        try:
+            self.file.seek(start)
+            remaining = None if stop is None else stop - start
+            while remaining is None or remaining > 0:
+                size = self.block_size
+                if remaining is not None:
+                    size = min(size, remaining)
+                data = self.file.read(size)
+                if not data:
+                    break
+                if remaining is not None:
+                    remaining -= len(data)
+                yield data
+        finally:
+            self.close()
+
+
+def audio(request):
+    """The audio files of wordforms and sentences, looked up as ``<id>.wav`` (or .mp3)
+    in ``indicogram.audio_dir``. Range and conditional requests are supported, so
+    players can fetch files on demand, seek, and revalidate cached copies."""
+    audio_id = request.matchdict["audio_id"]
+    if not any(
+        DBSession.query(model.pk).filter(model.id == audio_id).first()
+        for model in [Wordform_files, common.Sentence_files]
+    ):
+        raise HTTPNotFound()
+    settings = request.registry.settings
+    directory = Path(settings.get("indicogram.audio_dir", "audio"))
+    for suffix in audio_suffixes:
+        path = directory / f"{audio_id}{suffix}"
+        if path.is_file():
+            break
+    else:
+        raise HTTPNotFound()
+    stat = path.stat()
+    response = Response(
+        app_iter=RangeFileIter(path.open("rb")),
+        content_type=mimetypes.guess_type(path.name)[0] or "application/octet-stream",
+        conditional_response=True,
+    )
+    response.content_length = stat.st_size
+    response.last_modified = stat.st_mtime
+    response.etag = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+    response.accept_ranges = "bytes"
+    response.cache_control.public = True
+    response.cache_control.max_age = int(settings.get("indicogram.audio_max_age", 86400))
+    return response
+
+
+def text_sentences(request):
+    """A chunk of the sentences of a text, starting at ``start``, as list items for
+    the text page (see ``static/project.js``)."""
+    text = Text.get(request.matchdict["id"], default=None)
+    if text is None:
+        raise HTTPNotFound()
+    try:
+        start = int(request.params.get("start", 0))
+    except ValueError:
+        raise HTTPBadRequest()
+    return Response(
+        rendered_text_chunk(request, text, max(start, 0), text_chunk_size(request)),
+        content_type="text/html",
+    )
+
+
+# pages beyond would not fit the OFFSET of the queries, and never have results
+MAX_PAGE = 10**6
+
+
+def _page(request):
+    try:
+        page = max(int(request.params.get("page", 1)), 1)
+    except ValueError:
+        raise HTTPBadRequest()
+    if page > MAX_PAGE:
+        raise HTTPBadRequest()
+    return page
+
+
+def search_results(request):
+    """Ranked full-text search results for ``q``, restricted to the ``kind`` (e.g.
+    ``sentence``, see ``indicogram.search.KINDS``) parameters given, a ``page`` of
+    ``indicogram.search.PAGE_SIZE`` results at a time."""
+    query = request.params.get("q", "").strip()
+    kinds = [kind for kind in request.params.getall("kind") if kind in KINDS]
+    page = _page(request)
+    total, results = search(query, kinds, page)
+    return {
+        "query": query,
+        "kinds": kinds,
+        "page": page,
+        "size": PAGE_SIZE,
+        "pages": math.ceil(total / PAGE_SIZE),
+        "total": total,
+        "results": [
+            {
+                "kind": result.kind,
+                "id": result.obj_id,
+                "name": result.name,
+                "url": request.route_url(KINDS[result.kind].route, id=result.obj_id),
+                "snippet": highlighted(result.snippet),
+                "rank": result.rank,
+            }
+            for result in results
+        ],
+    }
+
+
+def _key_info(request, key):
+    return {
+        "kind": key.kind,
+        "id": key.obj_id,
+        "name": key.name,
+        "tokens": key.tokens,
+        "sentences": key.sentences,
+        "url": request.route_url(conc.KINDS[key.kind].route, id=key.obj_id),
+        "concordance": request.route_url("concordance", kind=key.kind, id=key.obj_id),
+    }
+
+
+def concordance_index(request):
+    """The morphs, morphemes and glosses occurring in examples (only those of
+    ``kind`` if given), the most frequent first."""
+    kind = request.params.get("kind") or None
+    if kind is not None and kind not in conc.KINDS:
+        raise HTTPBadRequest()
+    page = _page(request)
+    total, keys = conc.frequencies(kind, page)
+    return {
+        "kind": kind,
+        "page": page,
+        "pages": math.ceil(total / conc.PAGE_SIZE),
+        "total": total,
+        "keys": [_key_info(request, key) for key in keys],
+    }
+
+
+def concordance(request):
+    """The occurrences of a morph, morpheme or gloss in the examples as keyword in
+    context lines, a ``page`` of ``indicogram.concordance.PAGE_SIZE`` at a time."""
+    kind, obj_id = request.matchdict["kind"], request.matchdict["id"]
+    key = conc.concordance_key(kind, obj_id) if kind in conc.KINDS else None
+    if key is None:
+        raise HTTPNotFound()
+    page = _page(request)
+    return {
+        "key": _key_info(request, key),
+        "page": page,
+        "size": conc.PAGE_SIZE,
+        "pages": math.ceil(key.tokens / conc.PAGE_SIZE),
+        "lines": [
+            dict(line._asdict(), url=request.route_url("sentence", id=line.sentence_id))
+            for line in conc.concordance_lines(key, page)
+        ],
+    }
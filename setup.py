@@ -46,5 +46,7 @@ setup(
     entry_points="""\
     [paste.app_factory]
     main = indicogram:main
+    [console_scripts]
+    indicogram = indicogram.__main__:main
 """,
 )